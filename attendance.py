@@ -0,0 +1,100 @@
+"""
+Attendance writes for roll calls and kiosk check-ins.
+
+Attendance has one row per member, schedule and date (a unique index), so
+any number of marks is a single ``INSERT ... ON CONFLICT DO UPDATE``: a
+trainer saving the roll of a forty-member class costs one statement and one
+commit instead of a SELECT and a write per member. The caller owns the
+transaction.
+"""
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Attendance, Booking
+
+ATTENDANCE_STATUSES = ('present', 'late', 'absent')
+
+# Bookings whose member can be marked
+MARKABLE_BOOKINGS = ('confirmed', 'completed')
+
+# Records accepted in one roll call request
+MAX_ROLL_CALL = 500
+
+_UPSERT_DIALECTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def write_attendance(rows):
+    """Upsert attendance ``rows``, dicts with ``user_id``, ``class_schedule_id``,
+    ``attendance_date``, ``status`` and ``check_in_time``; later marks replace earlier ones."""
+    if not rows:
+        return
+    upsert = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if upsert is None:
+        for row in rows:
+            record = Attendance.query.filter_by(user_id=row['user_id'], class_schedule_id=row['class_schedule_id'],
+                                                attendance_date=row['attendance_date']).first()
+            if record is None:
+                record = Attendance(user_id=row['user_id'], class_schedule_id=row['class_schedule_id'],
+                                    attendance_date=row['attendance_date'])
+                db.session.add(record)
+            record.status = row['status']
+            record.check_in_time = row['check_in_time']
+        return
+
+    statement = upsert(Attendance).values([dict(row, created_at=row['check_in_time']) for row in rows])
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['user_id', 'class_schedule_id', 'attendance_date'],
+        set_={'status': statement.excluded.status, 'check_in_time': statement.excluded.check_in_time}))
+
+
+def upsert_attendance(class_schedule_id, attendance_date, statuses, now=None):
+    """Record ``{user_id: status}`` for one occurrence, replacing earlier marks."""
+    now = now or datetime.utcnow()
+    write_attendance([dict(user_id=user_id, class_schedule_id=class_schedule_id, attendance_date=attendance_date,
+                           status=status, check_in_time=now)
+                      for user_id, status in statuses.items()])
+
+
+def mark_roll_call(class_schedule_id, attendance_date, records):
+    """Validate roll call ``records`` and upsert the valid ones.
+
+    Each record is a dict with ``user_id`` and ``status`` (default
+    ``present``); only members with a booking for the occurrence that was not
+    cancelled can be marked. Returns one result per record, in order, and the
+    number of marks written per status.
+    """
+    booked = set(db.session.scalars(select(Booking.user_id).where(
+        Booking.class_schedule_id == class_schedule_id,
+        Booking.booking_date == attendance_date,
+        Booking.status.in_(MARKABLE_BOOKINGS))))
+
+    statuses = {}
+    results = []
+    for record in records:
+        record = record if isinstance(record, dict) else {}
+        status = record.get('status', 'present')
+        try:
+            user_id = int(record.get('user_id'))
+        except (TypeError, ValueError):
+            results.append({'user_id': record.get('user_id'), 'success': False, 'message': 'Invalid user id'})
+            continue
+        if status not in ATTENDANCE_STATUSES:
+            message = 'Invalid status'
+        elif user_id not in booked:
+            message = 'Not booked for this class'
+        elif user_id in statuses:
+            message = 'Listed more than once'
+        else:
+            statuses[user_id] = status
+            results.append({'user_id': user_id, 'status': status, 'success': True})
+            continue
+        results.append({'user_id': user_id, 'success': False, 'message': message})
+
+    upsert_attendance(class_schedule_id, attendance_date, statuses)
+    return results, Counter(statuses.values())
@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+Benchmark the core user journeys and compare the results against a baseline.
+
+Each scenario replays a journey end to end with one session per virtual user:
+
+    member   login -> services -> class catalog -> book a class -> member dashboard
+    trainer  login -> trainer dashboard -> class roll -> roll call (one bulk attendance POST)
+    admin    login -> dashboard -> members, trainers, classes, bookings, payments
+
+and reports p50/p95/p99 latency and requests/sec per step. The app runs
+in-process through Flask's test client, under a local gunicorn started for the
+run, or on any server given by ``--url``. Data comes from ``generate_data.py``;
+an empty database is filled at ``--generate-scale`` first.
+
+It also times application startup in fresh interpreters: importing ``app``,
+``create_app()`` and the first request, i.e. what a new worker pays before it
+serves anything.
+
+    python benchmark.py                           # in-process, sqlite:///perf_data.db (in instance/)
+    python benchmark.py --gunicorn 3              # local gunicorn with 3 workers
+    python benchmark.py --save-baseline           # record these numbers as the baseline
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import threading
+import time as clock
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.engine import make_url
+
+from database import database_config
+from generate_data import DEFAULT_PASSWORD, Generator
+from migrations import upgrade_schema
+from models import User, Role, UserRole, Member, Trainer, Class, ClassSchedule, Booking
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ('member', 'trainer', 'admin')
+ADMIN_PAGES = ('/admin/members', '/admin/trainers', '/admin/classes', '/admin/bookings', '/admin/payments')
+# Fewer samples than this make p99 meaningless, so such steps are not compared
+MIN_SAMPLES = 20
+
+
+def percentile(sorted_values, fraction):
+    """Linearly interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+# Data
+
+class Fixtures:
+    """Accounts and classes the scenarios act on, read once from the database."""
+
+    def __init__(self, engine, seed=0, limit=500):
+        rng = random.Random(seed)
+        with engine.connect() as conn:
+            def usernames(role, profile=None):
+                query = (select(User.username)
+                         .join(UserRole, UserRole.user_id == User.id)
+                         .join(Role, Role.id == UserRole.role_id)
+                         .where(Role.name == role, User.is_active == True)
+                         .order_by(User.id).limit(limit))
+                if profile is not None:
+                    # Accounts without the profile are redirected away from their dashboard
+                    query = query.join(profile, profile.user_id == User.id)
+                return conn.execute(query).scalars().all()
+
+            self.members = usernames('member', Member)
+            self.admins = usernames('admin')
+
+            # One roll per trainer: the latest date with bookings on one of their schedules
+            latest = (select(Booking.class_schedule_id, func.max(Booking.booking_date).label('day'))
+                      .where(Booking.booking_date <= date.today())
+                      .group_by(Booking.class_schedule_id).subquery())
+            rows = conn.execute(
+                select(User.username, latest.c.class_schedule_id, latest.c.day)
+                .select_from(latest)
+                .join(ClassSchedule, ClassSchedule.id == latest.c.class_schedule_id)
+                .join(Class, Class.id == ClassSchedule.class_id)
+                .join(Trainer, Trainer.id == Class.trainer_id)
+                .join(User, User.id == Trainer.user_id)
+                .order_by(ClassSchedule.id).limit(limit)).all()
+            self.rolls = []
+            seen = set()
+            for username, schedule_id, day in rows:
+                if username in seen:
+                    continue
+                seen.add(username)
+                day = day if isinstance(day, date) else date.fromisoformat(str(day))
+                members = conn.execute(
+                    select(Booking.user_id)
+                    .where(Booking.class_schedule_id == schedule_id, Booking.booking_date == day)
+                    .order_by(Booking.id)).scalars().all()
+                self.rolls.append((username, schedule_id, day, members))
+        rng.shuffle(self.members)
+        rng.shuffle(self.rolls)
+
+    def missing(self, scenario):
+        """Why ``scenario`` cannot run on this data, or None."""
+        needed = {'member': self.members, 'trainer': self.rolls, 'admin': self.admins}[scenario]
+        return None if needed else f'no {scenario} accounts with data to work on'
+
+
+def prepare_database(url, scale, seed):
+    """Create the schema and fill an empty database with generated data."""
+    engine = create_engine(url)
+    upgrade_schema(engine)
+    with engine.connect() as conn:
+        empty = not conn.execute(select(func.count()).select_from(User.__table__)).scalar()
+    if empty:
+        print(f'Database is empty; generating data at scale {scale}...', file=sys.stderr)
+        Generator(engine, seed=seed, scale=scale, log=lambda line: print(line, file=sys.stderr)).run()
+    # The catalog lists materialized occurrences; generate them up front as a deploy does
+    subprocess.run([sys.executable, 'occurrences.py'], cwd=ROOT, env=dict(os.environ, DATABASE_URL=url),
+                   check=True, stdout=subprocess.DEVNULL)
+    return engine
+
+
+# Clients
+
+class InProcessSession:
+    """One virtual user on the in-process app."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form=None, payload=None):
+        response = self.client.open(path, method=method, data=form, json=payload)
+        return response.status_code, response.get_data()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """One virtual user against a running server, with its own cookie jar."""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect)
+
+    def request(self, method, path, form=None, payload=None):
+        headers = {}
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif payload is not None:
+            body = json.dumps(payload).encode()
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+
+# Scenarios
+
+class Journey:
+    """Times every request of one scenario run and records it under the step name."""
+
+    def __init__(self, session, recorder):
+        self.session = session
+        self.recorder = recorder
+
+    def step(self, name, method, path, expect=(200,), **kwargs):
+        started = clock.perf_counter()
+        try:
+            status, body = self.session.request(method, path, **kwargs)
+        except OSError:
+            status, body = None, b''
+        self.recorder.record(name, clock.perf_counter() - started, status in expect)
+        return status, body
+
+    def login(self, username):
+        self.step('login', 'POST', '/login', expect=(302,),
+                  form={'username': username, 'password': DEFAULT_PASSWORD})
+
+    def logout(self):
+        self.step('logout', 'GET', '/logout', expect=(302,))
+
+
+def member_journey(journey, fixtures, rng, i):
+    journey.login(fixtures.members[i % len(fixtures.members)])
+    journey.step('services', 'GET', '/services')
+    status, body = journey.step('class_catalog', 'GET', '/api/class-catalog?days=28')
+    today = date.today().strftime('%Y-%m-%d')
+    open_slots = []
+    if status == 200:
+        for class_ in json.loads(body)['data']:
+            for schedule in class_['schedules']:
+                open_slots.extend((schedule['id'], occurrence['date']) for occurrence in schedule['occurrences']
+                                  if occurrence['remaining'] > 0 and occurrence['date'] >= today)
+    if open_slots:
+        schedule_id, day = rng.choice(open_slots)
+        # 400 is "class full": another virtual user took the last seat first
+        journey.step('book_class', 'POST', '/api/book-class', expect=(200, 400),
+                     payload={'class_schedule_id': schedule_id, 'booking_date': day})
+    journey.step('member_dashboard', 'GET', '/member')
+    journey.logout()
+
+
+def trainer_journey(journey, fixtures, rng, i):
+    username, schedule_id, day, members = fixtures.rolls[i % len(fixtures.rolls)]
+    journey.login(username)
+    journey.step('trainer_dashboard', 'GET', '/trainer')
+    journey.step('class_roll', 'GET', f'/api/schedule-bookings/{schedule_id}?date={day:%Y-%m-%d}')
+    journey.step('roll_call', 'POST', '/api/mark-attendance/bulk',
+                 payload={'class_schedule_id': schedule_id, 'date': f'{day:%Y-%m-%d}',
+                          'records': [{'user_id': user_id,
+                                       'status': rng.choice(('present', 'present', 'present', 'late', 'absent'))}
+                                      for user_id in members]})
+    journey.logout()
+
+
+def admin_journey(journey, fixtures, rng, i):
+    journey.login(fixtures.admins[i % len(fixtures.admins)])
+    journey.step('admin_dashboard', 'GET', '/admin')
+    for path in ADMIN_PAGES:
+        journey.step(path.rsplit('/', 1)[1], 'GET', path)
+    journey.logout()
+
+
+JOURNEYS = {'member': member_journey, 'trainer': trainer_journey, 'admin': admin_journey}
+
+
+# Running and reporting
+
+class Recorder:
+    """Thread-safe latency samples and error counts per step."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, step, seconds, ok):
+        with self._lock:
+            self.samples[step].append(seconds)
+            if not ok:
+                self.errors[step] += 1
+
+    def summary(self, elapsed):
+        steps = {}
+        for step, samples in self.samples.items():
+            ordered = sorted(samples)
+            steps[step] = {
+                'requests': len(ordered),
+                'errors': self.errors[step],
+                'rps': round(len(ordered) / elapsed, 2) if elapsed else None,
+                'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+                'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+                'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+                'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+            }
+        return steps
+
+
+def run_scenario(name, make_session, fixtures, iterations, concurrency, seed):
+    """Run ``iterations`` journeys over ``concurrency`` threads and summarise them."""
+    journey_fn = JOURNEYS[name]
+    recorder = Recorder()
+    counter = iter(range(iterations))
+    counter_lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(f'{seed}-{name}-{index}')
+        journey = Journey(make_session(), recorder)
+        while True:
+            with counter_lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            journey_fn(journey, fixtures, rng, i)
+
+    started = clock.perf_counter()
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = clock.perf_counter() - started
+
+    steps = recorder.summary(elapsed)
+    return {
+        'journeys': iterations,
+        'seconds': round(elapsed, 3),
+        'journeys_per_second': round(iterations / elapsed, 2) if elapsed else None,
+        'rps': round(sum(s['requests'] for s in steps.values()) / elapsed, 2) if elapsed else None,
+        'errors': sum(s['errors'] for s in steps.values()),
+        'steps': steps,
+    }
+
+
+# Run in a fresh interpreter per sample so no module is already imported
+STARTUP_PROBE = """
+import json, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app({'LOGIN_RATE_LIMIT_ENABLED': False})
+created = time.perf_counter()
+app.test_client().get('/healthz')
+served = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'create_app_ms': (created - imported) * 1000,
+                  'first_request_ms': (served - created) * 1000, 'total_ms': (served - started) * 1000}))
+"""
+STARTUP_PHASES = ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms')
+
+
+def measure_startup(database_url, runs):
+    """Median and worst time of each startup phase over ``runs`` fresh interpreters."""
+    env = dict(os.environ, DATABASE_URL=database_url)
+    samples = defaultdict(list)
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', STARTUP_PROBE], cwd=ROOT, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        for phase, value in json.loads(output.splitlines()[-1]).items():
+            samples[phase].append(value)
+    summary = {'runs': runs}
+    for phase in STARTUP_PHASES:
+        values = sorted(samples[phase])
+        summary[phase] = {'p50': round(percentile(values, 0.5), 1), 'max': round(values[-1], 1)}
+    return summary
+
+
+def compare(results, baseline, threshold=0.2, min_delta_ms=1.0):
+    """Return a message for every scenario or step that got slower than the baseline.
+
+    A step regresses when its p95 grows by more than ``threshold`` and by at
+    least ``min_delta_ms`` (sub-millisecond steps are mostly noise), or when it
+    fails requests the baseline did not. A scenario regresses when its
+    requests/sec drop by more than ``threshold``. Startup regresses when the
+    median total startup time grows by more than ``threshold``.
+    """
+    regressions = []
+    startup, previous = results.get('startup'), baseline.get('startup')
+    if startup and previous:
+        now, before = startup['total_ms']['p50'], previous['total_ms']['p50']
+        if now > before * (1 + threshold) and now - before >= min_delta_ms:
+            regressions.append(f'startup: p50 {now}ms, baseline {before}ms')
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        if previous.get('rps') and current['rps'] is not None and current['rps'] < previous['rps'] * (1 - threshold):
+            regressions.append(f'{name}: {current["rps"]} req/s, baseline {previous["rps"]} req/s')
+        for step, now in current['steps'].items():
+            before = previous['steps'].get(step)
+            if not before:
+                continue
+            if now['errors'] and not before['errors']:
+                regressions.append(f'{name}.{step}: {now["errors"]} failed requests, baseline had none')
+            if min(now['requests'], before['requests']) < MIN_SAMPLES:
+                continue
+            if now['p95_ms'] > before['p95_ms'] * (1 + threshold) and now['p95_ms'] - before['p95_ms'] >= min_delta_ms:
+                regressions.append(f'{name}.{step}: p95 {now["p95_ms"]}ms, baseline {before["p95_ms"]}ms')
+    return regressions
+
+
+def format_report(results):
+    lines = []
+    startup = results.get('startup')
+    if startup:
+        lines.append(f'startup ({startup["runs"]} runs): ' + ', '.join(
+            f'{phase[:-3]} {startup[phase]["p50"]}ms' for phase in STARTUP_PHASES))
+    lines += [f'{"step":<32} {"reqs":>6} {"err":>4} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}']
+    for name, scenario in results['scenarios'].items():
+        lines.append(f'{name} ({scenario["journeys"]} journeys, {scenario["seconds"]}s, '
+                     f'{scenario["rps"]} req/s)')
+        for step, s in scenario['steps'].items():
+            lines.append(f'  {step:<30} {s["requests"]:>6} {s["errors"]:>4} {s["rps"]:>9} '
+                         f'{s["p50_ms"]:>9} {s["p95_ms"]:>9} {s["p99_ms"]:>9}')
+    return '\n'.join(lines)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(database_url, workers, timeout=30):
+    """Start gunicorn on a free local port and wait until /healthz answers."""
+    port = _free_port()
+    # Every virtual user logs in from 127.0.0.1, which the login limiter would throttle
+    env = dict(os.environ, DATABASE_URL=database_url, LOGIN_RATE_LIMIT_ENABLED='0')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(workers),
+         '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'wsgi:app'], cwd=ROOT, env=env)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = clock.monotonic() + timeout
+    while clock.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'gunicorn exited with status {process.returncode}')
+        try:
+            with urllib.request.urlopen(base_url + '/healthz', timeout=1):
+                return process, base_url
+        except OSError:
+            clock.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f'gunicorn did not answer on {base_url} within {timeout}s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', default='sqlite:///perf_data.db')
+    parser.add_argument('--generate-scale', type=float, default=0.01,
+                        help='scale for generate_data.py when the database is empty')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--gunicorn', type=int, metavar='WORKERS', help='start a local gunicorn with this many workers')
+    target.add_argument('--url', help='benchmark an already running server (it must use the same database '
+                                      'and run with LOGIN_RATE_LIMIT_ENABLED=0)')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                        help='scenario to run, repeatable (default: all)')
+    parser.add_argument('--iterations', type=int, default=100, help='journeys per scenario')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='concurrent virtual users (default: 1 in-process, 8 over HTTP)')
+    parser.add_argument('--startup-runs', type=int, default=5,
+                        help='fresh interpreters to time app startup in, 0 to skip')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', default='bench_baseline.json')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results to the baseline file too')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown before flagging, 0.2 = 20%%')
+    args = parser.parse_args(argv)
+
+    # The app refuses to start without a key; gunicorn and the startup probes inherit it
+    os.environ.setdefault('SECRET_KEY', secrets.token_hex(32))
+    # Resolved like the app resolves it, so the generated data and the app share one file
+    database_url = database_config({'DATABASE_URL': args.database_url})['SQLALCHEMY_DATABASE_URI']
+    engine = prepare_database(database_url, args.generate_scale, args.seed)
+    fixtures = Fixtures(engine, seed=args.seed)
+    engine.dispose()
+
+    process = None
+    if args.url or args.gunicorn:
+        if args.gunicorn:
+            process, base_url = start_gunicorn(database_url, args.gunicorn)
+        else:
+            base_url = args.url
+        target = base_url if args.url else f'gunicorn x{args.gunicorn}'
+        make_session = lambda: HttpSession(base_url)
+        concurrency = args.concurrency or 8
+    else:
+        # create_app() reads DATABASE_URL
+        os.environ['DATABASE_URL'] = database_url
+        from app import create_app
+        app = create_app({'LOGIN_RATE_LIMIT_ENABLED': False})
+        target = 'in-process'
+        make_session = lambda: InProcessSession(app)
+        concurrency = args.concurrency or 1
+
+    results = {
+        'created_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'target': target,
+        'database': make_url(database_url).render_as_string(hide_password=True),
+        'iterations': args.iterations,
+        'concurrency': concurrency,
+        'scenarios': {},
+    }
+    if args.startup_runs > 0:
+        results['startup'] = measure_startup(database_url, args.startup_runs)
+    try:
+        for name in args.scenario or SCENARIOS:
+            reason = fixtures.missing(name)
+            if reason:
+                print(f'Skipping {name}: {reason}', file=sys.stderr)
+                continue
+            results['scenarios'][name] = run_scenario(name, make_session, fixtures, args.iterations,
+                                                      concurrency, args.seed)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    print(format_report(results))
+    with open(args.output, 'w') as fh:
+        json.dump(results, fh, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as fh:
+            json.dump(results, fh, indent=2)
+        print(f'Baseline saved to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}; run with --save-baseline to record one.')
+        return 0
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    if (baseline.get('target'), baseline.get('concurrency')) != (target, concurrency):
+        print(f'Note: the baseline ran {baseline.get("target")} with concurrency {baseline.get("concurrency")}.')
+    regressions = compare(results, baseline, args.threshold)
+    for message in regressions:
+        print(f'REGRESSION {message}')
+    if not regressions:
+        print(f'No regressions against {args.baseline}.')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Atomic class capacity accounting.
+
+Each class occurrence (see ``occurrences.py``) holds its capacity and its
+confirmed seat count. Claiming a seat is a single conditional UPDATE that only
+succeeds while the count is below capacity, so concurrent workers cannot
+overbook and no request has to count bookings. A date the schedule does not
+run on has no occurrence, so no seat can be claimed on it. The caller owns the
+transaction: a failed booking insert must roll back to release the claimed
+seat.
+
+A booking's status moves between confirmed and cancelled the same way, with
+an UPDATE conditional on the status the request expects (see
+``change_booking_status``). Of two requests cancelling or rebooking the same
+booking at once only one matches the row, so only that one releases or keeps
+a seat.
+"""
+from sqlalchemy import select, update
+
+from models import db, Booking, ClassOccurrence
+from occurrences import ensure_occurrences
+
+
+def reserve_seat(schedule, booking_date):
+    """Claim one seat; return False when the class is full or does not run on ``booking_date``."""
+    ensure_occurrences(schedule, [booking_date])
+    result = db.session.execute(
+        update(ClassOccurrence)
+        .where(ClassOccurrence.class_schedule_id == schedule.id,
+               ClassOccurrence.occurrence_date == booking_date,
+               ClassOccurrence.booked_count < ClassOccurrence.capacity)
+        .values(booked_count=ClassOccurrence.booked_count + 1)
+        .execution_options(synchronize_session=False))
+    return result.rowcount == 1
+
+
+def reserve_seats(schedule, booking_dates):
+    """Claim one seat on each of ``booking_dates``; return the dates that had one.
+
+    All dates are checked and claimed by a single conditional UPDATE.
+    """
+    booking_dates = set(booking_dates)
+    ensure_occurrences(schedule, booking_dates)
+    statement = (update(ClassOccurrence)
+                 .where(ClassOccurrence.class_schedule_id == schedule.id,
+                        ClassOccurrence.occurrence_date.in_(booking_dates),
+                        ClassOccurrence.booked_count < ClassOccurrence.capacity)
+                 .values(booked_count=ClassOccurrence.booked_count + 1))
+    if db.session.get_bind().dialect.update_returning:
+        return set(db.session.scalars(statement.returning(ClassOccurrence.occurrence_date)
+                                      .execution_options(synchronize_session=False)))
+    return {booking_date for booking_date in sorted(booking_dates) if reserve_seat(schedule, booking_date)}
+
+
+def release_seat(class_schedule_id, booking_date):
+    """Give back one seat of a cancelled confirmed booking."""
+    db.session.execute(
+        update(ClassOccurrence)
+        .where(ClassOccurrence.class_schedule_id == class_schedule_id,
+               ClassOccurrence.occurrence_date == booking_date,
+               ClassOccurrence.booked_count > 0)
+        .values(booked_count=ClassOccurrence.booked_count - 1)
+        .execution_options(synchronize_session=False))
+
+
+def change_booking_status(booking_id, from_status, to_status):
+    """Move a booking from ``from_status`` to ``to_status``; return False if it no longer had ``from_status``."""
+    result = db.session.execute(
+        update(Booking)
+        .where(Booking.id == booking_id, Booking.status == from_status)
+        .values(status=to_status)
+        .execution_options(synchronize_session=False))
+    return result.rowcount == 1
+
+
+def is_full(schedule, booking_date):
+    """Whether every seat of the occurrence is taken."""
+    ensure_occurrences(schedule, [booking_date])
+    occurrence = db.session.execute(select(ClassOccurrence.booked_count, ClassOccurrence.capacity).where(
+        ClassOccurrence.class_schedule_id == schedule.id,
+        ClassOccurrence.occurrence_date == booking_date)).first()
+    return occurrence is not None and occurrence.booked_count >= occurrence.capacity
@@ -0,0 +1,78 @@
+"""
+Class catalog with per-date seat availability.
+
+Builds everything the booking UI needs — active classes, their active
+schedules and the remaining seats of every occurrence in a date range — with
+two SELECTs: one for the schedules joined to their class and trainer, one
+range scan of the materialized occurrences (see ``occurrences.py``).
+"""
+from models import db, Class, ClassOccurrence, ClassSchedule, Trainer, User
+from queries import with_profile
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+DEFAULT_DAYS = 14
+MAX_DAYS = 28
+
+
+def clamp_days(value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_DAYS
+    return max(1, min(value, MAX_DAYS))
+
+
+def occurrences_between(schedule_ids, start, end):
+    """Map each schedule id to its occurrences between ``start`` and ``end``, by date."""
+    occurrences = {}
+    if not schedule_ids:
+        return occurrences
+    rows = (db.session.query(ClassOccurrence.class_schedule_id, ClassOccurrence.occurrence_date,
+                             ClassOccurrence.capacity, ClassOccurrence.booked_count)
+            .filter(ClassOccurrence.occurrence_date.between(start, end),
+                    ClassOccurrence.class_schedule_id.in_(schedule_ids))
+            .order_by(ClassOccurrence.occurrence_date)
+            .all())
+    for schedule_id, day, capacity, booked in rows:
+        occurrences.setdefault(schedule_id, []).append((day, capacity, booked))
+    return occurrences
+
+
+def build_catalog(start, end):
+    """Return the active classes with schedules and availability as plain dicts."""
+    schedules = (with_profile(ClassSchedule.query.join(Class).join(Trainer).join(User), 'class_catalog')
+                 .filter(Class.is_active == True, ClassSchedule.is_active == True)
+                 .order_by(Class.name, Class.id, ClassSchedule.day_of_week, ClassSchedule.start_time)
+                 .all())
+    occurrences_by_schedule = occurrences_between([s.id for s in schedules], start, end)
+
+    classes = {}
+    for s in schedules:
+        class_ = s.class_
+        entry = classes.get(class_.id)
+        if entry is None:
+            entry = classes[class_.id] = {
+                'id': class_.id,
+                'name': class_.name,
+                'category': class_.category,
+                'duration_minutes': class_.duration_minutes,
+                'price': class_.price,
+                'max_capacity': class_.max_capacity,
+                'trainer_name': class_.trainer.user.full_name,
+                'schedules': [],
+            }
+        occurrences = [{
+            'date': day.strftime('%Y-%m-%d'),
+            'booked': booked,
+            'remaining': max(capacity - booked, 0),
+        } for day, capacity, booked in occurrences_by_schedule.get(s.id, [])]
+        entry['schedules'].append({
+            'id': s.id,
+            'day_of_week': s.day_of_week,
+            'day_name': DAY_NAMES[s.day_of_week] if 0 <= s.day_of_week <= 6 else str(s.day_of_week),
+            'start_time': s.start_time.strftime('%H:%M'),
+            'end_time': s.end_time.strftime('%H:%M'),
+            'room': s.room or '-',
+            'occurrences': occurrences,
+        })
+    return list(classes.values())
@@ -0,0 +1,341 @@
+"""
+QR-code self check-in at the front desk kiosk.
+
+Every confirmed booking has a check-in token: the booking, member, schedule
+and date packed into 14 bytes, followed by a truncated HMAC of them keyed by
+``SECRET_KEY``, and base32-encoded to 39 characters. Base32 stays inside the
+QR alphanumeric alphabet, so the code is small and quick to scan.
+
+The kiosk endpoint trusts a token whose signature checks out and whose date
+is today, so it answers without a database read. Accepted check-ins are
+queued and a background thread per worker writes them in micro-batches, at
+most ``CHECKIN_BATCH_SIZE`` rows or ``CHECKIN_BATCH_SECONDS`` apart. Each
+batch is one SELECT to confirm the bookings are still confirmed (a cancelled
+booking keeps a valid signature) and one attendance upsert. A batch that
+cannot be written goes back to the front of the queue and is retried with
+exponential backoff from ``CHECKIN_RETRY_SECONDS``; after
+``CHECKIN_RETRIES`` failed retries it is dropped and logged.
+
+QR images are rendered on first request and kept in memory and, with
+``CHECKIN_QR_DIR`` set, on disk. ``python checkin.py`` renders tomorrow's
+codes ahead of time. ``qrcode`` and Pillow are imported only when an image
+is rendered.
+"""
+import argparse
+import atexit
+import base64
+import hashlib
+import hmac
+import io
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select
+
+from attendance import write_attendance
+from cache import LocalCache
+from metrics import CHECKIN_BATCHES, CHECKINS
+from models import db, Booking
+
+DEFAULTS = {
+    # Directory shared by the workers for rendered QR images; unset keeps them in memory
+    'CHECKIN_QR_DIR': None,
+    'CHECKIN_BATCH_SIZE': 50,
+    'CHECKIN_BATCH_SECONDS': 0.5,
+    # Retries of a batch whose write failed, the first after this many seconds, then doubling
+    'CHECKIN_RETRIES': 5,
+    'CHECKIN_RETRY_SECONDS': 1.0,
+    # Lets a kiosk check members in without a staff login (sent as X-Kiosk-Key)
+    'CHECKIN_KIOSK_KEY': None,
+}
+
+logger = logging.getLogger('fitclub.checkin')
+
+_PAYLOAD = struct.Struct('>IIIH')
+_MAC_BYTES = 10
+_EPOCH = date(2000, 1, 1)
+
+CheckInToken = namedtuple('CheckInToken', 'booking_id user_id class_schedule_id booking_date')
+
+
+class TokenSigner:
+    """Signs and verifies check-in tokens."""
+
+    def __init__(self, secret):
+        self._key = hashlib.sha256(b'fitclub-checkin:' + secret.encode()).digest()
+
+    def _mac(self, payload):
+        return hmac.new(self._key, payload, hashlib.sha256).digest()[:_MAC_BYTES]
+
+    def sign(self, booking_id, user_id, class_schedule_id, booking_date):
+        payload = _PAYLOAD.pack(booking_id, user_id, class_schedule_id, (booking_date - _EPOCH).days)
+        return base64.b32encode(payload + self._mac(payload)).decode().rstrip('=')
+
+    def load(self, token):
+        """Return the :class:`CheckInToken` in ``token``, or None if it is malformed or forged."""
+        if not isinstance(token, str):
+            return None
+        token = token.strip().upper()
+        try:
+            raw = base64.b32decode(token + '=' * (-len(token) % 8))
+        except ValueError:
+            return None
+        payload, mac = raw[:_PAYLOAD.size], raw[_PAYLOAD.size:]
+        if len(raw) != _PAYLOAD.size + _MAC_BYTES or not hmac.compare_digest(mac, self._mac(payload)):
+            return None
+        booking_id, user_id, class_schedule_id, days = _PAYLOAD.unpack(payload)
+        return CheckInToken(booking_id, user_id, class_schedule_id, _EPOCH + timedelta(days=days))
+
+    def for_booking(self, booking):
+        return self.sign(booking.id, booking.user_id, booking.class_schedule_id, booking.booking_date)
+
+
+def render_qr(token):
+    """PNG bytes of a QR code for ``token``."""
+    import qrcode
+    from qrcode.constants import ERROR_CORRECT_M
+
+    code = qrcode.QRCode(error_correction=ERROR_CORRECT_M, box_size=8, border=2)
+    code.add_data(token)
+    code.make(fit=True)
+    buffer = io.BytesIO()
+    code.make_image().save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class QRImages:
+    """Rendered QR images by token, in memory and optionally in a directory."""
+
+    def __init__(self, directory=None, maxsize=2048, ttl=86400):
+        self.directory = directory
+        self._memory = LocalCache(maxsize=maxsize, ttl=ttl)
+
+    def _path(self, token):
+        return os.path.join(self.directory, f'{token}.png')
+
+    def get(self, token):
+        image = self._memory.get(token)
+        if image is not None:
+            return image
+        if self.directory:
+            try:
+                with open(self._path(token), 'rb') as fh:
+                    image = fh.read()
+            except OSError:
+                pass
+        if image is None:
+            image = render_qr(token)
+            self._write(token, image)
+        self._memory.set(token, image)
+        return image
+
+    def _write(self, token, image):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.qr-')
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(image)
+        os.replace(tmp, self._path(token))
+
+    def has(self, token):
+        return self._memory.get(token) is not None or bool(self.directory and os.path.exists(self._path(token)))
+
+
+class CheckInBatcher:
+    """Queues accepted check-ins and writes them in batches from a background thread."""
+
+    def __init__(self, app, batch_size=50, max_delay=0.5, retries=5, retry_delay=1.0, clock=time.monotonic):
+        self.app = app
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._clock = clock
+        self._pid = None
+        self._start_lock = threading.Lock()
+        # Bookings this worker already accepted today, so repeated scans are not queued again
+        self._seen = LocalCache(maxsize=100_000, ttl=86400)
+
+    def _start(self):
+        # Threads and queued rows do not survive a fork; start over in each worker
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._pending = []
+                self._condition = threading.Condition()
+                # Failed writes in a row, and when the queue may be written again
+                self._failures = 0
+                self._retry_at = 0.0
+                self._seen.clear()
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='checkin-writer', daemon=True).start()
+                atexit.register(self.flush)
+
+    def add(self, token):
+        """Queue ``token``'s check-in; return False if this worker already accepted it."""
+        self._start()
+        if self._seen.get(token.booking_id):
+            return False
+        self._seen.set(token.booking_id, True)
+        with self._condition:
+            self._pending.append((token, datetime.utcnow(), self._clock()))
+            # Wake the writer for the first row (to start the delay) and for a full batch
+            if len(self._pending) in (1, self.batch_size):
+                self._condition.notify()
+        return True
+
+    def _take(self):
+        with self._condition:
+            batch, self._pending = self._pending, []
+        return batch
+
+    def _due_in(self):
+        """Seconds until the queue is due to be written; None while it is empty."""
+        if not self._pending:
+            return None
+        now = self._clock()
+        if self._retry_at > now:
+            return self._retry_at - now
+        if len(self._pending) >= self.batch_size:
+            return 0
+        return self._pending[0][2] + self.max_delay - now
+
+    def _run(self):
+        while True:
+            with self._condition:
+                wait = self._due_in()
+                while wait is None or wait > 0:
+                    self._condition.wait(wait)
+                    wait = self._due_in()
+            self.flush()
+
+    def _retry_later(self, batch):
+        """Put a batch that failed back at the front of the queue; return False once it ran out of retries."""
+        self._failures += 1
+        if self._failures > self.retries:
+            self._failures = 0
+            self._retry_at = 0.0
+            return False
+        delay = self.retry_delay * 2 ** (self._failures - 1)
+        with self._condition:
+            self._pending[:0] = batch
+            self._retry_at = self._clock() + delay
+        logger.warning('could not record %d check-ins, retry %d of %d in %.1fs',
+                       len(batch), self._failures, self.retries, delay, exc_info=True)
+        CHECKINS.inc(len(batch), result='retried')
+        return True
+
+    def flush(self):
+        """Write every queued check-in now; return how many were recorded."""
+        if self._pid != os.getpid():
+            return 0
+        batch = self._take()
+        if not batch:
+            return 0
+        try:
+            with self.app.app_context():
+                recorded = self._write(batch)
+                db.session.commit()
+        except Exception:
+            if self._retry_later(batch):
+                return 0
+            logger.exception('could not record %d check-ins, dropping them', len(batch))
+            CHECKINS.inc(len(batch), result='failed')
+            for token, _, _ in batch:
+                self._seen.delete(token.booking_id)
+            return 0
+        self._failures = 0
+        self._retry_at = 0.0
+        CHECKIN_BATCHES.observe(len(batch))
+        CHECKINS.inc(recorded, result='recorded')
+        if len(batch) > recorded:
+            CHECKINS.inc(len(batch) - recorded, result='rejected')
+        return recorded
+
+    def _write(self, batch):
+        confirmed = {tuple(row) for row in db.session.execute(
+            select(Booking.id, Booking.user_id, Booking.class_schedule_id, Booking.booking_date)
+            .where(Booking.id.in_({token.booking_id for token, _, _ in batch}), Booking.status == 'confirmed'))}
+        rows = {}
+        for token, scanned_at, _ in batch:
+            if tuple(token) in confirmed:
+                rows[token.booking_id] = dict(user_id=token.user_id, class_schedule_id=token.class_schedule_id,
+                                              attendance_date=token.booking_date, status='present',
+                                              check_in_time=scanned_at)
+        write_attendance(list(rows.values()))
+        return len(rows)
+
+
+def _setting(app, name):
+    return app.config.get(name, DEFAULTS[name])
+
+
+def get_token_signer(app=None):
+    app = app or current_app._get_current_object()
+    signer = app.extensions.get('checkin_signer')
+    if signer is None:
+        signer = app.extensions['checkin_signer'] = TokenSigner(app.config['SECRET_KEY'])
+    return signer
+
+
+def get_qr_images(app=None):
+    app = app or current_app._get_current_object()
+    images = app.extensions.get('checkin_qr')
+    if images is None:
+        images = app.extensions['checkin_qr'] = QRImages(_setting(app, 'CHECKIN_QR_DIR'))
+    return images
+
+
+def get_checkin_batcher(app=None):
+    app = app or current_app._get_current_object()
+    batcher = app.extensions.get('checkin_batcher')
+    if batcher is None:
+        batcher = app.extensions['checkin_batcher'] = CheckInBatcher(
+            app, _setting(app, 'CHECKIN_BATCH_SIZE'), _setting(app, 'CHECKIN_BATCH_SECONDS'),
+            _setting(app, 'CHECKIN_RETRIES'), _setting(app, 'CHECKIN_RETRY_SECONDS'))
+    return batcher
+
+
+def kiosk_key_matches(key, app=None):
+    expected = _setting(app or current_app, 'CHECKIN_KIOSK_KEY')
+    return bool(expected and key) and hmac.compare_digest(key.encode(), expected.encode())
+
+
+def pregenerate_qr_codes(day, app=None):
+    """Render the QR images of ``day``'s confirmed bookings that are not cached yet; return how many."""
+    signer, images = get_token_signer(app), get_qr_images(app)
+    rendered = 0
+    for booking in Booking.query.filter_by(booking_date=day, status='confirmed').yield_per(500):
+        token = signer.for_booking(booking)
+        if not images.has(token):
+            images.get(token)
+            rendered += 1
+    return rendered
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the check-in QR codes of a day's bookings")
+    parser.add_argument('--date', type=date.fromisoformat, default=date.today() + timedelta(days=1),
+                        help='booking date, YYYY-MM-DD (default: tomorrow)')
+    args = parser.parse_args(argv)
+
+    from app import create_app
+
+    app = create_app()
+    if not _setting(app, 'CHECKIN_QR_DIR'):
+        raise SystemExit('Set CHECKIN_QR_DIR so the workers can serve the rendered images')
+    with app.app_context():
+        print(f'Rendered {pregenerate_qr_codes(args.date)} QR codes for {args.date}')
+
+
+if __name__ == '__main__':
+    main()
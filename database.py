@@ -0,0 +1,165 @@
+"""
+Database configuration from the environment and connection-level setup.
+
+``DATABASE_URL`` selects the database (SQLite by default). A relative SQLite
+path is resolved in the ``instance/`` folder next to this file, where
+Flask-SQLAlchemy puts it for the app, so scripts that build their own engine
+from ``database_config()`` (``migrations.py``, ``generate_data.py``) open the
+same file as the workers. For a server
+database such as PostgreSQL the engine gets a bounded connection pool sized
+by ``DB_POOL_SIZE`` and ``DB_MAX_OVERFLOW`` per worker process, with
+pre-ping so connections dropped by the server or a proxy are replaced
+transparently, and recycling so none outlive idle-connection timeouts.
+``DATABASE_REPLICA_URL`` adds a read replica engine (see ``routing.py``).
+
+For SQLite every new connection gets the pragmas below: WAL so readers and
+the single writer stop blocking each other, ``synchronous=NORMAL`` (safe with
+WAL, one fsync per checkpoint instead of per commit), a busy timeout so a
+writer waits for the lock instead of failing with "database is locked",
+foreign key enforcement, and a larger page cache and memory map. Override
+single pragmas with the ``SQLITE_PRAGMAS`` config dict or turn the whole
+thing off with ``SQLITE_TUNING = False``.
+
+Engines are disposed in a forked child (e.g. gunicorn workers of a
+``preload_app`` master) so no worker reuses a connection opened before the
+fork.
+"""
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+from models import db
+
+DEFAULT_DATABASE_URL = 'sqlite:///fitness_club.db'
+# The app's instance folder, against which Flask-SQLAlchemy resolves relative SQLite paths
+INSTANCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+
+# busy_timeout comes first so the pragmas after it wait for locks too
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'foreign_keys': 'ON',
+    'cache_size': -65536,  # KiB per connection
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+DEFAULTS = {
+    'SQLITE_TUNING': True,
+    'SQLITE_PRAGMAS': {},
+}
+
+
+def _normalize_url(url):
+    if url.startswith('postgres://'):
+        # Scheme still handed out by some hosting providers; SQLAlchemy only accepts postgresql://
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def _anchor_sqlite_path(url):
+    parsed = make_url(url)
+    path = parsed.database
+    if parsed.get_backend_name() != 'sqlite' or not path or path == ':memory:' \
+            or path.startswith('file:') or os.path.isabs(path):
+        return url
+    os.makedirs(INSTANCE_DIR, exist_ok=True)
+    return parsed.set(database=os.path.join(INSTANCE_DIR, path)).render_as_string(hide_password=False)
+
+
+def _engine_options(url, environ):
+    backend = make_url(url).get_backend_name()
+    if backend == 'sqlite':
+        return {}
+    options = {
+        'pool_size': int(environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(environ.get('DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': float(environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': environ.get('DB_POOL_PRE_PING', '1') != '0',
+    }
+    if backend == 'postgresql':
+        options['connect_args'] = {'connect_timeout': int(environ.get('DB_CONNECT_TIMEOUT', 5))}
+    return options
+
+
+def database_config(environ=None):
+    """Flask-SQLAlchemy settings read from ``environ`` (default ``os.environ``)."""
+    environ = os.environ if environ is None else environ
+    url = _anchor_sqlite_path(_normalize_url(environ.get('DATABASE_URL') or DEFAULT_DATABASE_URL))
+    config = {'SQLALCHEMY_DATABASE_URI': url}
+    options = _engine_options(url, environ)
+    if options:
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    replica_url = environ.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        replica_url = _anchor_sqlite_path(_normalize_url(replica_url))
+        config['DATABASE_REPLICA_URL'] = replica_url
+        config['DATABASE_REPLICA_ENGINE_OPTIONS'] = _engine_options(replica_url, environ)
+    return config
+
+
+def sqlite_pragmas(overrides=None):
+    """The default pragmas with ``overrides`` applied; a value of None drops a pragma."""
+    pragmas = dict(SQLITE_PRAGMAS)
+    pragmas.update(overrides or {})
+    return {name: value for name, value in pragmas.items() if value is not None}
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def configure_engine(engine, pragmas=None):
+    """Run the connection setup for ``engine``'s dialect on every new connection."""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas() if pragmas is None else pragmas
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+
+def _setting(app, name):
+    return app.config.get(name, DEFAULTS[name])
+
+
+def init_database(app):
+    """Configure the engine of ``app`` (created by ``db.init_app``) and create its replica engine."""
+    tuning = _setting(app, 'SQLITE_TUNING')
+    pragmas = sqlite_pragmas(_setting(app, 'SQLITE_PRAGMAS'))
+    if tuning:
+        with app.app_context():
+            configure_engine(db.engine, pragmas)
+
+    replica_url = app.config.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        replica = create_engine(replica_url, **app.config.get('DATABASE_REPLICA_ENGINE_OPTIONS', {}))
+        if tuning:
+            configure_engine(replica, pragmas)
+        app.extensions['db_replica'] = replica
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=lambda: dispose_engines(app))
+
+
+def dispose_engines(app):
+    """Drop the pooled connections of ``app``'s engines without closing them.
+
+    Closing would send a terminate message on sockets the parent still uses.
+    """
+    with app.app_context():
+        engines = list(db.engines.values())
+    if app.extensions.get('db_replica') is not None:
+        engines.append(app.extensions['db_replica'])
+    for engine in engines:
+        engine.dispose(close=False)
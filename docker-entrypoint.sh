@@ -1,21 +1,17 @@
 #!/usr/bin/env sh
 set -e
 
+# Worker metric snapshots from a previous run would be summed into this one
+if [ -n "$METRICS_DIR" ]; then
+  rm -rf "$METRICS_DIR"
+  mkdir -p "$METRICS_DIR"
+fi
+
 # Initialize DB schema and ensure base roles exist
-python - <<'PY'
-from app import app, db
-from models import Role
+python migrations.py
 
-with app.app_context():
-    db.create_all()
-    created = False
-    for rn in ['admin', 'trainer', 'member']:
-        if not Role.query.filter_by(name=rn).first():
-            db.session.add(Role(name=rn, description=f'{rn.title()} role'))
-            created = True
-    if created:
-        db.session.commit()
-PY
+# Generate the class occurrences of the coming months; workers keep them topped up
+python occurrences.py
 
 exec "$@"
 
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for performance testing.
+
+Fills a database with realistic, reproducible volumes: at ``--scale 1`` about
+100k users, 50k members, 500 trainers, 5k weekly schedules, 10M bookings with
+attendance for past classes, monthly payments and multi-year progress logs.
+Only members (with a ``Member`` profile) get the member role; the remaining
+users are registered accounts without a role. Rows are streamed in batches through executemany inserts, so memory stays
+flat and a full-scale SQLite load finishes in minutes.
+
+    python generate_data.py --database-url sqlite:///perf_data.db --scale 0.1 --seed 42
+"""
+import argparse
+import random
+import sys
+import time as clock
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import create_engine, event, func, select, text
+from werkzeug.security import generate_password_hash
+
+from database import database_config
+from migrations import upgrade_schema
+from models import (db, User, Role, UserRole, Member, Trainer, MembershipPlan, Class, ClassSchedule,
+                    Booking, Payment, Attendance, ProgressLog, Announcement)
+
+# Row counts at scale 1
+FULL_SCALE = {
+    'users': 100_000,
+    'members': 50_000,
+    'trainers': 500,
+    'schedules': 5_000,
+    'bookings': 10_000_000,
+}
+SCHEDULES_PER_CLASS = 5
+DEFAULT_PASSWORD = 'password123'
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David',
+               'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah',
+               'Priya', 'Arjun', 'Wei', 'Mei', 'Carlos', 'Sofia', 'Ahmed', 'Fatima', 'Yuki', 'Kenji']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Taylor', 'Thomas', 'Moore', 'Kumar',
+              'Sharma', 'Chen', 'Wang', 'Tanaka', 'Silva', 'Khan']
+CATEGORIES = {
+    'Strength': ['Power Lifting', 'Functional Strength', 'Kettlebell Basics', 'Body Pump'],
+    'Cardio': ['Spin Express', 'Rowing Intervals', 'Step Aerobics', 'Treadmill Club'],
+    'Yoga': ['Vinyasa Flow', 'Hatha Yoga', 'Yin Yoga', 'Power Yoga'],
+    'Pilates': ['Mat Pilates', 'Reformer Pilates', 'Core Pilates'],
+    'HIIT': ['HIIT Cardio', 'Tabata Blast', 'Bootcamp'],
+    'Dance': ['Zumba', 'Dance Cardio', 'Barre'],
+}
+ROOMS = ['Studio A', 'Studio B', 'Studio C', 'Spin Room', 'Main Floor', 'Yoga Loft']
+PLANS = [('Basic', 1, 29.99, 8), ('Premium', 3, 79.99, 20), ('VIP', 12, 299.99, 50)]
+PAYMENT_METHODS = ['card', 'card', 'card', 'online', 'cash']
+
+
+class Generator:
+    def __init__(self, engine, seed=42, scale=1.0, years=2, batch_size=10_000, end_date=None, log=print):
+        self.engine = engine
+        self.random = random.Random(seed)
+        self.scale = scale
+        self.years = years
+        self.batch_size = batch_size
+        self.end_date = end_date or date.today()
+        self.start_date = self.end_date - timedelta(days=365 * years)
+        self.log = log
+        self.counts = {name: max(1, int(round(n * scale))) for name, n in FULL_SCALE.items()}
+        self.counts['members'] = min(self.counts['members'], self.counts['users'] - self.counts['trainers'] - 1)
+        self.inserted = {}
+
+    # Helpers
+
+    def _insert(self, conn, model, rows):
+        """Insert an iterable of row dicts in executemany batches."""
+        table = model.__table__
+        total = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                conn.execute(table.insert(), batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            conn.execute(table.insert(), batch)
+            total += len(batch)
+        self.inserted[table.name] = self.inserted.get(table.name, 0) + total
+        return total
+
+    def _timestamp(self, day):
+        return datetime.combine(day, time(self.random.randint(6, 21), self.random.randint(0, 59)))
+
+    def _random_day(self, start=None, end=None):
+        start = start or self.start_date
+        end = end or self.end_date
+        return start + timedelta(days=self.random.randint(0, max((end - start).days, 0)))
+
+    # Steps
+
+    def run(self):
+        with self.engine.begin() as conn:
+            if conn.execute(select(func.count()).select_from(User.__table__)).scalar():
+                raise SystemExit('Database already has users; pass --reset to replace its contents.')
+        steps = [self._roles_and_plans, self._users, self._profiles, self._classes, self._bookings,
+                 self._payments, self._progress, self._announcements, self._reset_sequences]
+        for step in steps:
+            started = clock.perf_counter()
+            with self.engine.begin() as conn:
+                step(conn)
+            self.log(f'{step.__name__.strip("_"):<16} {clock.perf_counter() - started:8.1f}s')
+        return self.inserted
+
+    def _roles_and_plans(self, conn):
+        self.role_ids = {}
+        for name in ('admin', 'trainer', 'member'):
+            self.role_ids[name] = conn.execute(Role.__table__.insert().values(
+                name=name, description=f'{name.title()} role')).inserted_primary_key[0]
+        self.plan_ids = []
+        for name, months, price, max_classes in PLANS:
+            self.plan_ids.append((name, conn.execute(MembershipPlan.__table__.insert().values(
+                name=name, description=f'{name} plan', duration_months=months, price=price,
+                max_classes_per_month=max_classes, is_active=True,
+                created_at=datetime.combine(self.start_date, time(9)))).inserted_primary_key[0]))
+
+    def _users(self, conn):
+        # Hashing is deliberately slow, so every synthetic user shares one hash
+        password_hash = generate_password_hash(DEFAULT_PASSWORD)
+        n_users, n_trainers, n_members = self.counts['users'], self.counts['trainers'], self.counts['members']
+
+        def role(i):
+            if i == 1:
+                return 'admin'
+            if i <= 1 + n_trainers:
+                return 'trainer'
+            return 'member' if i < 2 + n_trainers + n_members else None
+
+        def rows():
+            for i in range(1, n_users + 1):
+                prefix = role(i) or 'user'
+                first, last = self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+                created = self._timestamp(self._random_day())
+                yield {
+                    'id': i,
+                    'username': f'{prefix}{i:07d}',
+                    'email': f'{prefix}{i:07d}@example.com',
+                    'password_hash': password_hash,
+                    'first_name': first,
+                    'last_name': last,
+                    'phone': f'555{self.random.randint(0, 9_999_999):07d}',
+                    'gender': self.random.choice(['male', 'female']),
+                    'is_active': True,
+                    'created_at': created,
+                    'updated_at': created,
+                }
+        self._insert(conn, User, rows())
+        self.trainer_user_ids = list(range(2, 2 + n_trainers))
+        self.member_user_ids = list(range(2 + n_trainers, 2 + n_trainers + n_members))
+
+        def role_rows():
+            for i in range(1, n_users + 1):
+                if role(i):
+                    yield {'user_id': i, 'role_id': self.role_ids[role(i)]}
+        self._insert(conn, UserRole, role_rows())
+
+    def _profiles(self, conn):
+        specializations = list(CATEGORIES)
+
+        def trainer_rows():
+            for n, user_id in enumerate(self.trainer_user_ids, 1):
+                yield {
+                    'id': n,
+                    'user_id': user_id,
+                    'trainer_id': f'TR{n:05d}',
+                    'specialization': self.random.choice(specializations),
+                    'experience_years': self.random.randint(0, 25),
+                    'hourly_rate': float(self.random.randint(30, 120)),
+                    'is_active': True,
+                }
+        self._insert(conn, Trainer, trainer_rows())
+        self.trainer_ids = list(range(1, len(self.trainer_user_ids) + 1))
+
+        def member_rows():
+            for n, user_id in enumerate(self.member_user_ids, 1):
+                plan_name, plan_id = self.random.choice(self.plan_ids)
+                joined = self._random_day()
+                height = round(self.random.uniform(150, 195), 1)
+                weight = round(self.random.uniform(50, 110), 1)
+                yield {
+                    'user_id': user_id,
+                    'membership_number': f'MB{n:07d}',
+                    'membership_type': plan_name,
+                    'join_date': joined,
+                    'expiry_date': self.end_date + timedelta(days=self.random.randint(-60, 365)),
+                    'current_weight': weight,
+                    'target_weight': round(weight + self.random.uniform(-15, 10), 1),
+                    'height': height,
+                    'is_active': True,
+                    'plan_id': plan_id,
+                }
+        self._insert(conn, Member, member_rows())
+
+    def _classes(self, conn):
+        n_schedules = self.counts['schedules']
+        n_classes = max(1, n_schedules // SCHEDULES_PER_CLASS)
+        self.classes = {}
+
+        def class_rows():
+            for class_id in range(1, n_classes + 1):
+                category = self.random.choice(list(CATEGORIES))
+                capacity = self.random.choice([15, 20, 25, 30, 40])
+                self.classes[class_id] = capacity
+                yield {
+                    'id': class_id,
+                    'name': f'{self.random.choice(CATEGORIES[category])} {class_id}',
+                    'trainer_id': self.random.choice(self.trainer_ids),
+                    'category': category,
+                    'max_capacity': capacity,
+                    'duration_minutes': self.random.choice([30, 45, 60, 75]),
+                    'price': float(self.random.choice([0, 10, 12, 15, 20])),
+                    'is_active': True,
+                }
+        self._insert(conn, Class, class_rows())
+
+        self.schedules = []
+
+        def schedule_rows():
+            for schedule_id in range(1, n_schedules + 1):
+                class_id = (schedule_id - 1) % n_classes + 1
+                day_of_week = self.random.randint(0, 6)
+                start = time(self.random.choice([6, 7, 8, 9, 12, 17, 18, 19]), self.random.choice([0, 15, 30]))
+                end = (datetime.combine(date.min, start) + timedelta(minutes=60)).time()
+                self.schedules.append((schedule_id, class_id, day_of_week))
+                yield {
+                    'id': schedule_id,
+                    'class_id': class_id,
+                    'day_of_week': day_of_week,
+                    'start_time': start,
+                    'end_time': end,
+                    'room': self.random.choice(ROOMS),
+                    'is_active': True,
+                }
+        self._insert(conn, ClassSchedule, schedule_rows())
+
+    def _occurrences(self, day_of_week):
+        # Bookings open two weeks ahead of the end date
+        first = self.start_date + timedelta(days=(day_of_week - self.start_date.weekday()) % 7)
+        day = first
+        last = self.end_date + timedelta(days=14)
+        while day <= last:
+            yield day
+            day += timedelta(days=7)
+
+    def _bookings(self, conn):
+        # Fill every occurrence to the same fraction of its capacity, on average
+        occurrences_per_schedule = max(1, (self.years * 365 + 14) // 7)
+        seats = sum(self.classes[class_id] for _, class_id, _ in self.schedules) * occurrences_per_schedule
+        fill = min(1.0, self.counts['bookings'] / seats)
+        members = self.member_user_ids
+        attendance = []
+
+        def booking_rows():
+            for schedule_id, class_id, day_of_week in self.schedules:
+                capacity = self.classes[class_id]
+                for day in self._occurrences(day_of_week):
+                    mean = capacity * fill
+                    size = min(capacity, len(members), max(0, int(self.random.gauss(mean, mean / 5) + 0.5)))
+                    past = day < self.end_date
+                    for user_id in self.random.sample(members, size):
+                        status = 'confirmed'
+                        roll = self.random.random()
+                        if roll < 0.08:
+                            status = 'cancelled'
+                        elif past:
+                            status = 'completed'
+                        yield {
+                            'user_id': user_id,
+                            'class_schedule_id': schedule_id,
+                            'booking_date': day,
+                            'status': status,
+                            'payment_status': 'paid' if past else 'pending',
+                            'created_at': self._timestamp(day - timedelta(days=self.random.randint(0, 13))),
+                        }
+                        if past and status == 'completed':
+                            attendance.append({
+                                'user_id': user_id,
+                                'class_schedule_id': schedule_id,
+                                'attendance_date': day,
+                                'check_in_time': self._timestamp(day),
+                                'status': 'present' if roll < 0.85 else ('late' if roll < 0.92 else 'absent'),
+                                'created_at': self._timestamp(day),
+                            })
+                    if len(attendance) >= self.batch_size:
+                        self._insert(conn, Attendance, attendance)
+                        attendance.clear()
+        self._insert(conn, Booking, booking_rows())
+        self._insert(conn, Attendance, attendance)
+
+    def _payments(self, conn):
+        prices = {name: price for name, _, price, _ in PLANS}
+
+        def rows():
+            for user_id in self.member_user_ids:
+                plan = self.random.choice(list(prices))
+                day = self._random_day()
+                while day <= self.end_date:
+                    created = self._timestamp(day)
+                    yield {
+                        'user_id': user_id,
+                        'amount': prices[plan],
+                        'payment_type': 'membership',
+                        'payment_method': self.random.choice(PAYMENT_METHODS),
+                        'status': 'completed' if self.random.random() < 0.97 else 'failed',
+                        'transaction_date': created,
+                        'created_at': created,
+                    }
+                    day += timedelta(days=30)
+        self._insert(conn, Payment, rows())
+
+    def _progress(self, conn):
+        def rows():
+            for user_id in self.member_user_ids:
+                if self.random.random() > 0.4:
+                    continue
+                weight = self.random.uniform(55, 110)
+                day = self._random_day()
+                while day <= self.end_date:
+                    weight += self.random.uniform(-1.2, 0.8)
+                    yield {
+                        'user_id': user_id,
+                        'log_date': day,
+                        'weight': round(weight, 1),
+                        'body_fat_percentage': round(self.random.uniform(10, 35), 1),
+                        'created_at': self._timestamp(day),
+                    }
+                    day += timedelta(days=self.random.randint(7, 21))
+        self._insert(conn, ProgressLog, rows())
+
+    def _announcements(self, conn):
+        def rows():
+            for n in range(max(5, int(200 * self.scale))):
+                yield {
+                    'title': f'Club update #{n + 1}',
+                    'message': 'New classes, holiday hours and events at the club.',
+                    'author_id': 1,
+                    'target_audience': self.random.choice(['all', 'all', 'members', 'trainers']),
+                    'is_active': self.random.random() < 0.3,
+                    'created_at': self._timestamp(self._random_day()),
+                }
+        self._insert(conn, Announcement, rows())
+
+    def _reset_sequences(self, conn):
+        # Users, trainers, classes and schedules were given explicit ids; PostgreSQL's
+        # sequences do not see those, so the app's first inserts would reuse them
+        if conn.dialect.name != 'postgresql':
+            return
+        for table in db.metadata.sorted_tables:
+            if 'id' not in table.c or not table.c.id.primary_key:
+                continue
+            name = conn.dialect.identifier_preparer.quote(table.name)
+            conn.execute(text(f"SELECT setval(pg_get_serial_sequence(:table, 'id'), COALESCE(MAX(id), 0) + 1, false) "
+                              f"FROM {name}"), {'table': table.name})
+
+
+def _fast_sqlite(engine):
+    # Bulk loading only: a crash mid-load leaves a database to throw away anyway
+    @event.listens_for(engine, 'connect')
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=MEMORY')
+        cursor.execute('PRAGMA synchronous=OFF')
+        cursor.execute('PRAGMA cache_size=-200000')
+        cursor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', default='sqlite:///perf_data.db')
+    parser.add_argument('--scale', type=float, default=1.0, help='fraction of the full-scale row counts')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--years', type=int, default=2, help='years of booking, payment and progress history')
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--end-date', type=date.fromisoformat, default=None,
+                        help='last day of history (default: today); fix it for byte-identical runs')
+    parser.add_argument('--reset', action='store_true', help='drop all tables first')
+    args = parser.parse_args(argv)
+
+    engine = create_engine(database_config({'DATABASE_URL': args.database_url})['SQLALCHEMY_DATABASE_URI'])
+    if engine.dialect.name == 'sqlite':
+        _fast_sqlite(engine)
+    if args.reset:
+        db.metadata.drop_all(engine)
+    upgrade_schema(engine)
+
+    started = clock.perf_counter()
+    generator = Generator(engine, seed=args.seed, scale=args.scale, years=args.years,
+                          batch_size=args.batch_size, end_date=args.end_date)
+    inserted = generator.run()
+    for table, count in sorted(inserted.items()):
+        print(f'{table:<16} {count:>12,}')
+    print(f'Done in {clock.perf_counter() - started:.1f}s. Every user\'s password is {DEFAULT_PASSWORD!r}.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,20 @@
+"""
+gunicorn settings.
+
+The app is built once in the master (``preload_app``) and the workers fork
+from it, so every worker starts with the views, templates and models already
+imported and only the database engines are reset (see ``database.py``).
+
+Workers are ``gthread``: each serves ``GUNICORN_THREADS`` requests at once,
+so a login waiting on its password hash (see ``passwords.py``) does not hold
+up the worker's other requests. Keep the thread count above
+``PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE`` so the hashing bound applies.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 3))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = True
@@ -0,0 +1,71 @@
+"""
+Liveness and readiness checks for container probes.
+
+Liveness does no I/O at all. Readiness pings the database over a pooled
+connection with a short timeout and reuses the outcome for a second, so
+probes from every kubelet and load balancer add at most one ``SELECT 1`` per
+second per worker. A ping that hangs is abandoned rather than queued behind.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from flask import current_app
+from sqlalchemy import text
+
+from models import db
+
+DEFAULTS = {
+    'READINESS_TIMEOUT': 2.0,
+    'READINESS_CACHE_SECONDS': 1.0,
+}
+
+
+class ReadinessCheck:
+    def __init__(self, app, timeout, cache_seconds, clock=time.monotonic):
+        self.app = app
+        self.timeout = timeout
+        self.cache_seconds = cache_seconds
+        self._clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='readyz')
+        self._lock = threading.Lock()
+        self._pending = None
+        self._checked_at = None
+        self._result = (False, 'not checked')
+
+    def _ping(self):
+        with self.app.app_context():
+            with db.engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+
+    def _run(self):
+        if self._pending is not None and not self._pending.done():
+            return False, 'database ping still running'
+        self._pending = self._executor.submit(self._ping)
+        try:
+            self._pending.result(timeout=self.timeout)
+        except TimeoutError:
+            return False, 'database ping timed out'
+        except Exception as exc:
+            return False, f'database unavailable: {exc.__class__.__name__}'
+        return True, 'ok'
+
+    def check(self):
+        """Return ``(ready, detail)``, pinging at most once per cache period."""
+        with self._lock:
+            now = self._clock()
+            if self._checked_at is None or now - self._checked_at >= self.cache_seconds:
+                self._result = self._run()
+                self._checked_at = self._clock()
+            return self._result
+
+
+def get_readiness_check(app=None):
+    app = app or current_app._get_current_object()
+    check = app.extensions.get('readiness')
+    if check is None:
+        check = app.extensions['readiness'] = ReadinessCheck(
+            app,
+            timeout=app.config.get('READINESS_TIMEOUT', DEFAULTS['READINESS_TIMEOUT']),
+            cache_seconds=app.config.get('READINESS_CACHE_SECONDS', DEFAULTS['READINESS_CACHE_SECONDS']))
+    return check
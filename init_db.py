@@ -4,16 +4,19 @@ Database initialization script for FitClub Pro
 Run this script to create the database and populate it with sample data.
 """
 
-from app import app, db
+from app import create_app
+from models import db
+from migrations import upgrade_schema
 from models import User, Role, Member, Trainer, MembershipPlan, Class, ClassSchedule
 from datetime import datetime, date, time
 from werkzeug.security import generate_password_hash
 
 def init_database():
     """Initialize the database with tables and sample data."""
+    app = create_app()
     with app.app_context():
         print("Creating database tables...")
-        db.create_all()
+        upgrade_schema()
         
         print("Creating roles...")
         # Create roles
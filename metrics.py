@@ -0,0 +1,308 @@
+"""
+Prometheus-style metrics with aggregation across gunicorn workers.
+
+Each process keeps its counters, gauges and histograms in memory. When
+``METRICS_DIR`` is set, every process also writes a snapshot to
+``<METRICS_DIR>/metrics-<pid>.json`` at most once per
+``METRICS_FLUSH_SECONDS`` (atomically, via rename), and ``/metrics`` sums the
+snapshots of all workers. Counters and histograms of exited workers keep
+counting towards the totals; gauges only include processes that are alive.
+Without ``METRICS_DIR`` the endpoint reports the serving process alone.
+
+``/metrics`` answers clients in ``METRICS_ALLOWED_NETWORKS`` (loopback by
+default) and requests carrying ``Authorization: Bearer <METRICS_TOKEN>``;
+anyone else gets a 404.
+"""
+import bisect
+import hmac
+import ipaddress
+import json
+import os
+import tempfile
+import threading
+import time
+
+from flask import current_app, g, request
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Comma-separated networks that may scrape without a token
+DEFAULT_ALLOWED_NETWORKS = '127.0.0.0/8,::1/128'
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), self._copy(value)] for key, value in self._values.items()]
+
+    def _copy(self, value):
+        return value
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                entry['buckets'][index] += 1
+            entry['sum'] += value
+            entry['count'] += 1
+
+    def _copy(self, value):
+        return {'buckets': list(value['buckets']), 'sum': value['sum'], 'count': value['count']}
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        return {m.name: m.snapshot() for m in self.metrics}
+
+    def reset(self):
+        """Forget every value, e.g. in a freshly forked worker."""
+        for metric in self.metrics:
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    'fitclub_http_requests_total', 'HTTP requests handled', ('endpoint', 'method', 'status')))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    'fitclub_http_request_duration_seconds', 'Time spent handling a request', ('endpoint',)))
+DB_TIME = REGISTRY.register(Histogram(
+    'fitclub_http_request_db_seconds', 'Time spent in SQL statements per request', ('endpoint',)))
+DB_QUERIES = REGISTRY.register(Counter(
+    'fitclub_db_queries_total', 'SQL statements executed during requests', ('endpoint',)))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'fitclub_cache_requests_total', 'Cache lookups by cache and result', ('cache', 'result')))
+BOOKINGS = REGISTRY.register(Counter(
+    'fitclub_bookings_total', 'Booking attempts by outcome', ('result',)))
+CANCELLATIONS = REGISTRY.register(Counter(
+    'fitclub_booking_cancellations_total', 'Confirmed bookings cancelled'))
+ATTENDANCE_MARKS = REGISTRY.register(Counter(
+    'fitclub_attendance_marks_total', 'Attendance records written by status', ('status',)))
+PASSWORD_HASHES = REGISTRY.register(Counter(
+    'fitclub_password_hashes_total', 'Password hash operations by outcome', ('operation', 'result')))
+LOGIN_THROTTLED = REGISTRY.register(Counter(
+    'fitclub_login_throttled_total', 'Login attempts rejected by the rate limiter', ('scope',)))
+CHECKINS = REGISTRY.register(Counter(
+    'fitclub_checkins_total', 'Kiosk check-ins by outcome', ('result',)))
+CHECKIN_BATCHES = REGISTRY.register(Histogram(
+    'fitclub_checkin_batch_size', 'Check-ins written per attendance batch', buckets=(1, 5, 10, 25, 50, 100, 250, 500)))
+WAITLIST = REGISTRY.register(Counter(
+    'fitclub_waitlist_total', 'Waitlist joins, departures and promotions', ('result',)))
+POOL_CHECKED_OUT = REGISTRY.register(Gauge(
+    'fitclub_db_pool_checked_out', 'Database connections currently checked out of the pool'))
+POOL_SIZE = REGISTRY.register(Gauge(
+    'fitclub_db_pool_size', 'Configured size of the database connection pool'))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Exporter:
+    """Writes this process's snapshot and renders the aggregated exposition."""
+
+    def __init__(self, directory=None, flush_seconds=1.0, clock=time.monotonic):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self._clock = clock
+        self._flushed_at = None
+        self._lock = threading.Lock()
+
+    def maybe_flush(self, force=False):
+        if not self.directory:
+            return
+        with self._lock:
+            now = self._clock()
+            if not force and self._flushed_at is not None and now - self._flushed_at < self.flush_seconds:
+                return
+            self._flushed_at = now
+        os.makedirs(self.directory, exist_ok=True)
+        payload = json.dumps({'pid': os.getpid(), 'metrics': REGISTRY.snapshot()})
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.metrics-')
+        with os.fdopen(fd, 'w') as fh:
+            fh.write(payload)
+        os.replace(tmp, os.path.join(self.directory, f'metrics-{os.getpid()}.json'))
+
+    def _snapshots(self):
+        if not self.directory:
+            return [(os.getpid(), REGISTRY.snapshot())]
+        self.maybe_flush(force=True)
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not (name.startswith('metrics-') and name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as fh:
+                    data = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            snapshots.append((data['pid'], data['metrics']))
+        return snapshots
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        snapshots = self._snapshots()
+        lines = []
+        for metric in REGISTRY.metrics:
+            merged = {}
+            for pid, metrics in snapshots:
+                if metric.type == 'gauge' and pid != os.getpid() and not _pid_alive(pid):
+                    continue
+                for key, value in metrics.get(metric.name, []):
+                    key = tuple(key)
+                    if metric.type == 'histogram':
+                        entry = merged.setdefault(key, {'buckets': [0] * len(metric.buckets), 'sum': 0.0, 'count': 0})
+                        entry['buckets'] = [a + b for a, b in zip(entry['buckets'], value['buckets'])]
+                        entry['sum'] += value['sum']
+                        entry['count'] += value['count']
+                    else:
+                        merged[key] = merged.get(key, 0) + value
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for key in sorted(merged):
+                labels = list(zip(metric.labels, key))
+                value = merged[key]
+                if metric.type == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, value['buckets']):
+                        cumulative += count
+                        lines.append(f'{metric.name}_bucket{_labels(labels + [("le", _number(bound))])} {cumulative}')
+                    lines.append(f'{metric.name}_bucket{_labels(labels + [("le", "+Inf")])} {value["count"]}')
+                    lines.append(f'{metric.name}_sum{_labels(labels)} {_number(value["sum"])}')
+                    lines.append(f'{metric.name}_count{_labels(labels)} {value["count"]}')
+                else:
+                    lines.append(f'{metric.name}{_labels(labels)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def get_exporter(app=None):
+    app = app or current_app
+    exporter = app.extensions.get('metrics')
+    if exporter is None:
+        exporter = app.extensions['metrics'] = Exporter(app.config.get('METRICS_DIR'),
+                                                        app.config.get('METRICS_FLUSH_SECONDS', 1.0))
+    return exporter
+
+
+def _record_pool(app):
+    # Looked up through the app so this module stays importable from models.py
+    pool = app.extensions['sqlalchemy'].engine.pool
+    if hasattr(pool, 'checkedout'):
+        POOL_CHECKED_OUT.set(pool.checkedout())
+    if hasattr(pool, 'size'):
+        POOL_SIZE.set(pool.size())
+
+
+def scrape_allowed(app=None):
+    """Whether the current request may read ``/metrics``."""
+    app = app or current_app
+    token = app.config.get('METRICS_TOKEN')
+    sent = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(sent.encode(), f'Bearer {token}'.encode()):
+        return True
+    try:
+        address = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        return False
+    return any(address in network for network in app.extensions['metrics_allowed_networks'])
+
+
+def init_metrics(app):
+    """Time every request of ``app`` and record its outcome."""
+    # Parsed once so a malformed setting fails at startup
+    networks = app.config.get('METRICS_ALLOWED_NETWORKS', DEFAULT_ALLOWED_NETWORKS)
+    app.extensions['metrics_allowed_networks'] = [
+        ipaddress.ip_network(network.strip()) for network in networks.split(',') if network.strip()]
+
+    @app.before_request
+    def _start_request_timer():
+        g.request_started_at = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('request_started_at', None)
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        HTTP_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint)
+        stats = g.get('query_stats')
+        if stats is not None:
+            DB_TIME.observe(stats.total_ms / 1000, endpoint=endpoint)
+            DB_QUERIES.inc(stats.count, endpoint=endpoint)
+        _record_pool(app)
+        get_exporter(app).maybe_flush()
+        return response
@@ -0,0 +1,130 @@
+"""
+Schema upgrades for existing databases.
+
+``db.create_all()`` only creates missing tables, so indexes declared on a model
+after its table already exists would never reach a deployed database. The
+upgrade below creates the tables and then every declared index that is not yet
+present, which makes it safe to run on every container start. Before a
+unique index is added to a table that already has rows, the duplicates it
+would reject are removed (see ``DEDUPLICATE``), and plain indexes the unique
+one replaces are dropped afterwards (see ``SUPERSEDED``), as are tables no
+model uses any more (see ``RETIRED_TABLES``).
+
+``python migrations.py`` runs the upgrade and seeds the base roles against
+``DATABASE_URL`` without building the web application; the container
+entrypoint uses it before starting gunicorn.
+"""
+from sqlalchemy import Index, MetaData, Table, case, create_engine, delete, func, inspect, select
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import DropIndex
+
+from database import configure_engine, database_config
+from models import db, Attendance, Booking, Role
+
+BASE_ROLES = ('admin', 'trainer', 'member')
+
+
+def _drop_duplicate_attendance(connection):
+    # Concurrent marks could record a member twice; the latest record wins
+    keep = (select(func.max(Attendance.id))
+            .group_by(Attendance.user_id, Attendance.class_schedule_id, Attendance.attendance_date))
+    connection.execute(delete(Attendance.__table__).where(Attendance.id.not_in(keep)))
+
+
+def _drop_duplicate_bookings(connection):
+    # Rebooking used to insert a second row; the confirmed one wins, otherwise the latest
+    keep = (select(func.coalesce(func.max(case((Booking.status == 'confirmed', Booking.id))),
+                                 func.max(Booking.id)))
+            .group_by(Booking.user_id, Booking.class_schedule_id, Booking.booking_date))
+    connection.execute(delete(Booking.__table__).where(Booking.id.not_in(keep)))
+
+
+# Unique indexes added to existing tables, and how to clear the rows they would reject
+DEDUPLICATE = {
+    'uq_attendance_user_schedule_date': _drop_duplicate_attendance,
+    'uq_bookings_user_schedule_date': _drop_duplicate_bookings,
+}
+
+# Plain indexes on the same columns as a unique index that replaced them
+SUPERSEDED = {
+    'attendance': ('ix_attendance_user_schedule_date',),
+    'bookings': ('ix_bookings_user_schedule_date',),
+}
+
+# Tables replaced by others; their data is not needed any more
+RETIRED_TABLES = (
+    # Seat counters per schedule and date, now kept on class_occurrences
+    'class_occupancy',
+)
+
+
+def missing_indexes(engine):
+    """Return the declared indexes that do not exist in the database yet."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        missing.extend(ix for ix in table.indexes if ix.name not in present)
+    return missing
+
+
+def superseded_indexes(engine):
+    """Return the names of replaced indexes still present in the database."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    stale = []
+    for table_name, names in SUPERSEDED.items():
+        if table_name not in existing_tables:
+            continue
+        present = {ix['name'] for ix in inspector.get_indexes(table_name)}
+        stale.extend(name for name in names if name in present)
+    return stale
+
+
+def upgrade_schema(engine=None):
+    """Create missing tables and indexes and drop superseded indexes and retired tables.
+
+    Without ``engine`` this upgrades the app's database and must run inside
+    an app context.
+    """
+    engine = engine or db.engine
+    db.metadata.create_all(engine)
+    for index in missing_indexes(engine):
+        with engine.begin() as connection:
+            if index.name in DEDUPLICATE:
+                DEDUPLICATE[index.name](connection)
+            index.create(bind=connection, checkfirst=True)
+    for name in superseded_indexes(engine):
+        with engine.begin() as connection:
+            connection.execute(DropIndex(Index(name)))
+    existing_tables = set(inspect(engine).get_table_names())
+    for name in RETIRED_TABLES:
+        if name in existing_tables:
+            Table(name, MetaData()).drop(bind=engine)
+
+
+def seed_roles(engine):
+    """Create the base roles that do not exist yet."""
+    with Session(engine) as session:
+        existing = set(session.scalars(select(Role.name)))
+        session.add_all(Role(name=name, description=f'{name.title()} role')
+                        for name in BASE_ROLES if name not in existing)
+        session.commit()
+
+
+def main():
+    config = database_config()
+    engine = create_engine(config['SQLALCHEMY_DATABASE_URI'], **config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    configure_engine(engine)
+    try:
+        upgrade_schema(engine)
+        seed_roles(engine)
+    finally:
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
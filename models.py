@@ -1,14 +1,20 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hash_password, needs_rehash, verify_password
+from routing import RoutingSession
 from datetime import datetime, date
+from sqlalchemy import event, inspect, select, update
 from sqlalchemy.orm import relationship
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # Association tables for many-to-many relationships
 class UserRole(db.Model):
     __tablename__ = 'user_roles'
+    __table_args__ = (
+        # Role checks load a user's roles on every authenticated request
+        db.Index('ix_user_roles_user_role', 'user_id', 'role_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     role_id = db.Column(db.Integer, db.ForeignKey('roles.id'), nullable=False)
@@ -52,18 +58,40 @@ class User(UserMixin, db.Model):
     progress_logs = relationship('ProgressLog', back_populates='user')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
+    
+    @property
+    def role_names(self):
+        """Names of the user's roles, resolved once per loaded instance"""
+        names = self.__dict__.get('_role_names')
+        if names is None:
+            names = self.__dict__['_role_names'] = frozenset(role.name for role in self.roles)
+        return names
     
     def has_role(self, role_name):
-        return any(role.name == role_name for role in self.roles)
+        return role_name in self.role_names
     
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
 
+def _forget_role_names(target, *args):
+    # Expiry on commit also reaches users that were already garbage collected
+    if target is not None:
+        target.__dict__.pop('_role_names', None)
+
+# Drop the cached role names whenever the roles collection changes or reloads
+for _event in ('append', 'remove', 'set'):
+    event.listen(User.roles, _event, _forget_role_names)
+for _event in ('expire', 'refresh'):
+    event.listen(User, _event, _forget_role_names)
+
 class Member(db.Model):
     __tablename__ = 'members'
     id = db.Column(db.Integer, primary_key=True)
@@ -133,6 +161,10 @@ class MembershipPlan(db.Model):
 
 class Class(db.Model):
     __tablename__ = 'classes'
+    __table_args__ = (
+        # A trainer's classes (dashboard and day views)
+        db.Index('ix_classes_trainer_id', 'trainer_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
@@ -150,6 +182,10 @@ class Class(db.Model):
 
 class ClassSchedule(db.Model):
     __tablename__ = 'class_schedules'
+    __table_args__ = (
+        # A class's sessions on one weekday (a trainer's day views)
+        db.Index('ix_class_schedules_class_day', 'class_id', 'day_of_week'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     class_id = db.Column(db.Integer, db.ForeignKey('classes.id'), nullable=False)
     day_of_week = db.Column(db.Integer, nullable=False)  # 0=Monday, 6=Sunday
@@ -165,6 +201,14 @@ class ClassSchedule(db.Model):
 
 class Booking(db.Model):
     __tablename__ = 'bookings'
+    __table_args__ = (
+        # A member holds at most one booking per schedule and date; cancelled
+        # bookings are reactivated rather than inserted again
+        db.Index('uq_bookings_user_schedule_date', 'user_id', 'class_schedule_id', 'booking_date', unique=True),
+        db.Index('ix_bookings_schedule_date_status', 'class_schedule_id', 'booking_date', 'status'),
+        db.Index('ix_bookings_user_date', 'user_id', 'booking_date'),
+        db.Index('ix_bookings_created_at_id', 'created_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     class_schedule_id = db.Column(db.Integer, db.ForeignKey('class_schedules.id'), nullable=False)
@@ -177,8 +221,79 @@ class Booking(db.Model):
     user = relationship('User', back_populates='bookings')
     class_schedule = relationship('ClassSchedule', back_populates='bookings')
 
+class ClassOccurrence(db.Model):
+    """One concrete session of a schedule: the schedule on one date.
+
+    Rows are generated ahead for a rolling horizon by ``occurrences.py``, so
+    calendars, capacity checks and roll calls look occurrences up instead of
+    deriving them from ``day_of_week``; a date off the schedule's weekday
+    has no row and cannot be booked. ``capacity`` is copied from the class
+    and ``booked_count`` holds the confirmed seats, claimed with a
+    conditional UPDATE (see ``capacity.py``) so nothing counts bookings.
+    """
+    __tablename__ = 'class_occurrences'
+    __table_args__ = (
+        db.UniqueConstraint('class_schedule_id', 'occurrence_date', name='uq_class_occurrence_schedule_date'),
+        # Calendar lookups: every occurrence of a day or date range
+        db.Index('ix_class_occurrences_date', 'occurrence_date', 'class_schedule_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    class_schedule_id = db.Column(db.Integer, db.ForeignKey('class_schedules.id'), nullable=False)
+    occurrence_date = db.Column(db.Date, nullable=False)
+    capacity = db.Column(db.Integer, nullable=False, default=0)
+    booked_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Relationships
+    class_schedule = relationship('ClassSchedule')
+
+    @property
+    def remaining(self):
+        return max(self.capacity - self.booked_count, 0)
+
+@event.listens_for(Class, 'after_update')
+def _sync_occurrence_capacity(mapper, connection, target):
+    # Upcoming occurrences follow a changed class capacity; past ones keep theirs
+    if not inspect(target).attrs.max_capacity.history.has_changes():
+        return
+    schedule_ids = select(ClassSchedule.id).where(ClassSchedule.class_id == target.id)
+    connection.execute(
+        update(ClassOccurrence)
+        .where(ClassOccurrence.class_schedule_id.in_(schedule_ids),
+               ClassOccurrence.occurrence_date >= date.today())
+        .values(capacity=target.max_capacity or 0))
+
+class WaitlistEntry(db.Model):
+    """A member waiting for a seat in a full class on one date.
+
+    Waiting entries are served by ``priority`` (highest first), then in order
+    of ``joined_at``; see ``waitlist.py``.
+    """
+    __tablename__ = 'waitlist_entries'
+    __table_args__ = (
+        # One entry per member and occurrence; leaving and rejoining reuses it
+        db.Index('uq_waitlist_user_schedule_date', 'user_id', 'class_schedule_id', 'waitlist_date', unique=True),
+        # Next in line: the first row of this index for (schedule, date, 'waiting')
+        db.Index('ix_waitlist_next', 'class_schedule_id', 'waitlist_date', 'status', 'priority', 'joined_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    class_schedule_id = db.Column(db.Integer, db.ForeignKey('class_schedules.id'), nullable=False)
+    waitlist_date = db.Column(db.Date, nullable=False)
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default='waiting')  # waiting, promoted, booked, left
+    joined_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    promoted_at = db.Column(db.DateTime)
+
+    # Relationships
+    user = relationship('User')
+    class_schedule = relationship('ClassSchedule')
+
 class Payment(db.Model):
     __tablename__ = 'payments'
+    __table_args__ = (
+        db.Index('ix_payments_user_transaction_date', 'user_id', 'transaction_date'),
+        db.Index('ix_payments_created_at_id', 'created_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     amount = db.Column(db.Float, nullable=False)
@@ -195,6 +310,11 @@ class Payment(db.Model):
 
 class Attendance(db.Model):
     __tablename__ = 'attendance'
+    __table_args__ = (
+        db.Index('ix_attendance_schedule_date', 'class_schedule_id', 'attendance_date'),
+        # One record per member and class occurrence, so a roll call is a single upsert
+        db.Index('uq_attendance_user_schedule_date', 'user_id', 'class_schedule_id', 'attendance_date', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     class_schedule_id = db.Column(db.Integer, db.ForeignKey('class_schedules.id'), nullable=False)
@@ -210,6 +330,9 @@ class Attendance(db.Model):
 
 class ProgressLog(db.Model):
     __tablename__ = 'progress_logs'
+    __table_args__ = (
+        db.Index('ix_progress_logs_user_date', 'user_id', 'log_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     log_date = db.Column(db.Date, nullable=False, default=date.today)
@@ -253,4 +376,9 @@ class Announcement(db.Model):
     # Relationships
     author = relationship('User')
 
-
+class DataVersion(db.Model):
+    """Change counter of a table, bumped by each transaction that writes to it (see ``versions.py``)"""
+    __tablename__ = 'data_versions'
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
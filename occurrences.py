@@ -0,0 +1,202 @@
+"""
+Materialized class occurrences.
+
+``ClassSchedule`` only says "Tuesdays 07:00"; ``ClassOccurrence`` has a row
+for every concrete session, with its capacity and confirmed seat count. A
+background thread per worker tops the table up every
+``OCCURRENCE_REFRESH_SECONDS`` so it always covers today plus
+``OCCURRENCE_HORIZON_DAYS``: one SELECT for the active schedules, then one
+``INSERT ... ON CONFLICT DO NOTHING`` per chunk of missing rows (workers
+racing on the same rows insert them once). New rows start from the
+confirmed bookings already on record. Upcoming rows without bookings whose
+schedule was deactivated or moved to another weekday are removed.
+
+A booking beyond the horizon creates its occurrence on demand with
+``ensure_occurrences``, which skips dates the schedule does not run on.
+``python occurrences.py`` runs one pass, e.g. after a deploy.
+"""
+import argparse
+import atexit
+import logging
+import os
+import threading
+from datetime import date, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Booking, Class, ClassOccurrence, ClassSchedule
+
+DEFAULTS = {
+    # Days ahead of today with materialized occurrences; covers the longest recurring booking
+    'OCCURRENCE_HORIZON_DAYS': 196,
+    # Seconds between passes of the background materializer; 0 disables the thread
+    'OCCURRENCE_REFRESH_SECONDS': 600,
+}
+
+logger = logging.getLogger('fitclub.occurrences')
+
+# Rows per INSERT statement
+_CHUNK = 500
+
+_UPSERT_DIALECTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def occurrence_dates(day_of_week, start, end):
+    """Dates between ``start`` and ``end`` (inclusive) falling on ``day_of_week``."""
+    first = start + timedelta(days=(day_of_week - start.weekday()) % 7)
+    return [first + timedelta(days=7 * i) for i in range((end - first).days // 7 + 1)] if first <= end else []
+
+
+def runs_on(schedule, day):
+    """Whether ``schedule`` has a session on ``day``."""
+    return bool(schedule.is_active) and day.weekday() == schedule.day_of_week
+
+
+def _confirmed_count(class_schedule_id, occurrence_date):
+    return (select(func.count(Booking.id))
+            .where(Booking.class_schedule_id == class_schedule_id,
+                   Booking.booking_date == occurrence_date,
+                   Booking.status == 'confirmed')
+            .scalar_subquery())
+
+
+def _insert_missing(rows):
+    """Insert occurrence ``rows`` (schedule id, date, capacity) that do not exist yet."""
+    values = [dict(class_schedule_id=schedule_id, occurrence_date=day, capacity=capacity or 0,
+                   booked_count=_confirmed_count(schedule_id, day))
+              for schedule_id, day, capacity in rows]
+    upsert = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    for i in range(0, len(values), _CHUNK):
+        chunk = values[i:i + _CHUNK]
+        if upsert is not None:
+            db.session.execute(upsert(ClassOccurrence).values(chunk).on_conflict_do_nothing(
+                index_elements=['class_schedule_id', 'occurrence_date']))
+            continue
+        existing = set(db.session.execute(
+            select(ClassOccurrence.class_schedule_id, ClassOccurrence.occurrence_date).where(
+                ClassOccurrence.class_schedule_id.in_({v['class_schedule_id'] for v in chunk}),
+                ClassOccurrence.occurrence_date.in_({v['occurrence_date'] for v in chunk}))).all())
+        for row in chunk:
+            if (row['class_schedule_id'], row['occurrence_date']) not in existing:
+                db.session.execute(ClassOccurrence.__table__.insert().values(**row))
+
+
+def ensure_occurrences(schedule, dates):
+    """Create the missing occurrences of ``schedule`` on ``dates``; dates it does not run on are skipped."""
+    days = sorted({day for day in dates if runs_on(schedule, day)})
+    if days:
+        _insert_missing([(schedule.id, day, schedule.class_.max_capacity) for day in days])
+
+
+def materialize(start=None, days=None, app=None):
+    """Top up the occurrences from ``start`` (default today) for ``days``; the caller commits.
+
+    Returns the number of rows added and removed.
+    """
+    start = start or date.today()
+    end = start + timedelta(days=days if days is not None else _setting(app or current_app, 'OCCURRENCE_HORIZON_DAYS'))
+    schedules = db.session.execute(
+        select(ClassSchedule.id, ClassSchedule.day_of_week, Class.max_capacity)
+        .join(Class)
+        .where(ClassSchedule.is_active == True, Class.is_active == True)).all()
+    active = {schedule_id: day_of_week for schedule_id, day_of_week, _ in schedules}
+
+    existing = {}
+    for schedule_id, day, booked in db.session.execute(
+            select(ClassOccurrence.class_schedule_id, ClassOccurrence.occurrence_date, ClassOccurrence.booked_count)
+            .where(ClassOccurrence.occurrence_date.between(start, end))):
+        existing[schedule_id, day] = booked
+
+    missing = [(schedule_id, day, capacity)
+               for schedule_id, day_of_week, capacity in schedules
+               for day in occurrence_dates(day_of_week, start, end)
+               if (schedule_id, day) not in existing]
+    _insert_missing(missing)
+
+    # Sessions that no longer take place, unless somebody is booked on them
+    stale = [(schedule_id, day) for (schedule_id, day), booked in existing.items()
+             if not booked and active.get(schedule_id) != day.weekday()]
+    for schedule_id, day in stale:
+        db.session.execute(delete(ClassOccurrence).where(
+            ClassOccurrence.class_schedule_id == schedule_id, ClassOccurrence.occurrence_date == day,
+            ClassOccurrence.booked_count == 0))
+    return len(missing), len(stale)
+
+
+class Materializer:
+    """Runs :func:`materialize` periodically in a background thread of each worker."""
+
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Threads do not survive a fork; start one in each worker
+        if not self.interval or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._stop = threading.Event()
+                threading.Thread(target=self._run, name='occurrence-materializer', daemon=True).start()
+                atexit.register(self._stop.set)
+
+    def _run(self):
+        while True:
+            self.run_once()
+            if self._stop.wait(self.interval):
+                return
+
+    def run_once(self):
+        try:
+            with self.app.app_context():
+                added, removed = materialize()
+                db.session.commit()
+        except Exception:
+            logger.exception('could not materialize class occurrences')
+            return
+        if added or removed:
+            logger.info('materialized %d class occurrences, removed %d', added, removed)
+
+
+def _setting(app, name):
+    return app.config.get(name, DEFAULTS[name])
+
+
+def get_materializer(app=None):
+    app = app or current_app._get_current_object()
+    materializer = app.extensions.get('occurrence_materializer')
+    if materializer is None:
+        materializer = app.extensions['occurrence_materializer'] = Materializer(
+            app, _setting(app, 'OCCURRENCE_REFRESH_SECONDS'))
+    return materializer
+
+
+def init_occurrences(app):
+    """Start the materializer of each worker with its first request."""
+    app.before_request(lambda: get_materializer(app).start())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate the class occurrences of the coming days')
+    parser.add_argument('--days', type=int, help='days ahead of today (default: OCCURRENCE_HORIZON_DAYS)')
+    args = parser.parse_args(argv)
+
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        added, removed = materialize(days=args.days)
+        db.session.commit()
+    print(f'Added {added} class occurrences, removed {removed}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Keyset (cursor) pagination for listing views.
+
+Pages are addressed by the sort value and id of the row on their edge instead
+of an OFFSET, so fetching any page is an index range scan of ``per_page + 1``
+rows no matter how deep into the table it is.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PER_PAGE = 25
+MAX_PER_PAGE = 100
+
+
+class SortKey:
+    """A sortable listing column.
+
+    ``column`` is the SQL expression to order by and ``getter`` reads the same
+    value from a loaded row, which is what ends up in the cursor. Sort columns
+    must be NOT NULL (or always populated) for keyset comparisons to hold.
+    """
+
+    def __init__(self, column, getter):
+        self.column = column
+        self.getter = getter
+
+    @property
+    def python_type(self):
+        return self.column.type.python_type
+
+
+class KeysetPage:
+    def __init__(self, items, sort, direction, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.sort = sort
+        self.direction = direction
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(value, python_type):
+    if value is None:
+        return None
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(sort, value, row_id, towards):
+    payload = json.dumps({'s': sort, 'v': _encode_value(value), 'id': row_id, 't': towards},
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(sort, value, id, towards)`` or ``None`` for a malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        towards = data['t']
+        if towards not in ('next', 'prev'):
+            return None
+        return data['s'], data['v'], int(data['id']), towards
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
+
+
+def clamp_per_page(value, default=DEFAULT_PER_PAGE, maximum=MAX_PER_PAGE):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(value, maximum))
+
+
+def paginate(query, sort_keys, id_column, sort=None, direction=None, cursor=None,
+             per_page=None, default_sort='created_at', default_direction='desc'):
+    """Return one :class:`KeysetPage` of ``query``.
+
+    ``sort_keys`` maps sort names to :class:`SortKey`; unknown names fall back
+    to ``default_sort``. ``id_column`` breaks ties so the order is total and
+    cursors stay stable while rows are inserted. A cursor issued for a
+    different sort, or one that cannot be decoded, restarts at the first page.
+    """
+    if sort not in sort_keys:
+        sort = default_sort
+    if direction not in ('asc', 'desc'):
+        direction = default_direction
+    per_page = clamp_per_page(per_page)
+    key = sort_keys[sort]
+
+    decoded = decode_cursor(cursor)
+    if decoded is not None:
+        cursor_sort, raw_value, row_id, towards = decoded
+        try:
+            value = _decode_value(raw_value, key.python_type)
+        except (TypeError, ValueError):
+            decoded = None
+        if cursor_sort != sort:
+            decoded = None
+    if decoded is None:
+        towards = 'next'
+
+    # Walking backwards reads the rows before the cursor in reverse order
+    descending = (direction == 'desc') != (towards == 'prev')
+    if decoded is not None:
+        if descending:
+            query = query.filter(or_(key.column < value, and_(key.column == value, id_column < row_id)))
+        else:
+            query = query.filter(or_(key.column > value, and_(key.column == value, id_column > row_id)))
+
+    if descending:
+        query = query.order_by(key.column.desc(), id_column.desc())
+    else:
+        query = query.order_by(key.column.asc(), id_column.asc())
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    if towards == 'prev':
+        items.reverse()
+
+    def _cursor(item, edge):
+        return encode_cursor(sort, key.getter(item), item.id, edge)
+
+    next_cursor = prev_cursor = None
+    if items:
+        if towards == 'next':
+            if has_more:
+                next_cursor = _cursor(items[-1], 'next')
+            if decoded is not None:
+                prev_cursor = _cursor(items[0], 'prev')
+        else:
+            next_cursor = _cursor(items[-1], 'next')
+            if has_more:
+                prev_cursor = _cursor(items[0], 'prev')
+
+    return KeysetPage(items, sort, direction, per_page, next_cursor=next_cursor, prev_cursor=prev_cursor)
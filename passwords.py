@@ -0,0 +1,131 @@
+"""
+Password hashing with a configurable cost, rehash on login and a bounded pool.
+
+``PASSWORD_HASH_METHOD`` takes any Werkzeug method string, e.g.
+``scrypt:32768:8:1`` in production or ``pbkdf2:sha256:1000`` for tests. A
+stored hash made with other parameters is replaced the next time its owner
+logs in. Hashing runs on a small per-process thread pool (hashlib releases the
+GIL): at most ``PASSWORD_HASH_WORKERS`` hashes burn CPU at once and at most
+``PASSWORD_HASH_QUEUE`` more wait, so a burst of logins cannot take every core
+from the requests around it. Anything beyond that fails fast with
+:class:`HashingBusy`.
+
+The bounds are per process and only come into play when a process serves
+several requests at once: gunicorn runs ``gthread`` workers (see
+``gunicorn.conf.py``), and with more threads than ``PASSWORD_HASH_WORKERS +
+PASSWORD_HASH_QUEUE`` a login burst leaves the other threads free for the
+rest of the site. A sync worker never has more than one hash in flight.
+
+A request that gives up after ``PASSWORD_HASH_TIMEOUT`` cancels its hash if
+it has not started. One already running cannot be interrupted: it keeps its
+slot and its CPU until it finishes.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from functools import lru_cache
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from metrics import PASSWORD_HASHES
+
+DEFAULTS = {
+    'PASSWORD_HASH_METHOD': 'scrypt:32768:8:1',
+    'PASSWORD_HASH_WORKERS': 1,
+    'PASSWORD_HASH_QUEUE': 2,
+    # Seconds a request waits for its hash before giving up
+    'PASSWORD_HASH_TIMEOUT': 10.0,
+}
+
+
+class HashingBusy(Exception):
+    """Too many password hashes are running or queued in this process."""
+
+
+@lru_cache(maxsize=8)
+def method_prefix(method):
+    """The parameter prefix Werkzeug writes for ``method``, e.g. ``pbkdf2:sha256:1000000``."""
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+class PasswordHasher:
+    def __init__(self, method, workers=1, queue=2, timeout=10.0):
+        self.method = method
+        self.workers = workers
+        self.queue = queue
+        self.timeout = timeout
+        self._pid = None
+
+    def _pool(self):
+        # A pool inherited through fork has no threads behind it
+        if self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+            self._slots = threading.BoundedSemaphore(self.workers + self.queue)
+            self._pid = os.getpid()
+        return self._executor, self._slots
+
+    def _run(self, operation, fn, *args):
+        executor, slots = self._pool()
+        if not slots.acquire(blocking=False):
+            PASSWORD_HASHES.inc(operation=operation, result='busy')
+            raise HashingBusy(f'{self.workers + self.queue} password hashes already pending')
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            result = future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Frees the slot if the hash is still queued; a running one holds it until done
+            future.cancel()
+            PASSWORD_HASHES.inc(operation=operation, result='timeout')
+            raise HashingBusy(f'password hash took longer than {self.timeout}s') from None
+        PASSWORD_HASHES.inc(operation=operation, result='ok')
+        return result
+
+    def hash(self, password):
+        return self._run('hash', generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run('verify', check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != method_prefix(self.method)
+
+
+def _setting(app, name):
+    return app.config.get(name, DEFAULTS[name])
+
+
+def get_password_hasher(app=None):
+    app = app or current_app._get_current_object()
+    hasher = app.extensions.get('password_hasher')
+    if hasher is None:
+        hasher = app.extensions['password_hasher'] = PasswordHasher(
+            _setting(app, 'PASSWORD_HASH_METHOD'),
+            workers=_setting(app, 'PASSWORD_HASH_WORKERS'),
+            queue=_setting(app, 'PASSWORD_HASH_QUEUE'),
+            timeout=_setting(app, 'PASSWORD_HASH_TIMEOUT'))
+    return hasher
+
+
+def hash_password(password):
+    """Hash with the app's parameters; outside an app (scripts) hash inline with the defaults."""
+    if not has_app_context():
+        return generate_password_hash(password, DEFAULTS['PASSWORD_HASH_METHOD'])
+    return get_password_hasher().hash(password)
+
+
+def verify_password(pwhash, password):
+    if not has_app_context():
+        return check_password_hash(pwhash, password)
+    return get_password_hasher().verify(pwhash, password)
+
+
+def needs_rehash(pwhash):
+    if not has_app_context():
+        return pwhash.split('$', 1)[0] != method_prefix(DEFAULTS['PASSWORD_HASH_METHOD'])
+    return get_password_hasher().needs_rehash(pwhash)
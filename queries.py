@@ -0,0 +1,73 @@
+"""
+Eager-loading profiles for list views.
+
+Each profile names the relationships a view's template dereferences per row and
+loads them together with the base query, so rendering a listing costs a fixed
+number of SELECTs no matter how many rows it shows.
+"""
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+
+from models import Announcement, Booking, Class, ClassSchedule, Member, Payment, Trainer, User
+
+
+# Profiles are built on demand so the mappers are fully configured by the time
+# the options are created. Views whose base query already joins the related
+# tables use contains_eager to reuse those joins instead of adding new ones.
+LOADER_PROFILES = {
+    'current_user': lambda: (
+        selectinload(User.roles),
+        joinedload(User.member_profile),
+        joinedload(User.trainer_profile),
+    ),
+    'admin_members': lambda: (
+        contains_eager(Member.user),
+    ),
+    'admin_trainers': lambda: (
+        contains_eager(Trainer.user),
+    ),
+    'admin_classes': lambda: (
+        contains_eager(Class.trainer).contains_eager(Trainer.user),
+    ),
+    'admin_bookings': lambda: (
+        contains_eager(Booking.user),
+        contains_eager(Booking.class_schedule).contains_eager(ClassSchedule.class_),
+    ),
+    'admin_payments': lambda: (
+        contains_eager(Payment.user),
+    ),
+    'services': lambda: (
+        joinedload(Class.trainer).joinedload(Trainer.user),
+    ),
+    'class_catalog': lambda: (
+        contains_eager(ClassSchedule.class_).contains_eager(Class.trainer).contains_eager(Trainer.user),
+    ),
+    'booking_schedule_class': lambda: (
+        contains_eager(Booking.class_schedule).contains_eager(ClassSchedule.class_),
+    ),
+    'schedule_class': lambda: (
+        contains_eager(ClassSchedule.class_),
+    ),
+    'member_upcoming_bookings': lambda: (
+        contains_eager(Booking.class_schedule).contains_eager(ClassSchedule.class_)
+        .joinedload(Class.trainer).joinedload(Trainer.user),
+    ),
+    'admin_recent_payments': lambda: (
+        joinedload(Payment.user),
+    ),
+    'admin_recent_announcements': lambda: (
+        joinedload(Announcement.author),
+    ),
+}
+
+
+def loader_options(profile):
+    """Return the loader options registered under ``profile``."""
+    try:
+        return LOADER_PROFILES[profile]()
+    except KeyError:
+        raise ValueError(f'Unknown loader profile: {profile}') from None
+
+
+def with_profile(query, profile):
+    """Apply the loader options of ``profile`` to ``query``."""
+    return query.options(*loader_options(profile))
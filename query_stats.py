@@ -0,0 +1,101 @@
+"""
+Per-request SQL statistics and slow-query logging.
+
+Engine events time every statement. Inside a request the count, the total
+database time and the slowest statements are kept on ``g``; in debug mode
+they are returned as ``X-DB-*`` response headers. Statements slower than
+``SLOW_QUERY_MS`` are written to the ``fitclub.slow_query`` logger as one
+JSON object per line, whether or not a request is active.
+"""
+import json
+import logging
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULTS = {
+    'SLOW_QUERY_MS': 200,
+    # Number of slowest statements kept per request
+    'QUERY_STATS_TOP': 3,
+}
+
+slow_query_log = logging.getLogger('fitclub.slow_query')
+
+
+class QueryStats:
+    def __init__(self, top=3, slow_query_ms=DEFAULTS['SLOW_QUERY_MS']):
+        self.slow_query_ms = slow_query_ms
+        self.count = 0
+        self.total_ms = 0.0
+        self.top = top
+        self.slowest = []
+
+    def record(self, statement, duration_ms):
+        self.count += 1
+        self.total_ms += duration_ms
+        if len(self.slowest) < self.top or duration_ms > self.slowest[-1][0]:
+            self.slowest.append((duration_ms, statement))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[self.top:]
+
+
+def current_stats():
+    """Return the active request's :class:`QueryStats`, or ``None`` outside one."""
+    if not has_request_context():
+        return None
+    return g.get('query_stats')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started_at'].pop()
+    duration_ms = (time.perf_counter() - started) * 1000
+    stats = current_stats()
+    if stats is not None:
+        stats.record(statement, duration_ms)
+        threshold = stats.slow_query_ms
+    else:
+        threshold = DEFAULTS['SLOW_QUERY_MS']
+    if duration_ms >= threshold:
+        slow_query_log.warning(json.dumps({
+            'event': 'slow_query',
+            'duration_ms': round(duration_ms, 2),
+            'statement': ' '.join(statement.split()),
+            'endpoint': request.endpoint if has_request_context() else None,
+            'executemany': executemany,
+        }))
+
+
+def _handle_error(exception_context):
+    # Keep the timing stack balanced when a statement fails
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_started_at'):
+        conn.info['query_started_at'].pop()
+
+
+event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+event.listen(Engine, 'handle_error', _handle_error)
+
+
+def init_query_stats(app):
+    """Collect statistics for each of ``app``'s requests."""
+    @app.before_request
+    def _start_query_stats():
+        g.query_stats = QueryStats(top=app.config.get('QUERY_STATS_TOP', DEFAULTS['QUERY_STATS_TOP']),
+                                   slow_query_ms=app.config.get('SLOW_QUERY_MS', DEFAULTS['SLOW_QUERY_MS']))
+
+    @app.after_request
+    def _report_query_stats(response):
+        stats = current_stats()
+        if stats is not None and app.debug:
+            response.headers['X-DB-Query-Count'] = str(stats.count)
+            response.headers['X-DB-Time-ms'] = f'{stats.total_ms:.2f}'
+            if stats.slowest:
+                response.headers['X-DB-Slowest-ms'] = f'{stats.slowest[0][0]:.2f}'
+        return response
@@ -0,0 +1,177 @@
+"""
+Token-bucket throttling of login attempts.
+
+Every login POST takes a token from the bucket of the client IP and one from
+the bucket of the username before any password hash is computed; if either
+bucket is empty the attempt is rejected. A bucket holds ``attempts`` tokens
+and refills evenly over ``seconds``. With ``RATE_LIMIT_PATH`` set, buckets
+live in a SQLite file shared by all workers on the host and each take is one
+``BEGIN IMMEDIATE`` transaction. When that file cannot be used the limiter
+falls back to per-process buckets, which still throttle, just per worker.
+The file is not shared between hosts or pods, so each replica keeps its own
+buckets. Client IPs come from ``request.remote_addr``; behind proxies set
+``TRUSTED_PROXY_HOPS`` (see ``app.py``).
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from metrics import LOGIN_THROTTLED
+
+DEFAULTS = {
+    'LOGIN_RATE_LIMIT_ENABLED': True,
+    # (attempts, seconds)
+    'LOGIN_IP_LIMIT': (30, 60),
+    'LOGIN_USERNAME_LIMIT': (5, 300),
+    # SQLite file shared by the gunicorn workers; unset keeps buckets in-process
+    'RATE_LIMIT_PATH': None,
+}
+
+logger = logging.getLogger('fitclub.rate_limit')
+
+
+def _take(tokens, updated, now, capacity, period):
+    """Refill a bucket up to ``now`` and take a token.
+
+    Returns ``(tokens, retry_after)``; ``retry_after`` is 0 when a token was taken.
+    """
+    tokens = min(capacity, tokens + max(now - updated, 0) * capacity / period)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) * period / capacity
+
+
+class LocalBuckets:
+    """Token buckets in process memory, oldest evicted beyond ``maxsize``."""
+
+    def __init__(self, maxsize=100_000, clock=time.monotonic):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, period):
+        with self._lock:
+            now = self._clock()
+            tokens, updated = self._data.get(key, (capacity, now))
+            tokens, retry_after = _take(tokens, updated, now, capacity, period)
+            self._data[key] = (tokens, now)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return retry_after
+
+    def reset(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class SQLiteBuckets:
+    """Token buckets in a SQLite file, consistent across processes."""
+
+    # Buckets that have refilled completely are purged on every Nth take
+    PURGE_EVERY = 500
+
+    def __init__(self, path, timeout=0.5, clock=time.time):
+        self.path = path
+        self.timeout = timeout
+        self._clock = clock
+        self._local = threading.local()
+        self._takes = 0
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS rate_limit_buckets ('
+                         'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, '
+                         'full_at REAL NOT NULL)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key, capacity, period):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = self._clock()
+            row = conn.execute('SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens, retry_after = _take(tokens, updated, now, capacity, period)
+            conn.execute('INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at, full_at) '
+                         'VALUES (?, ?, ?, ?)', (key, tokens, now, now + (capacity - tokens) * period / capacity))
+            self._takes += 1
+            if self._takes % self.PURGE_EVERY == 0:
+                conn.execute('DELETE FROM rate_limit_buckets WHERE full_at <= ?', (now,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return retry_after
+
+    def reset(self, key):
+        self._connection().execute('DELETE FROM rate_limit_buckets WHERE key = ?', (key,))
+
+
+class LoginLimiter:
+    def __init__(self, ip_limit, username_limit, shared=None, local=None):
+        self.ip_limit = tuple(ip_limit)
+        self.username_limit = tuple(username_limit)
+        self.shared = shared
+        self.local = local or LocalBuckets()
+
+    def _take(self, key, limit):
+        if self.shared is not None:
+            try:
+                return self.shared.take(key, *limit)
+            except sqlite3.Error as exc:
+                logger.warning('rate limit store unavailable, using in-process buckets: %s', exc)
+        return self.local.take(key, *limit)
+
+    def check(self, ip, username):
+        """Take a token for the IP and the username; return seconds to wait, or 0 if allowed."""
+        retry_after = self._take(f'ip:{ip}', self.ip_limit)
+        if retry_after:
+            LOGIN_THROTTLED.inc(scope='ip')
+            return retry_after
+        retry_after = self._take(f'user:{username.lower()}', self.username_limit)
+        if retry_after:
+            LOGIN_THROTTLED.inc(scope='username')
+        return retry_after
+
+    def succeeded(self, username):
+        """Forget a user's failed attempts once they log in."""
+        key = f'user:{username.lower()}'
+        self.local.reset(key)
+        if self.shared is not None:
+            try:
+                self.shared.reset(key)
+            except sqlite3.Error as exc:
+                logger.warning('rate limit store unavailable: %s', exc)
+
+
+def _setting(app, name):
+    return app.config.get(name, DEFAULTS[name])
+
+
+def get_login_limiter(app=None):
+    """Return the app's login limiter, or None when rate limiting is disabled."""
+    app = app or current_app._get_current_object()
+    if not _setting(app, 'LOGIN_RATE_LIMIT_ENABLED'):
+        return None
+    limiter = app.extensions.get('login_limiter')
+    if limiter is None:
+        path = _setting(app, 'RATE_LIMIT_PATH')
+        limiter = app.extensions['login_limiter'] = LoginLimiter(
+            _setting(app, 'LOGIN_IP_LIMIT'),
+            _setting(app, 'LOGIN_USERNAME_LIMIT'),
+            shared=SQLiteBuckets(path) if path else None)
+    return limiter
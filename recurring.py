@@ -0,0 +1,104 @@
+"""
+Recurring and bulk bookings.
+
+A member who takes the same class every week books all of its dates at once
+("every Tuesday for 12 weeks") instead of one ``/api/book-class`` request
+per date. The request costs a fixed number of statements however many dates
+it covers: one SELECT for the member's existing bookings, one upsert for the
+missing class occurrences, one conditional UPDATE that claims a seat on
+every date still open (see ``capacity.reserve_seats``), one INSERT of the new
+bookings and one commit. Cancelled bookings are reactivated with one UPDATE
+conditional on their status; a date another request rebooked in the meantime
+gives its seat back and is reported as already booked. Dates that fail (wrong weekday, past, already
+booked, full) are reported with the reason; the others are booked.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+
+from sqlalchemy import insert, select, update
+
+from capacity import release_seat, reserve_seats
+from models import db, Booking, WaitlistEntry
+
+# Weeks (or dates) accepted in one request
+MAX_RECURRING_WEEKS = 26
+
+BulkBookingResult = namedtuple('BulkBookingResult', 'booked failed')
+
+
+def weekly_dates(schedule, start, weeks):
+    """The ``weeks`` dates of ``schedule``'s weekday from ``start`` on."""
+    first = start + timedelta(days=(schedule.day_of_week - start.weekday()) % 7)
+    return [first + timedelta(weeks=n) for n in range(weeks)]
+
+
+def _reactivate(user_id, schedule, dates):
+    """Confirm the member's cancelled bookings on ``dates``; return the dates that were still cancelled."""
+    statement = (update(Booking)
+                 .where(Booking.user_id == user_id, Booking.class_schedule_id == schedule.id,
+                        Booking.booking_date.in_(dates), Booking.status == 'cancelled')
+                 .values(status='confirmed')
+                 .execution_options(synchronize_session=False))
+    if db.session.get_bind().dialect.update_returning:
+        return set(db.session.scalars(statement.returning(Booking.booking_date)))
+    return {day for day in dates
+            if db.session.execute(statement.where(Booking.booking_date == day)).rowcount == 1}
+
+
+def book_dates(user_id, schedule, dates, today=None):
+    """Book ``user_id`` into ``schedule`` on each of ``dates``; the caller commits.
+
+    Returns a :class:`BulkBookingResult`: the booked dates in order and a
+    ``{date: reason}`` dict of the dates that were not booked.
+    """
+    today = today or date.today()
+    failed = {}
+    wanted = []
+    for day in sorted(set(dates)):
+        if day < today:
+            failed[day] = 'This class has already taken place'
+        elif day.weekday() != schedule.day_of_week:
+            failed[day] = 'The class does not run on this day'
+        else:
+            wanted.append(day)
+    if not wanted:
+        return BulkBookingResult([], failed)
+
+    existing = dict(db.session.execute(
+        select(Booking.booking_date, Booking.status).where(
+            Booking.user_id == user_id,
+            Booking.class_schedule_id == schedule.id,
+            Booking.booking_date.in_(wanted))).all())
+    for day, status in existing.items():
+        if status == 'confirmed':
+            failed[day] = 'Already booked for this class'
+    wanted = [day for day in wanted if day not in failed]
+
+    granted = reserve_seats(schedule, wanted) if wanted else set()
+    for day in wanted:
+        if day not in granted:
+            failed[day] = 'Class is full for the selected time'
+    booked = [day for day in wanted if day in granted]
+
+    new = [day for day in booked if day not in existing]
+    reactivated = [day for day in booked if day in existing]
+    if new:
+        db.session.execute(insert(Booking), [
+            dict(user_id=user_id, class_schedule_id=schedule.id, booking_date=day, status='confirmed')
+            for day in new])
+    if reactivated:
+        lost = set(reactivated) - _reactivate(user_id, schedule, reactivated)
+        for day in sorted(lost):
+            # A concurrent request rebooked this date first; give the seat back
+            release_seat(schedule.id, day)
+            failed[day] = 'Already booked for this class'
+        booked = [day for day in booked if day not in lost]
+    if booked:
+        # Booked directly; no longer waiting for these dates
+        db.session.execute(
+            update(WaitlistEntry)
+            .where(WaitlistEntry.user_id == user_id, WaitlistEntry.class_schedule_id == schedule.id,
+                   WaitlistEntry.waitlist_date.in_(booked), WaitlistEntry.status == 'waiting')
+            .values(status='booked')
+            .execution_options(synchronize_session=False))
+    return BulkBookingResult(booked, dict(sorted(failed.items())))
@@ -0,0 +1,133 @@
+"""
+In-memory cache of rendered pages and template fragments.
+
+Entries are keyed by route (or fragment name), audience and the data versions
+of the tables they were rendered from, so a write elsewhere makes them
+unreachable; commits in this worker also drop them outright. Whole pages are
+cached for anonymous visitors only, since the navigation bar of a signed-in
+user shows their name. Hits and misses are counted per page and fragment.
+"""
+import threading
+from collections import Counter
+from functools import wraps
+
+from flask import current_app, has_app_context, request, session
+from flask_login import current_user
+from markupsafe import Markup
+
+from cache import LocalCache
+from metrics import CACHE_REQUESTS
+from versions import all_versions, on_tables_changed
+
+DEFAULTS = {
+    'RENDER_CACHE_ENABLED': True,
+    'RENDER_CACHE_SIZE': 256,
+    'RENDER_CACHE_TTL': 60,
+}
+
+
+class RenderCache:
+    def __init__(self, maxsize=256, ttl=60):
+        self.store = LocalCache(maxsize=maxsize, ttl=ttl)
+        self.hits = Counter()
+        self.misses = Counter()
+        self._lock = threading.Lock()
+
+    def get(self, name, key):
+        value = self.store.get(key)
+        with self._lock:
+            if value is None:
+                self.misses[name] += 1
+            else:
+                self.hits[name] += 1
+        CACHE_REQUESTS.inc(cache='render', result='miss' if value is None else 'hit')
+        return value
+
+    def set(self, key, value):
+        self.store.set(key, value)
+
+    def get_or_render(self, name, key, render):
+        value = self.get(name, key)
+        if value is None:
+            value = render()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        self.store.clear()
+
+    def stats(self):
+        """Return ``{name: {'hits': n, 'misses': n}}`` for every page and fragment seen."""
+        with self._lock:
+            return {name: {'hits': self.hits[name], 'misses': self.misses[name]}
+                    for name in set(self.hits) | set(self.misses)}
+
+
+def _setting(app, name):
+    return app.config.get(name, DEFAULTS[name])
+
+
+def get_render_cache(app=None):
+    app = app or current_app
+    cache = app.extensions.get('render_cache')
+    if cache is None:
+        cache = app.extensions['render_cache'] = RenderCache(maxsize=_setting(app, 'RENDER_CACHE_SIZE'),
+                                                             ttl=_setting(app, 'RENDER_CACHE_TTL'))
+    return cache
+
+
+@on_tables_changed
+def _drop_rendered(tables):
+    if has_app_context():
+        get_render_cache().clear()
+
+
+def audience():
+    if not current_user.is_authenticated:
+        return 'anonymous'
+    return 'member' if current_user.has_role('member') else 'staff'
+
+
+def _version_key(tables):
+    versions = all_versions()
+    return tuple(versions.get(name, (0, None))[0] for name in tables)
+
+
+def _enabled():
+    return _setting(current_app, 'RENDER_CACHE_ENABLED') and not current_app.debug
+
+
+def cached_page(*tables):
+    """Serve anonymous GETs of the view from the render cache."""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            # Flashed messages are part of the page, so those renders are one-off
+            if (request.method != 'GET' or current_user.is_authenticated or not _enabled()
+                    or session.get('_flashes')):
+                return f(*args, **kwargs)
+
+            cache = get_render_cache()
+            key = ('page', request.full_path, _version_key(tables))
+            cached = cache.get(request.endpoint, key)
+            if cached is not None:
+                body, mimetype = cached
+                return current_app.response_class(body, mimetype=mimetype)
+
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not session.get('_flashes'):
+                cache.set(key, (response.get_data(), response.mimetype))
+            return response
+        return wrapper
+    return decorator
+
+
+def cached_fragment(name, *tables, caller):
+    """Jinja call block rendering its body once per audience and data version.
+
+    Usage: ``{% call cached_fragment('service_cards', 'classes') %}...{% endcall %}``
+    """
+    if not _enabled():
+        return Markup(caller())
+    key = ('fragment', name, audience(), _version_key(tables))
+    return Markup(get_render_cache().get_or_render(name, key, lambda: str(caller())))
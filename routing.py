@@ -0,0 +1,78 @@
+"""
+Routing of read-only requests to a replica database.
+
+With ``DATABASE_REPLICA_URL`` set, views decorated with :func:`read_only`
+and every GET to ``/api/`` read from the replica engine. Everything else
+stays on the primary: other views, every flush and DML statement, anything
+after the first write of a request, and every request from a client for
+``REPLICA_MAX_LAG`` seconds after it wrote something, so a member sees the
+booking they just made rather than a lagging copy.
+"""
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+DEFAULTS = {
+    # Seconds after a write during which the writer's requests stay on the primary
+    'REPLICA_MAX_LAG': 5.0,
+}
+
+_PRIMARY_UNTIL = '_db_primary_until'
+
+
+def read_only(view):
+    """Let ``view`` read from the replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def get_replica_engine(app=None):
+    app = app or current_app
+    return app.extensions.get('db_replica')
+
+
+def use_replica():
+    """Whether statements of the current request may go to the replica."""
+    if not has_request_context() or get_replica_engine() is None:
+        return False
+    if request.method not in ('GET', 'HEAD') or g.get('db_wrote'):
+        return False
+    if not (g.get('db_read_only') or request.path.startswith('/api/')):
+        return False
+    return session.get(_PRIMARY_UNTIL, 0) <= time.time()
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not getattr(clause, 'is_dml', False) and use_replica():
+            return get_replica_engine()
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _remember_write(session_, flush_context):
+    if has_request_context():
+        g.db_wrote = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _remember_statement_write(orm_execute_state):
+    # INSERT/UPDATE/DELETE run through session.execute() never flush
+    if has_request_context() and (orm_execute_state.is_insert or orm_execute_state.is_update
+                                  or orm_execute_state.is_delete):
+        g.db_wrote = True
+
+
+def init_routing(app):
+    """Keep a client on the primary for a while after each request that wrote."""
+    @app.after_request
+    def _pin_writer_to_primary(response):
+        if g.get('db_wrote') and get_replica_engine(app) is not None:
+            session[_PRIMARY_UNTIL] = time.time() + app.config.get('REPLICA_MAX_LAG', DEFAULTS['REPLICA_MAX_LAG'])
+        return response
@@ -1,26 +1,61 @@
 import os
 import sys
+import atexit
+import shutil
+import tempfile
+import itertools
 import pathlib
+from contextlib import contextmanager
+from datetime import date, time, timedelta
 import pytest
+from sqlalchemy import event
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from app import app as flask_app
+# Run against TEST_DATABASE_URL when set (e.g. a local PostgreSQL), otherwise a
+# throwaway SQLite file; never against the development database. The app reads
+# DATABASE_URL when an app is created.
+_TEST_DB_DIR = tempfile.mkdtemp(prefix='fitclub-tests-')
+atexit.register(shutil.rmtree, _TEST_DB_DIR, ignore_errors=True)
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL') or f'sqlite:///{_TEST_DB_DIR}/test.db'
+
+from sqlalchemy.engine import make_url
+
+from app import create_app
 from models import db
 
+SQLITE = make_url(os.environ['DATABASE_URL']).get_backend_name() == 'sqlite'
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'sqlite_only: needs the suite to run on SQLite (query plans, pragmas)')
+
+
+def pytest_collection_modifyitems(config, items):
+    if SQLITE:
+        return
+    skip = pytest.mark.skip(reason='TEST_DATABASE_URL is not SQLite')
+    for item in items:
+        if 'sqlite_only' in item.keywords:
+            item.add_marker(skip)
+
 
 @pytest.fixture(scope="session")
 def app():
     # Configure for testing
-    flask_app.config.update(
-        TESTING=True,
-        SECRET_KEY='test-secret',
-        SQLALCHEMY_DATABASE_URI='sqlite:///:memory:',  # Use in-memory database for tests
-        SQLALCHEMY_TRACK_MODIFICATIONS=False
-    )
-    return flask_app
+    return create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'test-secret',
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        # Many tests log in from the same client address; the limiter has its own tests
+        'LOGIN_RATE_LIMIT_ENABLED': False,
+        # Tests write queued check-ins with flush() instead of waiting for the writer thread
+        'CHECKIN_BATCH_SECONDS': 3600,
+        # Tests materialize class occurrences themselves instead of a background thread
+        'OCCURRENCE_REFRESH_SECONDS': 0,
+    })
 
 
 @pytest.fixture(scope="session")
@@ -51,10 +86,13 @@ def setup_database(app):
             db.session.add(member_role)
             
         db.session.commit()
-        
-        yield db
-        
-        # Clean up after tests
+
+    # Keep no app context pushed while tests run, otherwise every request
+    # shares one ``g`` and one database session
+    yield db
+
+    # Clean up after tests
+    with app.app_context():
         db.drop_all()
 
 
@@ -69,3 +107,98 @@ def app_context(app, setup_database):
         yield
 
 
+
+
+_unique = itertools.count(1)
+
+
+@pytest.fixture()
+def make_user(app, setup_database):
+    """Create a committed user with the given role (and its profile) and return its id"""
+    from models import Role, User, Member, Trainer
+
+    def _make(role_name='member', **fields):
+        n = next(_unique)
+        with app.app_context():
+            user = User(
+                username=fields.pop('username', f'{role_name}_{n}'),
+                email=fields.pop('email', f'{role_name}_{n}@example.com'),
+                first_name=fields.pop('first_name', role_name.title()),
+                last_name=fields.pop('last_name', str(n)),
+                password_hash='not-used',
+                **fields
+            )
+            user.roles.append(Role.query.filter_by(name=role_name).first())
+            db.session.add(user)
+            db.session.flush()
+            if role_name == 'member':
+                db.session.add(Member(user_id=user.id, membership_number=f'TM{n:06d}',
+                                      membership_type='Basic', expiry_date=date.today() + timedelta(days=30)))
+            elif role_name == 'trainer':
+                db.session.add(Trainer(user_id=user.id, trainer_id=f'TT{n:06d}', specialization='General Fitness'))
+            db.session.commit()
+            return user.id
+    return _make
+
+
+@pytest.fixture()
+def make_schedule(app, setup_database):
+    """Create an active class with one schedule for a trainer user and return the schedule id"""
+    from models import Class, ClassSchedule, Trainer
+
+    def _make(trainer_user_id, max_capacity=10, day_of_week=None):
+        with app.app_context():
+            trainer = Trainer.query.filter_by(user_id=trainer_user_id).first()
+            class_ = Class(name=f'Class {next(_unique)}', trainer_id=trainer.id, category='Cardio',
+                           max_capacity=max_capacity, duration_minutes=45)
+            db.session.add(class_)
+            db.session.flush()
+            schedule = ClassSchedule(class_id=class_.id,
+                                     day_of_week=date.today().weekday() if day_of_week is None else day_of_week,
+                                     start_time=time(7, 0), end_time=time(7, 45), room='Studio A')
+            db.session.add(schedule)
+            db.session.commit()
+            return schedule.id
+    return _make
+
+
+@pytest.fixture()
+def login_as(client):
+    """Mark the test client's session as logged in for a user id"""
+    def _login(user_id):
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+            sess['_fresh'] = True
+    return _login
+
+
+@pytest.fixture()
+def count_queries(app, setup_database):
+    """Context manager collecting every SQL statement executed while it is open"""
+    @contextmanager
+    def _count():
+        statements = []
+
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', _record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', _record)
+    return _count
+
+
+@pytest.fixture()
+def query_budget(count_queries):
+    """Context manager failing the test when more than ``limit`` statements run inside it"""
+    @contextmanager
+    def _budget(limit):
+        with count_queries() as statements:
+            yield statements
+        if len(statements) > limit:
+            pytest.fail(f'{len(statements)} queries exceed the budget of {limit}:\n' + '\n'.join(statements))
+    return _budget
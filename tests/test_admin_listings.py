@@ -0,0 +1,45 @@
+"""
+Admin listing pages must issue a constant number of queries regardless of row count
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from models import db, Booking, Payment
+
+
+def _add_rows(app, make_user, make_schedule, count):
+    trainer_id = make_user('trainer')
+    schedule_id = make_schedule(trainer_id)
+    for i in range(count):
+        user_id = make_user('member')
+        with app.app_context():
+            db.session.add(Booking(user_id=user_id, class_schedule_id=schedule_id,
+                                   booking_date=date.today() + timedelta(days=i)))
+            db.session.add(Payment(user_id=user_id, amount=20.0, payment_type='class',
+                                   payment_method='card', status='completed'))
+            db.session.commit()
+
+
+@pytest.mark.parametrize('path', [
+    '/admin',
+    '/admin/members',
+    '/admin/trainers',
+    '/admin/classes',
+    '/admin/bookings',
+    '/admin/payments',
+])
+def test_admin_listing_query_count_is_constant(app, client, make_user, make_schedule, login_as, count_queries, path):
+    login_as(make_user('admin'))
+    # Warm the user cache so both measured requests load the admin the same way
+    client.get(path)
+
+    _add_rows(app, make_user, make_schedule, 2)
+    with count_queries() as small:
+        assert client.get(path).status_code == 200
+
+    _add_rows(app, make_user, make_schedule, 6)
+    with count_queries() as large:
+        assert client.get(path).status_code == 200
+
+    assert len(large) == len(small)
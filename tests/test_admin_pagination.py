@@ -0,0 +1,84 @@
+"""
+Admin listings are keyset paginated with stable cursors and sortable columns
+"""
+import re
+from datetime import date, timedelta
+from html import unescape
+
+from models import db, Booking, Payment
+from pagination import MAX_PER_PAGE, clamp_per_page, decode_cursor, encode_cursor
+
+
+def _cursor(html, label):
+    match = re.search(r'href="([^"]*cursor=[^"]*)">%s<' % label, html)
+    return unescape(match.group(1)) if match else None
+
+
+def _payment_amounts(html):
+    return [float(a) for a in re.findall(r'<td>\$([0-9.]+)</td>', html)]
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('booking_date', date(2024, 5, 1), 42, 'next')
+    assert decode_cursor(cursor) == ('booking_date', '2024-05-01', 42, 'next')
+    assert decode_cursor('not-a-cursor') is None
+    assert decode_cursor('') is None
+
+
+def test_per_page_is_clamped():
+    assert clamp_per_page('5') == 5
+    assert clamp_per_page('0') == 1
+    assert clamp_per_page('100000') == MAX_PER_PAGE
+    assert clamp_per_page('abc') == clamp_per_page(None)
+
+
+def test_payments_walk_forward_and_back(app, client, make_user, login_as):
+    login_as(make_user('admin'))
+    member_id = make_user('member')
+    with app.app_context():
+        for amount in range(1000, 1007):
+            db.session.add(Payment(user_id=member_id, amount=float(amount), payment_type='class',
+                                   payment_method='card', status='completed'))
+        db.session.commit()
+
+    first = client.get('/admin/payments?sort=amount&direction=desc&per_page=3').get_data(as_text=True)
+    assert _payment_amounts(first)[:3] == [1006.0, 1005.0, 1004.0]
+    assert _cursor(first, 'Previous') is None
+
+    second = client.get(_cursor(first, 'Next')).get_data(as_text=True)
+    assert _payment_amounts(second) == [1003.0, 1002.0, 1001.0]
+
+    back = client.get(_cursor(second, 'Previous')).get_data(as_text=True)
+    assert _payment_amounts(back) == [1006.0, 1005.0, 1004.0]
+
+
+def test_new_rows_do_not_shift_next_page(app, client, make_user, make_schedule, login_as):
+    login_as(make_user('admin'))
+    schedule_id = make_schedule(make_user('trainer'))
+    member_id = make_user('member')
+    start = date(2030, 1, 1)
+    with app.app_context():
+        for i in range(4):
+            db.session.add(Booking(user_id=member_id, class_schedule_id=schedule_id,
+                                   booking_date=start + timedelta(days=i)))
+        db.session.commit()
+
+    first = client.get('/admin/bookings?sort=booking_date&direction=desc&per_page=2').get_data(as_text=True)
+    assert '2030-01-04' in first and '2030-01-03' in first
+    next_url = _cursor(first, 'Next')
+
+    # A newer booking lands on the first page; the cursor still resumes after 2030-01-03
+    with app.app_context():
+        db.session.add(Booking(user_id=member_id, class_schedule_id=schedule_id,
+                               booking_date=start + timedelta(days=10)))
+        db.session.commit()
+
+    second = client.get(next_url).get_data(as_text=True)
+    assert '2030-01-02' in second and '2030-01-01' in second
+    assert '2030-01-03' not in second
+
+
+def test_unknown_sort_and_bad_cursor_fall_back(client, make_user, login_as):
+    login_as(make_user('admin'))
+    resp = client.get('/admin/bookings?sort=password_hash&direction=sideways&cursor=%%%')
+    assert resp.status_code == 200
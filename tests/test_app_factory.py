@@ -0,0 +1,90 @@
+"""
+Application factory: blueprints, lazy view imports, preload/fork safety and the migration script
+"""
+import os
+import runpy
+import subprocess
+import sys
+
+import pytest
+from flask import request
+from sqlalchemy import create_engine, select, text
+
+from app import create_app, load_config
+from conftest import ROOT
+from migrations import main as migrate
+from models import db, Role
+from views import BLUEPRINTS
+
+
+def test_create_app_registers_every_blueprint(app):
+    assert set(app.blueprints) == set(BLUEPRINTS)
+    assert app.url_map.bind('localhost').match('/api/class-catalog') == ('api.get_class_catalog', {})
+    # Probes stay on the app so their metric labels do not change
+    assert {'healthz', 'readyz', 'metrics'} <= {rule.endpoint for rule in app.url_map.iter_rules()}
+
+
+def test_importing_app_does_not_import_view_modules():
+    probe = ("import sys, app; "
+             "print(sorted(m for m in sys.modules if m.startswith('views.') and m != 'views.auth'))")
+    output = subprocess.run([sys.executable, '-c', probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == '[]'
+
+
+def test_client_address_comes_from_trusted_proxies_only():
+    def client_address(hops):
+        app = create_app({'TESTING': True, 'OCCURRENCE_REFRESH_SECONDS': 0, 'TRUSTED_PROXY_HOPS': hops})
+        app.add_url_rule('/whoami', 'whoami', lambda: request.remote_addr)
+        return app.test_client().get('/whoami', environ_base={'REMOTE_ADDR': '10.0.0.5'},
+                                     headers={'X-Forwarded-For': '6.6.6.6, 203.0.113.7'}).get_data(as_text=True)
+
+    assert load_config({})['TRUSTED_PROXY_HOPS'] == 0
+    assert client_address(0) == '10.0.0.5'
+    # Only the address appended by the trusted proxy counts; the rest is client-supplied
+    assert client_address(1) == '203.0.113.7'
+
+
+def test_gunicorn_preloads_the_app():
+    config = runpy.run_path(os.path.join(ROOT, 'gunicorn.conf.py'))
+    assert config['preload_app'] is True
+    # Threads beyond the hashing pool and its queue keep serving during a login burst
+    assert config['worker_class'] == 'gthread'
+    assert config['threads'] > load_config({})['PASSWORD_HASH_WORKERS'] + load_config({})['PASSWORD_HASH_QUEUE']
+
+
+def test_forked_child_does_not_reuse_parent_connections(app, setup_database):
+    with app.app_context():
+        engine = db.engine
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+    assert engine.pool.checkedin() >= 1
+
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if engine.pool.checkedin() == 0 else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert engine.pool.checkedin() >= 1
+
+
+def test_migration_script_creates_schema_and_roles_once(tmp_path, monkeypatch):
+    url = f'sqlite:///{tmp_path}/migrate.db'
+    monkeypatch.setenv('DATABASE_URL', url)
+    migrate()
+    migrate()
+
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        assert sorted(conn.scalars(select(Role.name))) == ['admin', 'member', 'trainer']
+    engine.dispose()
+
+
+def test_app_refuses_to_start_without_secret_key(monkeypatch):
+    monkeypatch.delenv('SECRET_KEY', raising=False)
+    settings = {'OCCURRENCE_REFRESH_SECONDS': 0}
+    with pytest.raises(RuntimeError, match='SECRET_KEY'):
+        create_app(settings)
+    # Debug and test runs get a random key of their own
+    debug_key = create_app(dict(settings, DEBUG=True)).config['SECRET_KEY']
+    testing_key = create_app(dict(settings, TESTING=True)).config['SECRET_KEY']
+    assert debug_key and testing_key and debug_key != testing_key
@@ -0,0 +1,123 @@
+"""
+Roll calls are written with one upsert and one commit
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, text
+
+from migrations import upgrade_schema
+from models import db, Attendance, Booking
+
+
+def _book(app, schedule_id, *user_ids, day=None):
+    with app.app_context():
+        for user_id in user_ids:
+            db.session.add(Booking(user_id=user_id, class_schedule_id=schedule_id, booking_date=day or date.today()))
+        db.session.commit()
+
+
+def _statuses(app, schedule_id, day=None):
+    with app.app_context():
+        return {a.user_id: a.status for a in Attendance.query.filter_by(
+            class_schedule_id=schedule_id, attendance_date=day or date.today())}
+
+
+def _roll_call(client, schedule_id, records, **extra):
+    return client.post('/api/mark-attendance/bulk',
+                       json={'class_schedule_id': schedule_id, 'records': records, **extra})
+
+
+def test_roll_call_marks_whole_class_in_one_write(app, client, make_user, make_schedule, login_as, count_queries):
+    trainer_id = make_user('trainer')
+    schedule_id = make_schedule(trainer_id)
+    members = [make_user('member') for _ in range(5)]
+    _book(app, schedule_id, *members)
+    login_as(trainer_id)
+
+    records = [{'user_id': m, 'status': 'present'} for m in members[:4]] + [{'user_id': members[4], 'status': 'late'}]
+    with count_queries() as statements:
+        resp = _roll_call(client, schedule_id, records)
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body['marked'] == 5 and all(r['success'] for r in body['results'])
+    writes = [s for s in statements if s.lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))]
+    assert len(writes) == 1 and writes[0].lstrip().upper().startswith('INSERT INTO ATTENDANCE')
+    assert _statuses(app, schedule_id) == {**{m: 'present' for m in members[:4]}, members[4]: 'late'}
+
+    # Marking again replaces the earlier status instead of adding rows
+    assert _roll_call(client, schedule_id, [{'user_id': members[0], 'status': 'absent'}]).get_json()['success']
+    assert _statuses(app, schedule_id)[members[0]] == 'absent'
+    assert len(_statuses(app, schedule_id)) == 5
+
+
+def test_roll_call_reports_invalid_rows(app, client, make_user, make_schedule, login_as):
+    trainer_id = make_user('trainer')
+    schedule_id = make_schedule(trainer_id)
+    booked, unbooked = make_user('member'), make_user('member')
+    _book(app, schedule_id, booked)
+    login_as(trainer_id)
+
+    resp = _roll_call(client, schedule_id, [
+        {'user_id': booked, 'status': 'present'},
+        {'user_id': booked, 'status': 'late'},
+        {'user_id': unbooked, 'status': 'present'},
+        {'user_id': booked, 'status': 'asleep'},
+        {'user_id': 'x'},
+    ])
+    results = resp.get_json()['results']
+    assert [r['success'] for r in results] == [True, False, False, False, False]
+    assert [r.get('message') for r in results[1:]] == [
+        'Listed more than once', 'Not booked for this class', 'Invalid status', 'Invalid user id']
+    assert _statuses(app, schedule_id) == {booked: 'present'}
+
+
+def test_roll_call_for_a_past_date(app, client, make_user, make_schedule, login_as):
+    trainer_id = make_user('trainer')
+    schedule_id = make_schedule(trainer_id)
+    member_id = make_user('member')
+    last_week = date.today() - timedelta(days=7)
+    _book(app, schedule_id, member_id, day=last_week)
+    login_as(trainer_id)
+
+    assert _roll_call(client, schedule_id, [{'user_id': member_id}], date=last_week.isoformat()).get_json()['success']
+    assert _statuses(app, schedule_id, last_week) == {member_id: 'present'}
+    future = (date.today() + timedelta(days=1)).isoformat()
+    assert _roll_call(client, schedule_id, [{'user_id': member_id}], date=future).status_code == 400
+
+
+def test_roll_call_requires_the_schedules_trainer(app, client, make_user, make_schedule, login_as):
+    schedule_id = make_schedule(make_user('trainer'))
+    member_id = make_user('member')
+    _book(app, schedule_id, member_id)
+
+    login_as(make_user('trainer'))
+    assert _roll_call(client, schedule_id, [{'user_id': member_id}]).status_code == 403
+    login_as(member_id)
+    assert _roll_call(client, schedule_id, [{'user_id': member_id}]).status_code == 403
+    assert _statuses(app, schedule_id) == {}
+
+
+def test_attendance_page_renders(client, make_user, make_schedule, login_as):
+    trainer_id = make_user('trainer')
+    make_schedule(trainer_id)
+    login_as(trainer_id)
+    resp = client.get('/trainer/attendance')
+    assert resp.status_code == 200
+    assert b'saveRoll()' in resp.data
+
+
+def test_upgrade_drops_duplicate_attendance_before_unique_index(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "legacy.db"}')
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE attendance (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, '
+                             'class_schedule_id INTEGER NOT NULL, attendance_date DATE NOT NULL, '
+                             'check_in_time DATETIME, check_out_time DATETIME, status VARCHAR(20), '
+                             'notes TEXT, created_at DATETIME)')
+        conn.exec_driver_sql("INSERT INTO attendance (user_id, class_schedule_id, attendance_date, status) VALUES "
+                             "(1, 1, '2026-01-05', 'absent'), (1, 1, '2026-01-05', 'present'), "
+                             "(2, 1, '2026-01-05', 'late')")
+    upgrade_schema(engine)
+    with engine.connect() as conn:
+        rows = conn.execute(text('SELECT user_id, status FROM attendance ORDER BY user_id')).fetchall()
+    assert [tuple(r) for r in rows] == [(1, 'present'), (2, 'late')]
+    engine.dispose()
@@ -0,0 +1,78 @@
+"""
+Benchmark runner: journeys against the in-process app and baseline comparison
+"""
+import pytest
+from werkzeug.security import generate_password_hash
+
+from benchmark import Fixtures, InProcessSession, compare, percentile, run_scenario
+from generate_data import DEFAULT_PASSWORD
+from models import db, Member, User
+
+
+class _Fixtures:
+    def __init__(self, admins):
+        self.admins = admins
+
+
+def _result(p95_ms, rps=100.0, errors=0, requests=50):
+    step = {'requests': requests, 'errors': errors, 'rps': rps, 'mean_ms': p95_ms,
+            'p50_ms': p95_ms, 'p95_ms': p95_ms, 'p99_ms': p95_ms}
+    return {'scenarios': {'admin': {'rps': rps, 'steps': {'members': step}}}}
+
+
+def test_percentile_interpolates():
+    values = [1.0, 2.0, 3.0, 4.0]
+    assert percentile(values, 0.5) == 2.5
+    assert percentile(values, 0.99) == pytest.approx(3.97)
+    assert percentile([7.0], 0.95) == 7.0
+    assert percentile([], 0.5) is None
+
+
+def test_compare_flags_slower_steps_and_throughput():
+    baseline = _result(10.0)
+    assert compare(_result(11.0), baseline) == []
+    assert compare(_result(13.0), baseline) == ['admin.members: p95 13.0ms, baseline 10.0ms']
+    assert compare(_result(10.0, rps=70.0), baseline) == ['admin: 70.0 req/s, baseline 100.0 req/s']
+    assert compare(_result(10.0, errors=2), baseline) == ['admin.members: 2 failed requests, baseline had none']
+    # Too few samples or sub-millisecond noise
+    assert compare(_result(30.0, requests=5), _result(10.0, requests=5)) == []
+    assert compare(_result(0.3), _result(0.1)) == []
+
+
+def test_compare_flags_slower_startup():
+    def _startup(total_ms):
+        return dict(_result(10.0), startup={'runs': 5, 'total_ms': {'p50': total_ms, 'max': total_ms}})
+    assert compare(_startup(550.0), _startup(500.0)) == []
+    assert compare(_startup(700.0), _startup(500.0)) == ['startup: p50 700.0ms, baseline 500.0ms']
+    # Baselines recorded without a startup run
+    assert compare(_startup(700.0), _result(10.0)) == []
+
+
+def test_admin_journey_runs_in_process(app, make_user):
+    user_id = make_user('admin')
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        user.password_hash = generate_password_hash(DEFAULT_PASSWORD)
+        username = user.username
+        db.session.commit()
+
+    result = run_scenario('admin', lambda: InProcessSession(app), _Fixtures([username]),
+                          iterations=2, concurrency=1, seed=0)
+
+    assert result['journeys'] == 2 and result['errors'] == 0
+    assert set(result['steps']) == {'login', 'admin_dashboard', 'members', 'trainers', 'classes',
+                                    'bookings', 'payments', 'logout'}
+    login = result['steps']['login']
+    assert login['requests'] == 2 and login['p50_ms'] <= login['p95_ms'] <= login['p99_ms']
+
+
+def test_member_fixtures_have_a_member_profile(app, make_user):
+    with_profile, without_profile = make_user('member'), make_user('member')
+    with app.app_context():
+        Member.query.filter_by(user_id=without_profile).delete()
+        db.session.commit()
+        usernames = {user_id: db.session.get(User, user_id).username for user_id in (with_profile, without_profile)}
+        fixtures = Fixtures(db.engine, limit=100_000)
+
+    assert usernames[with_profile] in fixtures.members
+    assert usernames[without_profile] not in fixtures.members
@@ -0,0 +1,161 @@
+"""
+Class capacity is enforced through the seat count of each class occurrence
+"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from capacity import change_booking_status, reserve_seat
+from migrations import upgrade_schema
+from models import db, Booking, ClassOccurrence, ClassSchedule
+from waitlist import cancel_and_promote
+
+
+def _book(client, login_as, user_id, schedule_id, day):
+    login_as(user_id)
+    return client.post('/api/book-class', json={'class_schedule_id': schedule_id,
+                                                'booking_date': day.isoformat()})
+
+
+def _occupancy(app, schedule_id, day):
+    with app.app_context():
+        row = ClassOccurrence.query.filter_by(class_schedule_id=schedule_id, occurrence_date=day).first()
+        return row.booked_count if row else None
+
+
+def test_full_class_rejects_extra_bookings(app, client, make_user, make_schedule, login_as):
+    schedule_id = make_schedule(make_user('trainer'), max_capacity=2)
+    day = date.today() + timedelta(days=7)
+    members = [make_user('member') for _ in range(3)]
+
+    assert _book(client, login_as, members[0], schedule_id, day).get_json()['success']
+    assert _book(client, login_as, members[1], schedule_id, day).get_json()['success']
+    resp = _book(client, login_as, members[2], schedule_id, day)
+    assert resp.status_code == 400
+    assert _occupancy(app, schedule_id, day) == 2
+
+
+def test_cancel_frees_seat_and_rebooking_reuses_row(app, client, make_user, make_schedule, login_as):
+    schedule_id = make_schedule(make_user('trainer'), max_capacity=1)
+    day = date.today() + timedelta(days=7)
+    first, second = make_user('member'), make_user('member')
+
+    assert _book(client, login_as, first, schedule_id, day).get_json()['success']
+    assert not _book(client, login_as, first, schedule_id, day).get_json()['success']
+    assert _book(client, login_as, second, schedule_id, day).status_code == 400
+
+    with app.app_context():
+        booking_id = Booking.query.filter_by(user_id=first, class_schedule_id=schedule_id).one().id
+    login_as(first)
+    client.post(f'/member/bookings/{booking_id}/cancel')
+    assert _occupancy(app, schedule_id, day) == 0
+
+    assert _book(client, login_as, second, schedule_id, day).get_json()['success']
+    assert _book(client, login_as, first, schedule_id, day).status_code == 400
+    with app.app_context():
+        assert Booking.query.filter_by(user_id=first, class_schedule_id=schedule_id).count() == 1
+
+
+def test_interleaved_cancellations_release_one_seat(app, client, make_user, make_schedule, login_as):
+    schedule_id = make_schedule(make_user('trainer'), max_capacity=2)
+    day = date.today() + timedelta(days=7)
+    member_id = make_user('member')
+    assert _book(client, login_as, member_id, schedule_id, day).get_json()['success']
+    assert _book(client, login_as, make_user('member'), schedule_id, day).get_json()['success']
+    with app.app_context():
+        booking_id = Booking.query.filter_by(user_id=member_id, class_schedule_id=schedule_id).one().id
+
+    # Both sessions read the booking as confirmed before either cancels it
+    with app.app_context():
+        first = db.session.get(Booking, booking_id)
+        with app.app_context():
+            second = db.session.get(Booking, booking_id)
+            assert first.status == second.status == 'confirmed'
+            assert cancel_and_promote(second)
+            db.session.commit()
+        assert not cancel_and_promote(first)
+        db.session.commit()
+    assert _occupancy(app, schedule_id, day) == 1
+
+
+def test_interleaved_rebookings_keep_one_seat(app, client, make_user, make_schedule, login_as):
+    schedule_id = make_schedule(make_user('trainer'), max_capacity=2)
+    day = date.today() + timedelta(days=7)
+    member_id = make_user('member')
+    assert _book(client, login_as, member_id, schedule_id, day).get_json()['success']
+    with app.app_context():
+        booking_id = Booking.query.filter_by(user_id=member_id, class_schedule_id=schedule_id).one().id
+    client.post(f'/member/bookings/{booking_id}/cancel')
+    assert _occupancy(app, schedule_id, day) == 0
+
+    # Both sessions read the booking as cancelled; the second to claim it gives its seat back
+    with app.app_context():
+        first = db.session.get(Booking, booking_id)
+        with app.app_context():
+            second = db.session.get(Booking, booking_id)
+            assert first.status == second.status == 'cancelled'
+            assert reserve_seat(db.session.get(ClassSchedule, schedule_id), day)
+            assert change_booking_status(second.id, 'cancelled', 'confirmed')
+            db.session.commit()
+        assert reserve_seat(db.session.get(ClassSchedule, schedule_id), day)
+        assert not change_booking_status(first.id, 'cancelled', 'confirmed')
+        db.session.rollback()
+    assert _occupancy(app, schedule_id, day) == 1
+    assert not _book(client, login_as, member_id, schedule_id, day).get_json()['success']
+
+
+def test_counter_starts_from_existing_bookings(app, client, make_user, make_schedule, login_as):
+    schedule_id = make_schedule(make_user('trainer'), max_capacity=2)
+    day = date.today() + timedelta(days=7)
+    with app.app_context():
+        for _ in range(2):
+            db.session.add(Booking(user_id=make_user('member'), class_schedule_id=schedule_id, booking_date=day))
+        db.session.commit()
+
+    assert _book(client, login_as, make_user('member'), schedule_id, day).status_code == 400
+    assert _occupancy(app, schedule_id, day) == 2
+
+
+def test_duplicate_booking_rejected_by_database(app, make_user, make_schedule):
+    schedule_id = make_schedule(make_user('trainer'))
+    member_id = make_user('member')
+    with app.app_context():
+        for _ in range(2):
+            db.session.add(Booking(user_id=member_id, class_schedule_id=schedule_id, booking_date=date.today()))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+
+def test_upgrade_keeps_one_booking_per_member_and_date(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "legacy.db"}')
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE bookings (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, '
+                             'class_schedule_id INTEGER NOT NULL, booking_date DATE NOT NULL, '
+                             'status VARCHAR(20), payment_status VARCHAR(20), created_at DATETIME)')
+        conn.exec_driver_sql('CREATE INDEX ix_bookings_user_schedule_date '
+                             'ON bookings (user_id, class_schedule_id, booking_date)')
+        conn.exec_driver_sql("INSERT INTO bookings (user_id, class_schedule_id, booking_date, status) VALUES "
+                             "(1, 1, '2026-01-05', 'confirmed'), (1, 1, '2026-01-05', 'cancelled'), "
+                             "(2, 1, '2026-01-05', 'cancelled'), (2, 1, '2026-01-05', 'completed')")
+    upgrade_schema(engine)
+    with engine.connect() as conn:
+        rows = conn.execute(text('SELECT id, user_id, status FROM bookings ORDER BY user_id')).fetchall()
+    assert [tuple(r) for r in rows] == [(1, 1, 'confirmed'), (4, 2, 'completed')]
+    indexes = {ix['name'] for ix in inspect(engine).get_indexes('bookings')}
+    assert 'uq_bookings_user_schedule_date' in indexes and 'ix_bookings_user_schedule_date' not in indexes
+    engine.dispose()
+
+
+def test_upgrade_drops_the_old_occupancy_table(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "legacy.db"}')
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE class_occupancy (class_schedule_id INTEGER NOT NULL, '
+                             'occurrence_date DATE NOT NULL, booked INTEGER NOT NULL, '
+                             'PRIMARY KEY (class_schedule_id, occurrence_date))')
+    upgrade_schema(engine)
+    tables = set(inspect(engine).get_table_names())
+    assert 'class_occupancy' not in tables and 'class_occurrences' in tables
+    engine.dispose()
@@ -0,0 +1,177 @@
+"""
+QR check-in: signed tokens, the kiosk endpoint and batched attendance writes
+"""
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import ROOT
+from checkin import CheckInBatcher, QRImages, TokenSigner, get_checkin_batcher, get_token_signer, pregenerate_qr_codes
+from models import db, Attendance, Booking
+
+
+@pytest.fixture()
+def booking(app, make_user, make_schedule):
+    """Create a confirmed booking and return ``(booking_id, member_id, token)``"""
+    def _make(day=None, status='confirmed'):
+        member_id = make_user('member')
+        schedule_id = make_schedule(make_user('trainer'))
+        with app.app_context():
+            booking = Booking(user_id=member_id, class_schedule_id=schedule_id,
+                              booking_date=day or date.today(), status=status)
+            db.session.add(booking)
+            db.session.commit()
+            return booking.id, member_id, get_token_signer().for_booking(booking)
+    return _make
+
+
+def _attended(app, user_id):
+    with app.app_context():
+        return [a.status for a in Attendance.query.filter_by(user_id=user_id)]
+
+
+def test_token_round_trip_and_tampering():
+    signer = TokenSigner('secret')
+    token = signer.sign(12, 34, 56, date(2026, 3, 2))
+    assert len(token) == 39 and token.isalnum() and token.isupper()
+    assert tuple(signer.load(token.lower())) == (12, 34, 56, date(2026, 3, 2))
+
+    forged = token[:3] + ('A' if token[3] != 'A' else 'B') + token[4:]
+    assert signer.load(forged) is None
+    assert signer.load(token[:-2]) is None
+    assert signer.load('not a token!') is None
+    assert signer.load(123) is None and signer.load(None) is None and signer.load(['x']) is None
+    assert TokenSigner('other secret').load(token) is None
+
+
+def test_kiosk_check_in_is_queued_then_written_in_one_batch(app, client, make_user, login_as, booking,
+                                                           count_queries):
+    login_as(make_user('trainer'))
+    checked_in = [booking() for _ in range(3)]
+
+    for _, _, token in checked_in:
+        resp = client.post('/api/check-in', json={'token': token})
+        assert resp.status_code == 202
+    assert _attended(app, checked_in[0][1]) == []
+
+    repeat = client.post('/api/check-in', json={'token': checked_in[0][2]})
+    assert repeat.status_code == 200 and repeat.get_json()['message'] == 'Already checked in'
+
+    with count_queries() as statements:
+        assert get_checkin_batcher(app).flush() == 3
+    assert len(statements) == 2
+    assert all(_attended(app, member_id) == ['present'] for _, member_id, _ in checked_in)
+
+
+def test_kiosk_key_skips_the_database(app, client, booking, count_queries):
+    _, member_id, token = booking()
+    app.config['CHECKIN_KIOSK_KEY'] = 'front-desk'
+    try:
+        assert client.post('/api/check-in', json={'token': token}).status_code == 403
+        assert client.post('/api/check-in', json={'token': token},
+                           headers={'X-Kiosk-Key': 'wrong'}).status_code == 403
+        with count_queries() as statements:
+            resp = client.post('/api/check-in', json={'token': token}, headers={'X-Kiosk-Key': 'front-desk'})
+        assert resp.status_code == 202
+        assert statements == []
+    finally:
+        app.config['CHECKIN_KIOSK_KEY'] = None
+    get_checkin_batcher(app).flush()
+    assert _attended(app, member_id) == ['present']
+
+
+def test_kiosk_rejects_other_days_and_bad_codes(app, client, make_user, login_as, booking):
+    login_as(make_user('admin'))
+    _, _, tomorrow = booking(day=date.today() + timedelta(days=1))
+    assert client.post('/api/check-in', json={'token': tomorrow}).status_code == 400
+    assert client.post('/api/check-in', data={'token': 'XXXX'}).status_code == 400
+    assert client.post('/api/check-in', json={'token': 123}).status_code == 400
+    assert client.post('/api/check-in', json=[tomorrow]).status_code == 400
+
+    login_as(make_user('member'))
+    assert client.post('/api/check-in', json={'token': tomorrow}).status_code == 403
+
+
+def test_cancelled_booking_is_dropped_from_the_batch(app, client, make_user, login_as, booking):
+    login_as(make_user('trainer'))
+    _, member_id, token = booking(status='cancelled')
+    assert client.post('/api/check-in', json={'token': token}).status_code == 202
+    assert get_checkin_batcher(app).flush() == 0
+    assert _attended(app, member_id) == []
+
+
+def test_writer_thread_flushes_after_the_delay(app, booking):
+    batcher = CheckInBatcher(app, batch_size=100, max_delay=0.05)
+    _, member_id, token = booking()
+    with app.app_context():
+        assert batcher.add(get_token_signer().load(token))
+    deadline = time.monotonic() + 5
+    while not _attended(app, member_id) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert _attended(app, member_id) == ['present']
+
+
+def test_member_gets_qr_for_own_booking(app, client, login_as, make_user, booking):
+    booking_id, member_id, _ = booking()
+    login_as(member_id)
+    resp = client.get(f'/member/bookings/{booking_id}/qr.png')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'image/png' and resp.data.startswith(b'\x89PNG')
+    assert b'Check-in Code' in client.get('/member/bookings').data
+
+    login_as(make_user('member'))
+    assert client.get(f'/member/bookings/{booking_id}/qr.png').status_code == 404
+
+
+def test_pregenerate_writes_tomorrows_codes_to_disk(app, tmp_path, booking):
+    tomorrow = date.today() + timedelta(days=1)
+    _, _, token = booking(day=tomorrow)
+    with app.app_context():
+        images = app.extensions['checkin_qr'] = QRImages(str(tmp_path))
+        try:
+            assert pregenerate_qr_codes(tomorrow) >= 1
+            assert (tmp_path / f'{token}.png').read_bytes().startswith(b'\x89PNG')
+            assert pregenerate_qr_codes(tomorrow) == 0
+            assert QRImages(str(tmp_path)).get(token) == images.get(token)
+        finally:
+            del app.extensions['checkin_qr']
+
+
+def test_qrcode_and_pillow_are_imported_only_to_render():
+    probe = ("import sys; from app import create_app; create_app({'TESTING': True}); "
+             "print(sorted(m for m in ('qrcode', 'PIL') if m in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == '[]'
+
+
+def test_failed_batch_is_retried_then_dropped(app, booking, monkeypatch):
+    batcher = CheckInBatcher(app, batch_size=100, max_delay=3600, retries=2, retry_delay=3600)
+    (_, first_member, first), (_, second_member, second) = booking(), booking()
+    signer = TokenSigner(app.config['SECRET_KEY'])
+    write = batcher._write
+    failures = iter([True])
+
+    def flaky_write(batch):
+        if next(failures, False):
+            raise RuntimeError('database unavailable')
+        return write(batch)
+
+    monkeypatch.setattr(batcher, '_write', flaky_write)
+    assert batcher.add(signer.load(first))
+    assert batcher.flush() == 0
+    # The failed check-in stays queued ahead of later ones and is written with them
+    assert batcher.add(signer.load(second))
+    assert [token.user_id for token, _, _ in batcher._pending] == [first_member, second_member]
+    assert batcher.flush() == 2
+    assert _attended(app, first_member) == _attended(app, second_member) == ['present']
+
+    # A batch that keeps failing is dropped after the last retry and can be scanned again
+    booking_id, member_id, token = booking()
+    monkeypatch.setattr(batcher, '_write', lambda batch: 1 / 0)
+    assert batcher.add(signer.load(token))
+    assert [batcher.flush() for _ in range(3)] == [0, 0, 0]
+    assert batcher._pending == [] and _attended(app, member_id) == []
+    assert not batcher._seen.get(booking_id)
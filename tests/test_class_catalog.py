@@ -0,0 +1,54 @@
+"""
+The class catalog returns schedules and remaining seats in a fixed number of queries
+"""
+from datetime import date, timedelta
+
+from models import db, Booking
+from occurrences import materialize
+
+
+def _find_schedule(payload, schedule_id):
+    for class_ in payload['data']:
+        for schedule in class_['schedules']:
+            if schedule['id'] == schedule_id:
+                return class_, schedule
+    return None, None
+
+
+def test_catalog_reports_remaining_seats(app, client, make_user, make_schedule):
+    trainer_id = make_user('trainer')
+    start = date.today() + timedelta(days=60)
+    schedule_id = make_schedule(trainer_id, max_capacity=3, day_of_week=start.weekday())
+    with app.app_context():
+        db.session.add(Booking(user_id=make_user('member'), class_schedule_id=schedule_id, booking_date=start))
+        db.session.add(Booking(user_id=make_user('member'), class_schedule_id=schedule_id, booking_date=start,
+                               status='cancelled'))
+        materialize(start, 14)
+        db.session.commit()
+
+    resp = client.get(f'/api/class-catalog?start={start.isoformat()}&days=14')
+    assert resp.status_code == 200
+    assert 'max-age=30' in resp.headers['Cache-Control']
+
+    class_, schedule = _find_schedule(resp.get_json(), schedule_id)
+    assert class_['trainer_name'].startswith('Trainer')
+    assert [o['date'] for o in schedule['occurrences']] == [start.isoformat(), (start + timedelta(days=7)).isoformat()]
+    assert schedule['occurrences'][0]['remaining'] == 2
+    assert schedule['occurrences'][1]['remaining'] == 3
+
+
+def test_catalog_query_count_is_constant(client, make_user, make_schedule, count_queries):
+    make_schedule(make_user('trainer'))
+    with count_queries() as small:
+        client.get('/api/class-catalog')
+
+    for _ in range(4):
+        make_schedule(make_user('trainer'))
+    with count_queries() as large:
+        client.get('/api/class-catalog')
+
+    assert len(large) == len(small) == 2
+
+
+def test_catalog_rejects_bad_dates(client):
+    assert client.get('/api/class-catalog?start=tomorrow').status_code == 400
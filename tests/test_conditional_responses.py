@@ -0,0 +1,76 @@
+"""
+Read-mostly pages answer 304 from per-table data versions
+"""
+from datetime import datetime
+
+from models import db, Announcement, Class, Role, User
+
+
+def test_repeat_visit_is_not_modified_without_queries(client, count_queries):
+    first = client.get('/services')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert not etag.startswith('W/')
+
+    with count_queries() as statements:
+        resp = client.get('/services', headers={'If-None-Match': etag})
+    assert resp.status_code == 304
+    assert resp.data == b''
+    assert statements == []
+
+
+def test_if_modified_since_is_honoured(app, client, make_user):
+    author_id = make_user('admin')
+    with app.app_context():
+        db.session.add(Announcement(title='Open day', message='Bring a friend', author_id=author_id))
+        db.session.commit()
+
+    last_modified = client.get('/').headers['Last-Modified']
+    assert client.get('/', headers={'If-Modified-Since': last_modified}).status_code == 304
+    assert client.get('/', headers={'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'}).status_code == 200
+
+
+def test_class_and_trainer_changes_invalidate(app, client, make_user, make_schedule):
+    trainer_id = make_user('trainer')
+    schedule_id = make_schedule(trainer_id)
+    etag = client.get('/services').headers['ETag']
+
+    with app.app_context():
+        db.session.get(User, trainer_id).last_login = datetime.utcnow()
+        db.session.commit()
+    assert client.get('/services', headers={'If-None-Match': etag}).status_code == 304
+
+    with app.app_context():
+        db.session.get(User, trainer_id).first_name = 'Renamed'
+        db.session.commit()
+    resp = client.get('/services', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    etag = resp.headers['ETag']
+
+    with app.app_context():
+        Class.query.filter(Class.schedules.any(id=schedule_id)).one().max_capacity = 99
+        db.session.commit()
+    assert client.get('/services', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_etag_is_per_user(client, make_user, login_as):
+    login_as(make_user('member'))
+    first = client.get('/member/classes').headers['ETag']
+    login_as(make_user('member'))
+    resp = client.get('/member/classes', headers={'If-None-Match': first})
+    assert resp.status_code == 200
+    assert resp.headers['ETag'] != first
+
+
+def test_etag_changes_with_the_users_roles(app, client, make_user, login_as):
+    member_id = make_user('member')
+    login_as(member_id)
+    first = client.get('/member/classes').headers['ETag']
+
+    with app.app_context():
+        user = db.session.get(User, member_id)
+        user.roles.append(Role.query.filter_by(name='trainer').one())
+        db.session.commit()
+    resp = client.get('/member/classes', headers={'If-None-Match': first})
+    assert resp.status_code == 200
+    assert resp.headers['ETag'] != first
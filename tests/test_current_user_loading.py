@@ -0,0 +1,39 @@
+"""
+The logged-in user's roles and profile are loaded once per request
+"""
+import pytest
+
+from models import db, Role, User
+
+
+@pytest.mark.parametrize('role, path', [
+    ('member', '/member/profile'),
+    ('trainer', '/trainer/classes'),
+])
+def test_user_roles_and_profile_load_once(client, make_user, login_as, count_queries, role, path):
+    login_as(make_user(role))
+    with count_queries() as statements:
+        assert client.get(path).status_code == 200
+
+    user_loads = [s for s in statements if 'FROM users' in s]
+    role_loads = [s for s in statements if 'FROM roles' in s or 'JOIN roles' in s]
+    profile_loads = [s for s in statements if s.lstrip().startswith(('SELECT members', 'SELECT trainers'))]
+    assert len(user_loads) == 1
+    assert len(role_loads) == 1
+    assert profile_loads == []
+
+
+def test_role_names_follow_role_changes(app, make_user):
+    user_id = make_user('member')
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        assert user.has_role('member') and not user.has_role('trainer')
+
+        user.roles.append(Role.query.filter_by(name='trainer').first())
+        assert user.has_role('trainer')
+
+        db.session.commit()
+        user.roles.clear()
+        assert not user.has_role('member')
+        db.session.rollback()
+        assert user.has_role('member')
@@ -0,0 +1,45 @@
+"""
+Database settings come from the environment
+"""
+import os
+
+from database import INSTANCE_DIR, database_config
+
+
+def test_defaults_to_sqlite_without_pool_options():
+    assert database_config({}) == {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(INSTANCE_DIR, "fitness_club.db")}'}
+    assert database_config({'DATABASE_URL': 'sqlite:////data/fitclub.db'}) == {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:////data/fitclub.db'}
+
+
+def test_postgres_gets_a_bounded_pre_pinged_pool():
+    config = database_config({'DATABASE_URL': 'postgres://fitclub:pw@db:5432/fitclub'})
+    assert config['SQLALCHEMY_DATABASE_URI'] == 'postgresql://fitclub:pw@db:5432/fitclub'
+    assert config['SQLALCHEMY_ENGINE_OPTIONS'] == {
+        'pool_size': 5,
+        'max_overflow': 5,
+        'pool_timeout': 10.0,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'connect_args': {'connect_timeout': 5},
+    }
+
+
+def test_pool_settings_are_read_from_the_environment():
+    options = database_config({
+        'DATABASE_URL': 'postgresql+psycopg2://db/fitclub',
+        'DB_POOL_SIZE': '2',
+        'DB_MAX_OVERFLOW': '0',
+        'DB_POOL_RECYCLE': '300',
+        'DB_POOL_PRE_PING': '0',
+    })['SQLALCHEMY_ENGINE_OPTIONS']
+    assert (options['pool_size'], options['max_overflow'], options['pool_recycle']) == (2, 0, 300)
+    assert options['pool_pre_ping'] is False
+
+
+def test_relative_sqlite_paths_resolve_where_the_app_puts_them(app):
+    url = database_config({'DATABASE_URL': 'sqlite:///perf_data.db'})['SQLALCHEMY_DATABASE_URI']
+    # Flask-SQLAlchemy anchors relative paths in the instance folder; scripts must agree with it
+    assert url == f'sqlite:///{os.path.join(app.instance_path, "perf_data.db")}'
+    assert database_config({'DATABASE_URL': 'sqlite://'})['SQLALCHEMY_DATABASE_URI'] == 'sqlite://'
@@ -0,0 +1,60 @@
+"""
+The synthetic data generator is reproducible and respects the schema's invariants
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from generate_data import Generator
+from migrations import upgrade_schema
+
+
+def _generate(path, seed):
+    engine = create_engine(f'sqlite:///{path}')
+    upgrade_schema(engine)
+    inserted = Generator(engine, seed=seed, scale=0.001, years=1, batch_size=500,
+                         end_date=date(2025, 6, 30), log=lambda *_: None).run()
+    return engine, inserted
+
+
+def test_same_seed_gives_same_data(tmp_path):
+    engine_a, inserted_a = _generate(tmp_path / 'a.db', seed=3)
+    engine_b, inserted_b = _generate(tmp_path / 'b.db', seed=3)
+    assert inserted_a == inserted_b
+    assert inserted_a['users'] == 100 and inserted_a['bookings'] > 1000
+
+    query = text('SELECT user_id, class_schedule_id, booking_date, status FROM bookings ORDER BY id LIMIT 50')
+    with engine_a.connect() as a, engine_b.connect() as b:
+        assert a.execute(query).fetchall() == b.execute(query).fetchall()
+
+
+def test_generated_bookings_fit_constraints(tmp_path):
+    engine, _ = _generate(tmp_path / 'data.db', seed=5)
+    with engine.connect() as conn:
+        overbooked = conn.execute(text(
+            'SELECT COUNT(*) FROM (SELECT b.class_schedule_id, b.booking_date, COUNT(*) AS n, c.max_capacity '
+            'FROM bookings b JOIN class_schedules s ON s.id = b.class_schedule_id '
+            'JOIN classes c ON c.id = s.class_id '
+            'GROUP BY b.class_schedule_id, b.booking_date HAVING n > c.max_capacity)')).scalar()
+        wrong_weekday = conn.execute(text(
+            "SELECT COUNT(*) FROM bookings b JOIN class_schedules s ON s.id = b.class_schedule_id "
+            "WHERE (CAST(strftime('%w', b.booking_date) AS INTEGER) + 6) % 7 != s.day_of_week")).scalar()
+    assert overbooked == 0
+    assert wrong_weekday == 0
+
+
+def test_refuses_to_fill_a_populated_database(tmp_path):
+    engine, _ = _generate(tmp_path / 'data.db', seed=1)
+    with pytest.raises(SystemExit):
+        Generator(engine, scale=0.001, log=lambda *_: None).run()
+
+
+def test_every_member_account_has_a_profile(tmp_path):
+    engine, _ = _generate(tmp_path / 'data.db', seed=2)
+    with engine.connect() as conn:
+        without_profile = conn.execute(text(
+            "SELECT COUNT(*) FROM user_roles ur JOIN roles r ON r.id = ur.role_id "
+            "LEFT JOIN members m ON m.user_id = ur.user_id WHERE r.name = 'member' AND m.id IS NULL")).scalar()
+        members = conn.execute(text('SELECT COUNT(*) FROM members')).scalar()
+    assert without_profile == 0 and members > 0
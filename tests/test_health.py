@@ -0,0 +1,37 @@
+"""
+Health probes are cheap: liveness does no I/O, readiness pings at most once per period
+"""
+import threading
+
+from health import ReadinessCheck
+
+
+def test_healthz_does_no_queries(client, count_queries):
+    with count_queries() as statements:
+        resp = client.get('/healthz')
+    assert resp.status_code == 200
+    assert resp.get_json()['status'] == 'ok'
+    assert statements == []
+
+
+def test_readyz_pings_once_per_period(app, client, count_queries):
+    app.extensions.pop('readiness', None)
+    with count_queries() as statements:
+        assert client.get('/readyz').status_code == 200
+        assert client.get('/readyz').status_code == 200
+    assert statements == ['SELECT 1']
+
+
+def test_failed_or_hung_ping_reports_unavailable(app):
+    failing = ReadinessCheck(app, timeout=1, cache_seconds=0)
+    failing._ping = lambda: 1 / 0
+    assert failing.check() == (False, 'database unavailable: ZeroDivisionError')
+
+    release = threading.Event()
+    hung = ReadinessCheck(app, timeout=0.05, cache_seconds=0)
+    hung._ping = lambda: release.wait(5)
+    try:
+        assert hung.check() == (False, 'database ping timed out')
+        assert hung.check() == (False, 'database ping still running')
+    finally:
+        release.set()
@@ -0,0 +1,77 @@
+"""
+/metrics exposes per-endpoint latency and counters summed across worker processes
+"""
+import multiprocessing
+import re
+
+import metrics
+from app import create_app
+from metrics import Exporter
+
+
+def _sample(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+def test_metrics_endpoint_reports_requests(client):
+    client.get('/healthz')
+    body = client.get('/metrics').get_data(as_text=True)
+
+    assert '# TYPE fitclub_http_request_duration_seconds histogram' in body
+    assert _sample(body, 'fitclub_http_requests_total{endpoint="healthz",method="GET",status="200"}') >= 1
+    assert re.search(r'fitclub_http_request_duration_seconds_bucket\{endpoint="healthz",le="\+Inf"\} \d+', body)
+    assert 'fitclub_http_request_duration_seconds_count{endpoint="healthz"}' in body
+
+
+def test_metrics_are_served_to_allowed_networks_and_token_holders():
+    app = create_app({'TESTING': True, 'OCCURRENCE_REFRESH_SECONDS': 0,
+                      'METRICS_ALLOWED_NETWORKS': '10.0.0.0/8', 'METRICS_TOKEN': 'scrape-me'})
+    client = app.test_client()
+
+    def status(address, **headers):
+        return client.get('/metrics', environ_base={'REMOTE_ADDR': address}, headers=headers).status_code
+
+    assert status('10.1.2.3') == 200
+    assert status('203.0.113.7') == 404
+    assert status('203.0.113.7', Authorization='Bearer wrong') == 404
+    assert status('203.0.113.7', Authorization='Bearer scrape-me') == 200
+
+
+def test_booking_outcomes_are_counted(client, make_user, make_schedule, login_as):
+    # 2031-01-06 is a Monday
+    schedule_id = make_schedule(make_user('trainer'), max_capacity=0, day_of_week=0)
+    before = _sample(client.get('/metrics').get_data(as_text=True), 'fitclub_bookings_total{result="full"}')
+
+    login_as(make_user('member'))
+    client.post('/api/book-class', json={'class_schedule_id': schedule_id, 'booking_date': '2031-01-06'})
+
+    after = _sample(client.get('/metrics').get_data(as_text=True), 'fitclub_bookings_total{result="full"}')
+    assert after == before + 1
+
+
+def _worker(directory, bookings):
+    # A forked worker starts counting from zero
+    metrics.REGISTRY.reset()
+    metrics.BOOKINGS.inc(bookings, result='booked')
+    metrics.POOL_SIZE.set(5)
+    Exporter(directory).maybe_flush(force=True)
+
+
+def test_workers_are_aggregated(tmp_path):
+    directory = str(tmp_path)
+    ctx = multiprocessing.get_context('fork')
+    for bookings in (3, 4):
+        worker = ctx.Process(target=_worker, args=(directory, bookings))
+        worker.start()
+        worker.join()
+        assert worker.exitcode == 0
+
+    exporter = Exporter(directory)
+    before = _sample(exporter.render(), 'fitclub_bookings_total{result="booked"}')
+    local = _sample(Exporter().render(), 'fitclub_bookings_total{result="booked"}')
+    # Counters of exited workers still count; their gauges do not
+    assert before == local + 7
+    assert _sample(exporter.render(), 'fitclub_db_pool_size') == _sample(Exporter().render(), 'fitclub_db_pool_size')
@@ -0,0 +1,119 @@
+"""
+Class occurrences are materialized ahead and back capacity, calendars and roll calls
+"""
+import time
+from datetime import date, timedelta
+
+from models import db, Booking, ClassOccurrence, ClassSchedule
+from occurrences import Materializer, materialize
+
+
+def _occurrences(app, schedule_id):
+    with app.app_context():
+        return {o.occurrence_date: (o.capacity, o.booked_count)
+                for o in ClassOccurrence.query.filter_by(class_schedule_id=schedule_id)}
+
+
+def test_materialize_covers_the_horizon_on_the_schedule_weekday(app, make_user, make_schedule):
+    start = date.today() + timedelta(days=400)
+    schedule_id = make_schedule(make_user('trainer'), max_capacity=5, day_of_week=start.weekday())
+    with app.app_context():
+        db.session.add(Booking(user_id=make_user('member'), class_schedule_id=schedule_id,
+                               booking_date=start + timedelta(weeks=1)))
+        db.session.commit()
+        materialize(start, 20)
+        db.session.commit()
+        # A second pass finds nothing to add
+        assert materialize(start, 20) == (0, 0)
+        db.session.commit()
+
+    assert _occurrences(app, schedule_id) == {
+        start: (5, 0), start + timedelta(weeks=1): (5, 1), start + timedelta(weeks=2): (5, 0)}
+
+
+def test_inactive_schedules_lose_unbooked_occurrences(app, make_user, make_schedule):
+    start = date.today() + timedelta(days=500)
+    schedule_id = make_schedule(make_user('trainer'), day_of_week=start.weekday())
+    with app.app_context():
+        db.session.add(Booking(user_id=make_user('member'), class_schedule_id=schedule_id, booking_date=start))
+        materialize(start, 14)
+        db.session.get(ClassSchedule, schedule_id).is_active = False
+        db.session.commit()
+        assert materialize(start, 14) == (0, 2)
+        db.session.commit()
+
+    # The booked session stays until it is dealt with
+    assert list(_occurrences(app, schedule_id)) == [start]
+
+
+def test_bookings_only_on_days_the_class_runs(app, client, make_user, make_schedule, login_as):
+    day = date.today() + timedelta(weeks=2)
+    schedule_id = make_schedule(make_user('trainer'), day_of_week=day.weekday())
+    login_as(make_user('member'))
+
+    resp = client.post('/api/book-class', json={'class_schedule_id': schedule_id,
+                                                'booking_date': (day + timedelta(days=1)).isoformat()})
+    assert resp.status_code == 400 and resp.get_json()['message'] == 'The class does not run on this day'
+    # Beyond the materialized horizon the occurrence is created on demand
+    resp = client.post('/api/book-class', json={'class_schedule_id': schedule_id, 'booking_date': day.isoformat()})
+    assert resp.get_json()['success']
+    assert _occurrences(app, schedule_id) == {day: (10, 1)}
+
+
+def test_capacity_change_reaches_upcoming_occurrences(app, make_user, make_schedule):
+    schedule_id = make_schedule(make_user('trainer'), max_capacity=4)
+    with app.app_context():
+        materialize(date.today() - timedelta(days=7), 14)
+        db.session.get(ClassSchedule, schedule_id).class_.max_capacity = 6
+        db.session.commit()
+
+    capacities = _occurrences(app, schedule_id)
+    assert capacities[date.today() - timedelta(days=7)] == (4, 0)
+    assert capacities[date.today()] == capacities[date.today() + timedelta(days=7)] == (6, 0)
+
+
+def test_trainer_sees_todays_occurrences(app, client, make_user, make_schedule, login_as):
+    trainer_id = make_user('trainer')
+    schedule_id = make_schedule(trainer_id, max_capacity=8)
+    with app.app_context():
+        db.session.add(Booking(user_id=make_user('member'), class_schedule_id=schedule_id, booking_date=date.today()))
+        materialize(date.today(), 0)
+        db.session.commit()
+    login_as(trainer_id)
+
+    assert b'1 / 8' in client.get('/trainer').data
+    assert b'1 / 8' in client.get('/trainer/attendance').data
+
+
+def test_trainer_day_views_create_missing_occurrences(app, client, make_user, make_schedule, login_as):
+    trainer_id = make_user('trainer')
+    schedule_id = make_schedule(trainer_id, max_capacity=8)
+    login_as(trainer_id)
+
+    # Nothing materialized yet, e.g. with the background thread turned off
+    assert _occurrences(app, schedule_id) == {}
+    assert b'0 / 8' in client.get('/trainer').data
+    assert _occurrences(app, schedule_id) == {date.today(): (8, 0)}
+    assert b'0 / 8' in client.get('/trainer/attendance').data
+
+
+def test_roll_call_only_on_days_the_class_runs(client, make_user, make_schedule, login_as):
+    trainer_id = make_user('trainer')
+    schedule_id = make_schedule(trainer_id, day_of_week=(date.today().weekday() + 1) % 7)
+    login_as(trainer_id)
+    resp = client.post('/api/mark-attendance/bulk', json={'class_schedule_id': schedule_id,
+                                                          'records': [{'user_id': trainer_id}]})
+    assert resp.status_code == 400
+
+
+def test_background_materializer(app, make_user, make_schedule):
+    schedule_id = make_schedule(make_user('trainer'))
+    materializer = Materializer(app, interval=60)
+    materializer.start()
+    try:
+        deadline = time.monotonic() + 5
+        while date.today() not in _occurrences(app, schedule_id) and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        materializer._stop.set()
+    assert date.today() in _occurrences(app, schedule_id)
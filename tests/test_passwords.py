@@ -0,0 +1,102 @@
+"""
+Password hashing: configured cost, rehash on login and the bounded hashing pool
+"""
+import threading
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from models import db, User
+from passwords import HashingBusy, PasswordHasher
+
+
+@pytest.fixture()
+def hasher(app):
+    """Install a fresh hasher with cheap test parameters, restoring the app's afterwards"""
+    previous = app.extensions.pop('password_hasher', None)
+    installed = []
+
+    def _install(method='pbkdf2:sha256:2000', **kwargs):
+        installed.append(PasswordHasher(method, **kwargs))
+        app.extensions['password_hasher'] = installed[-1]
+        return installed[-1]
+    yield _install
+    app.extensions.pop('password_hasher', None)
+    if previous is not None:
+        app.extensions['password_hasher'] = previous
+
+
+def _member_with_password(app, make_user, pwhash):
+    user_id = make_user('member')
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        user.password_hash = pwhash
+        db.session.commit()
+        return user_id, user.username
+
+
+def _stored_hash(app, user_id):
+    with app.app_context():
+        return db.session.get(User, user_id).password_hash
+
+
+def test_needs_rehash_compares_parameters():
+    hasher = PasswordHasher('pbkdf2:sha256:2000')
+    assert not hasher.needs_rehash(generate_password_hash('pw', 'pbkdf2:sha256:2000'))
+    assert hasher.needs_rehash(generate_password_hash('pw', 'pbkdf2:sha256:1000'))
+    assert hasher.needs_rehash('not-a-werkzeug-hash')
+
+
+def test_login_rehashes_with_new_parameters(app, client, make_user, hasher):
+    hasher('pbkdf2:sha256:2000')
+    user_id, username = _member_with_password(app, make_user, generate_password_hash('s3cret', 'pbkdf2:sha256:1000'))
+
+    resp = client.post('/login', data={'username': username, 'password': 's3cret'})
+
+    assert resp.status_code == 302
+    assert _stored_hash(app, user_id).startswith('pbkdf2:sha256:2000$')
+
+
+def test_failed_login_keeps_the_old_hash(app, client, make_user, hasher):
+    hasher('pbkdf2:sha256:2000')
+    old = generate_password_hash('s3cret', 'pbkdf2:sha256:1000')
+    user_id, username = _member_with_password(app, make_user, old)
+
+    resp = client.post('/login', data={'username': username, 'password': 'wrong'})
+
+    assert resp.status_code == 200
+    assert _stored_hash(app, user_id) == old
+
+
+def test_login_fails_fast_when_the_pool_is_saturated(app, client, make_user, hasher):
+    pool = hasher(workers=1, queue=0)
+    _, username = _member_with_password(app, make_user, generate_password_hash('s3cret', 'pbkdf2:sha256:2000'))
+    _, slots = pool._pool()
+    slots.acquire()  # the only slot is taken by another login
+    try:
+        with pytest.raises(HashingBusy):
+            pool.verify('x', 'y')
+        resp = client.post('/login', data={'username': username, 'password': 's3cret'})
+        assert resp.status_code == 503
+        assert resp.headers['Retry-After'] == '2'
+    finally:
+        slots.release()
+
+    resp = client.post('/login', data={'username': username, 'password': 's3cret'})
+    assert resp.status_code == 302
+
+
+def test_timed_out_hash_gives_back_its_slot_if_it_never_started(hasher):
+    pool = hasher(workers=1, queue=1, timeout=0.05)
+    executor, slots = pool._pool()
+    gate = threading.Event()
+    executor.submit(gate.wait, 5)  # the only hashing thread is busy
+    try:
+        with pytest.raises(HashingBusy):
+            pool.verify(generate_password_hash('s3cret', 'pbkdf2:sha256:2000'), 's3cret')
+        # The queued hash was cancelled, so both slots are free again
+        assert slots.acquire(blocking=False) and slots.acquire(blocking=False)
+        slots.release()
+        slots.release()
+    finally:
+        gate.set()
@@ -0,0 +1,118 @@
+"""
+Hot booking, attendance, payment and progress queries must be served by an index
+"""
+import re
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, event, inspect
+
+from models import db, Booking
+
+
+pytestmark = pytest.mark.sqlite_only
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+@pytest.fixture()
+def capture_selects(app, setup_database):
+    """Context manager collecting ``(statement, parameters)`` of every SELECT"""
+    @contextmanager
+    def _capture():
+        selects = []
+
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT'):
+                selects.append((statement, parameters))
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', _record)
+        try:
+            yield selects
+        finally:
+            event.remove(engine, 'before_cursor_execute', _record)
+    return _capture
+
+
+def _full_scans(app, selects):
+    scans = []
+    with app.app_context():
+        with db.engine.connect() as conn:
+            for statement, parameters in selects:
+                plan = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+                for row in plan:
+                    match = FULL_SCAN.match(row[-1])
+                    if match:
+                        scans.append((match.group(1), statement))
+    return scans
+
+
+@pytest.fixture()
+def trainer_member_schedule(app, make_user, make_schedule):
+    trainer_id = make_user('trainer')
+    member_id = make_user('member')
+    return trainer_id, member_id, make_schedule(trainer_id)
+
+
+def test_booking_path_uses_indexes(app, client, login_as, capture_selects, trainer_member_schedule):
+    _, member_id, schedule_id = trainer_member_schedule
+    login_as(member_id)
+    with capture_selects() as selects:
+        resp = client.post('/api/book-class', json={'class_schedule_id': schedule_id,
+                                                     'booking_date': date.today().isoformat()})
+        assert resp.get_json()['success']
+    assert _full_scans(app, selects) == []
+
+
+def test_attendance_path_uses_indexes(app, client, login_as, capture_selects, trainer_member_schedule):
+    trainer_id, member_id, schedule_id = trainer_member_schedule
+    with app.app_context():
+        db.session.add(Booking(user_id=member_id, class_schedule_id=schedule_id, booking_date=date.today()))
+        db.session.commit()
+    login_as(trainer_id)
+    with capture_selects() as selects:
+        assert client.post('/api/mark-attendance', json={'user_id': member_id,
+                                                         'class_schedule_id': schedule_id}).get_json()['success']
+        assert client.get(f'/api/schedule-bookings/{schedule_id}').get_json()['success']
+    assert _full_scans(app, selects) == []
+
+
+@pytest.mark.parametrize('path', ['/member', '/member/bookings', '/member/payments', '/member/progress'])
+def test_member_history_uses_indexes(app, client, make_user, login_as, capture_selects, path):
+    login_as(make_user('member'))
+    with capture_selects() as selects:
+        assert client.get(path).status_code == 200
+    assert _full_scans(app, selects) == []
+
+
+def test_upgrade_adds_indexes_to_existing_tables(app, tmp_path):
+    from migrations import missing_indexes
+
+    engine = create_engine(f'sqlite:///{tmp_path / "legacy.db"}')
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE bookings (id INTEGER PRIMARY KEY, user_id INTEGER, '
+                             'class_schedule_id INTEGER, booking_date DATE, status VARCHAR(20), '
+                             'payment_status VARCHAR(20), created_at DATETIME)')
+    assert 'uq_bookings_user_schedule_date' in {ix.name for ix in missing_indexes(engine)}
+
+    for index in missing_indexes(engine):
+        index.create(bind=engine)
+    assert missing_indexes(engine) == []
+    assert 'ix_bookings_schedule_date_status' in {ix['name'] for ix in inspect(engine).get_indexes('bookings')}
+
+
+@pytest.mark.parametrize('path', ['/trainer', '/trainer/attendance'])
+def test_trainer_day_views_use_indexes(app, client, login_as, capture_selects, trainer_member_schedule, path):
+    from occurrences import materialize
+
+    trainer_id, _, _ = trainer_member_schedule
+    with app.app_context():
+        materialize(date.today(), 7)
+        db.session.commit()
+    login_as(trainer_id)
+    with capture_selects() as selects:
+        assert client.get(path).status_code == 200
+    assert _full_scans(app, selects) == []
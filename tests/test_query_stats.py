@@ -0,0 +1,67 @@
+"""
+Per-request query statistics, slow-query logging and query budgets for dashboards
+"""
+import json
+import logging
+from datetime import date, timedelta
+
+import pytest
+
+from models import db, Booking
+
+
+@pytest.fixture()
+def booked_member(app, make_user, make_schedule):
+    """A member booked today and upcoming into several trainers' classes"""
+    member_id = make_user('member')
+    trainer_ids = [make_user('trainer') for _ in range(3)]
+    with app.app_context():
+        for trainer_id in trainer_ids:
+            schedule_id = make_schedule(trainer_id)
+            for offset in (0, 7):
+                db.session.add(Booking(user_id=member_id, class_schedule_id=schedule_id,
+                                       booking_date=date.today() + timedelta(days=offset)))
+        db.session.commit()
+    return member_id, trainer_ids
+
+
+@pytest.mark.parametrize('path, budget', [
+    ('/member', 3),
+    ('/member/bookings', 2),
+])
+def test_member_pages_stay_within_budget(client, login_as, query_budget, booked_member, path, budget):
+    login_as(booked_member[0])
+    client.get(path)
+    with query_budget(budget):
+        assert client.get(path).status_code == 200
+
+
+def test_trainer_dashboard_stays_within_budget(client, login_as, query_budget, booked_member):
+    login_as(booked_member[1][0])
+    client.get('/trainer')
+    # Trainer profile, classes, today's sessions
+    with query_budget(3):
+        assert client.get('/trainer').status_code == 200
+
+
+def test_debug_headers_report_query_stats(app, client, make_user, login_as):
+    login_as(make_user('member'))
+    app.debug = True
+    try:
+        resp = client.get('/member/bookings')
+    finally:
+        app.debug = False
+    assert int(resp.headers['X-DB-Query-Count']) >= 1
+    assert float(resp.headers['X-DB-Time-ms']) >= 0
+    assert 'X-DB-Query-Count' not in client.get('/member/bookings').headers
+
+
+def test_slow_queries_are_logged_as_json(app, client, caplog):
+    app.config['SLOW_QUERY_MS'] = 0
+    try:
+        with caplog.at_level(logging.WARNING, logger='fitclub.slow_query'):
+            client.get('/api/class-catalog')
+    finally:
+        app.config['SLOW_QUERY_MS'] = 200
+    entries = [json.loads(r.getMessage()) for r in caplog.records if r.name == 'fitclub.slow_query']
+    assert any(e['endpoint'] == 'api.get_class_catalog' and e['statement'].startswith('SELECT') for e in entries)
@@ -0,0 +1,80 @@
+"""
+Login throttling with token buckets, in-process and shared through SQLite
+"""
+import pytest
+from werkzeug.security import generate_password_hash
+
+from models import db, User
+from rate_limit import LocalBuckets, LoginLimiter, SQLiteBuckets
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_a_burst_then_refills():
+    clock = FakeClock()
+    buckets = LocalBuckets(clock=clock)
+    assert [buckets.take('k', 3, 30) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.take('k', 3, 30) == pytest.approx(10.0)
+    clock.now += 10
+    assert buckets.take('k', 3, 30) == 0.0
+    assert buckets.take('other', 3, 30) == 0.0
+
+
+def test_sqlite_buckets_are_shared_between_instances(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / 'limits.db')
+    first, second = SQLiteBuckets(path, clock=clock), SQLiteBuckets(path, clock=clock)
+    assert first.take('k', 2, 60) == 0.0
+    assert second.take('k', 2, 60) == 0.0
+    assert first.take('k', 2, 60) == pytest.approx(30.0)
+    second.reset('k')
+    assert first.take('k', 2, 60) == 0.0
+
+
+def test_unusable_shared_store_falls_back_to_local_buckets(tmp_path):
+    limiter = LoginLimiter((1, 60), (5, 60), shared=SQLiteBuckets(str(tmp_path)))  # a directory
+    assert limiter.check('10.0.0.1', 'alice') == 0.0
+    assert limiter.check('10.0.0.1', 'alice') > 0
+
+
+def test_username_limit_applies_across_ips_and_resets_on_success():
+    limiter = LoginLimiter((100, 60), (2, 60))
+    assert limiter.check('10.0.0.1', 'Alice') == 0.0
+    assert limiter.check('10.0.0.2', 'alice') == 0.0
+    assert limiter.check('10.0.0.3', 'ALICE') > 0
+    limiter.succeeded('alice')
+    assert limiter.check('10.0.0.4', 'alice') == 0.0
+
+
+@pytest.fixture()
+def limited_app(app):
+    app.config.update(LOGIN_RATE_LIMIT_ENABLED=True, LOGIN_IP_LIMIT=(100, 60), LOGIN_USERNAME_LIMIT=(2, 600))
+    app.extensions.pop('login_limiter', None)
+    yield app
+    app.config['LOGIN_RATE_LIMIT_ENABLED'] = False
+    app.extensions.pop('login_limiter', None)
+
+
+def test_throttled_login_is_rejected_before_hashing(limited_app, client, make_user, monkeypatch):
+    user_id = make_user('member')
+    with limited_app.app_context():
+        user = db.session.get(User, user_id)
+        user.password_hash = generate_password_hash('s3cret', 'pbkdf2:sha256:1000')
+        username = user.username
+        db.session.commit()
+
+    for _ in range(2):
+        assert client.post('/login', data={'username': username, 'password': 'wrong'}).status_code == 200
+
+    def _no_hashing(self, password):
+        raise AssertionError('password checked while throttled')
+    monkeypatch.setattr(User, 'check_password', _no_hashing)
+    resp = client.post('/login', data={'username': username, 'password': 's3cret'})
+    assert resp.status_code == 429
+    assert int(resp.headers['Retry-After']) > 0
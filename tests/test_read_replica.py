@@ -0,0 +1,77 @@
+"""
+Read-only views and API GETs read from the replica; writes and the writer's follow-up reads use the primary
+"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from database import configure_engine
+from models import db, ClassSchedule
+
+pytestmark = pytest.mark.sqlite_only
+
+
+@pytest.fixture()
+def replica(app, setup_database, tmp_path):
+    """A second SQLite file holding a snapshot of the primary, installed as the replica"""
+    engine = create_engine(f'sqlite:///{tmp_path / "replica.db"}')
+    configure_engine(engine)
+
+    def snapshot():
+        with app.app_context():
+            source = db.engine.raw_connection()
+        target = engine.raw_connection()
+        try:
+            source.driver_connection.backup(target.driver_connection)
+        finally:
+            source.close()
+            target.close()
+
+    snapshot()
+    app.extensions['db_replica'] = engine
+    yield engine, snapshot
+    app.extensions.pop('db_replica', None)
+    engine.dispose()
+
+
+def _next_weekday(day_of_week):
+    today = date.today()
+    return today + timedelta(days=(day_of_week - today.weekday()) % 7 or 7)
+
+
+def test_admin_listing_reads_from_the_replica(client, make_user, login_as, replica):
+    engine, snapshot = replica
+    admin_id = make_user('admin')
+    snapshot()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO members (user_id, membership_number, membership_type, join_date, "
+                          "expiry_date, is_active, created_at) VALUES (:id, 'REPL0001', 'ReplicaOnly', :today, :today, "
+                          "1, CURRENT_TIMESTAMP)"), {'id': admin_id, 'today': date.today()})
+    login_as(admin_id)
+
+    assert b'ReplicaOnly' in client.get('/admin/members').data
+
+
+def test_writer_reads_its_own_booking_from_the_primary(app, client, make_user, make_schedule, login_as, replica):
+    engine, snapshot = replica
+    member_id = make_user('member')
+    schedule_id = make_schedule(make_user('trainer'))
+    snapshot()
+    login_as(member_id)
+    with app.app_context():
+        day = _next_weekday(db.session.get(ClassSchedule, schedule_id).day_of_week)
+
+    resp = client.post('/api/book-class', json={'class_schedule_id': schedule_id,
+                                                'booking_date': day.strftime('%Y-%m-%d')})
+    assert resp.get_json()['success'] is True
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT COUNT(*) FROM bookings WHERE user_id = :id'), {'id': member_id}).scalar() == 0
+
+    # Within REPLICA_MAX_LAG the member's reads go to the primary and see the booking
+    assert day.strftime('%Y-%m-%d').encode() in client.get('/member/bookings').data
+
+    # Once the pin expires the lagging replica is used again
+    with client.session_transaction() as sess:
+        sess['_db_primary_until'] = 0
+    assert day.strftime('%Y-%m-%d').encode() not in client.get('/member/bookings').data
@@ -0,0 +1,112 @@
+"""
+Recurring bookings check and claim every date with a fixed number of statements
+"""
+from datetime import date, timedelta
+
+from models import db, Booking, ClassOccurrence, ClassSchedule, WaitlistEntry
+from recurring import weekly_dates
+
+
+def _book_weekly(client, login_as, user_id, schedule_id, weeks, start=None):
+    login_as(user_id)
+    return client.post('/api/book-class/recurring', json={
+        'class_schedule_id': schedule_id, 'start_date': (start or date.today()).isoformat(), 'weeks': weeks})
+
+
+def _book_once(client, login_as, user_id, schedule_id, day):
+    login_as(user_id)
+    return client.post('/api/book-class', json={'class_schedule_id': schedule_id, 'booking_date': day.isoformat()})
+
+
+def _confirmed_dates(app, user_id, schedule_id):
+    with app.app_context():
+        return sorted(b.booking_date for b in Booking.query.filter_by(
+            user_id=user_id, class_schedule_id=schedule_id, status='confirmed'))
+
+
+def test_weekly_dates_fall_on_the_schedule_weekday(app, make_user, make_schedule):
+    schedule_id = make_schedule(make_user('trainer'), day_of_week=1)
+    with app.app_context():
+        schedule = db.session.get(ClassSchedule, schedule_id)
+        dates = weekly_dates(schedule, date(2026, 10, 17), 3)
+    assert dates == [date(2026, 10, 20), date(2026, 10, 27), date(2026, 11, 3)]
+
+
+def test_twelve_weeks_in_a_fixed_number_of_statements(app, client, make_user, make_schedule, login_as,
+                                                      count_queries):
+    schedule_id = make_schedule(make_user('trainer'))
+    member_id = make_user('member')
+    login_as(member_id)
+
+    with count_queries() as statements:
+        resp = _book_weekly(client, login_as, member_id, schedule_id, 12)
+    body = resp.get_json()
+    assert body['success'] and len(body['booked']) == 12 and body['failed'] == []
+    writes = [s for s in statements if s.lstrip().upper().startswith(('INSERT', 'UPDATE'))]
+    # Occupancy upsert, seat claim, booking insert and ending any waits, whatever the number of weeks
+    assert len(writes) == 4
+    assert len(_confirmed_dates(app, member_id, schedule_id)) == 12
+    with app.app_context():
+        assert {row.booked_count for row in ClassOccurrence.query.filter_by(class_schedule_id=schedule_id)} == {1}
+
+
+def test_failed_dates_are_reported_and_the_rest_booked(app, client, make_user, make_schedule, login_as):
+    schedule_id = make_schedule(make_user('trainer'), max_capacity=1)
+    member_id, other = make_user('member'), make_user('member')
+    dates = [date.today() + timedelta(weeks=n) for n in range(4)]
+    assert _book_once(client, login_as, other, schedule_id, dates[1]).get_json()['success']
+    assert _book_once(client, login_as, member_id, schedule_id, dates[2]).get_json()['success']
+
+    resp = _book_weekly(client, login_as, member_id, schedule_id, 4)
+    body = resp.get_json()
+    assert body['booked'] == [dates[0].isoformat(), dates[3].isoformat()]
+    assert body['failed'] == [
+        {'date': dates[1].isoformat(), 'message': 'Class is full for the selected time'},
+        {'date': dates[2].isoformat(), 'message': 'Already booked for this class'},
+    ]
+    assert _confirmed_dates(app, member_id, schedule_id) == [dates[0], dates[2], dates[3]]
+    with app.app_context():
+        counts = {row.occurrence_date: row.booked_count
+                  for row in ClassOccurrence.query.filter_by(class_schedule_id=schedule_id)}
+    assert counts == {day: 1 for day in dates}
+
+
+def test_bulk_dates_reject_wrong_weekday_and_past(app, client, make_user, make_schedule, login_as):
+    schedule_id = make_schedule(make_user('trainer'))
+    member_id = make_user('member')
+    next_week = date.today() + timedelta(weeks=1)
+    login_as(member_id)
+    resp = client.post('/api/book-class/recurring', json={'class_schedule_id': schedule_id, 'dates': [
+        next_week.isoformat(), (next_week + timedelta(days=1)).isoformat(),
+        (date.today() - timedelta(weeks=1)).isoformat()]})
+    body = resp.get_json()
+    assert body['booked'] == [next_week.isoformat()]
+    assert [f['message'] for f in body['failed']] == [
+        'This class has already taken place', 'The class does not run on this day']
+
+
+def test_cancelled_dates_are_reactivated_and_waits_end(app, client, make_user, make_schedule, login_as):
+    schedule_id = make_schedule(make_user('trainer'))
+    member_id = make_user('member')
+    day = date.today() + timedelta(weeks=1)
+    assert _book_once(client, login_as, member_id, schedule_id, day).get_json()['success']
+    with app.app_context():
+        booking_id = Booking.query.filter_by(user_id=member_id, class_schedule_id=schedule_id).one().id
+        db.session.add(WaitlistEntry(user_id=member_id, class_schedule_id=schedule_id,
+                                     waitlist_date=day + timedelta(weeks=1)))
+        db.session.commit()
+    client.post(f'/member/bookings/{booking_id}/cancel')
+
+    assert _book_weekly(client, login_as, member_id, schedule_id, 2, start=day).get_json()['success']
+    with app.app_context():
+        assert Booking.query.filter_by(user_id=member_id, class_schedule_id=schedule_id).count() == 2
+        assert WaitlistEntry.query.filter_by(user_id=member_id).one().status == 'booked'
+
+
+def test_recurring_request_limits(app, client, make_user, make_schedule, login_as):
+    schedule_id = make_schedule(make_user('trainer'))
+    member_id = make_user('member')
+    assert _book_weekly(client, login_as, member_id, schedule_id, 1000).status_code == 400
+    assert _book_weekly(client, login_as, member_id, schedule_id, 0).status_code == 400
+    login_as(make_user('trainer'))
+    assert client.post('/api/book-class/recurring', json={'class_schedule_id': schedule_id}).status_code == 403
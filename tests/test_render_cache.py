@@ -0,0 +1,45 @@
+"""
+Anonymous pages and the class card fragment are served from the render cache
+"""
+from models import db, Class
+from render_cache import get_render_cache
+
+
+def _stats(app, name):
+    return get_render_cache(app).stats().get(name, {'hits': 0, 'misses': 0})
+
+
+def test_anonymous_page_served_from_cache(app, client, count_queries):
+    client.get('/services')
+    before = _stats(app, 'public.services')
+
+    with count_queries() as statements:
+        resp = client.get('/services')
+    assert resp.status_code == 200
+    assert b'classesGrid' in resp.data
+    assert statements == []
+    assert _stats(app, 'public.services')['hits'] == before['hits'] + 1
+
+
+def test_class_write_invalidates_page(app, client, make_user, make_schedule):
+    client.get('/services')
+    schedule_id = make_schedule(make_user('trainer'))
+    with app.app_context():
+        Class.query.filter(Class.schedules.any(id=schedule_id)).one().name = 'Sunrise Spin'
+        db.session.commit()
+    assert b'Sunrise Spin' in client.get('/services').data
+
+
+def test_card_fragment_is_cached_per_audience(app, client, make_user, make_schedule, login_as):
+    make_schedule(make_user('trainer'))
+    assert b'Login to Book' in client.get('/services').data
+
+    login_as(make_user('member'))
+    client.get('/services')
+    before = _stats(app, 'service_cards')
+    resp = client.get('/services')
+    assert b'Book Class' in resp.data and b'Login to Book' not in resp.data
+    assert _stats(app, 'service_cards')['hits'] == before['hits'] + 1
+
+    login_as(make_user('trainer'))
+    assert b'Only members can book classes' in client.get('/services').data
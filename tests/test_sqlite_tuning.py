@@ -0,0 +1,76 @@
+"""
+SQLite connection pragmas and concurrent writers from several processes
+"""
+import multiprocessing
+
+import pytest
+
+from sqlalchemy import create_engine, text
+
+from database import configure_engine, sqlite_pragmas
+from models import db
+
+WRITERS = 4
+COMMITS = 150
+
+
+def _engine(path):
+    engine = create_engine(f'sqlite:///{path}')
+    configure_engine(engine)
+    return engine
+
+
+def _writer(path, worker):
+    # Read, then write in the same transaction, like book_class does
+    engine = _engine(path)
+    try:
+        for i in range(COMMITS):
+            with engine.begin() as conn:
+                conn.execute(text('SELECT value FROM counters WHERE name = :name'), {'name': 'seats'}).scalar()
+                conn.execute(text('UPDATE counters SET value = value + 1 WHERE name = :name'), {'name': 'seats'})
+                conn.execute(text('INSERT INTO writes (worker, n) VALUES (:worker, :n)'), {'worker': worker, 'n': i})
+    except Exception as exc:
+        print(f'writer {worker}: {exc}')
+        raise SystemExit(1)
+
+
+def test_every_connection_gets_the_pragmas(tmp_path):
+    engine = _engine(tmp_path / 'tuned.db')
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+        assert conn.exec_driver_sql('PRAGMA synchronous').scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql('PRAGMA busy_timeout').scalar() == 5000
+        assert conn.exec_driver_sql('PRAGMA foreign_keys').scalar() == 1
+
+
+def test_overrides_replace_or_drop_pragmas():
+    pragmas = sqlite_pragmas({'busy_timeout': 100, 'mmap_size': None})
+    assert pragmas['busy_timeout'] == 100
+    assert 'mmap_size' not in pragmas
+    assert pragmas['journal_mode'] == 'WAL'
+
+
+@pytest.mark.sqlite_only
+def test_app_engine_is_tuned(app_context):
+    with db.engine.connect() as conn:
+        assert conn.exec_driver_sql('PRAGMA foreign_keys').scalar() == 1
+
+
+def test_writers_in_several_processes_do_not_fail(tmp_path):
+    path = tmp_path / 'shared.db'
+    with _engine(path).begin() as conn:
+        conn.execute(text('CREATE TABLE counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)'))
+        conn.execute(text('CREATE TABLE writes (id INTEGER PRIMARY KEY, worker INTEGER, n INTEGER)'))
+        conn.execute(text("INSERT INTO counters VALUES ('seats', 0)"))
+
+    ctx = multiprocessing.get_context('fork')
+    workers = [ctx.Process(target=_writer, args=(path, worker)) for worker in range(WRITERS)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+    assert [worker.exitcode for worker in workers] == [0] * WRITERS
+
+    with _engine(path).connect() as conn:
+        assert conn.execute(text("SELECT value FROM counters WHERE name = 'seats'")).scalar() == WRITERS * COMMITS
+        assert conn.execute(text('SELECT COUNT(*) FROM writes')).scalar() == WRITERS * COMMITS
@@ -0,0 +1,92 @@
+"""
+The user loader is served from cache and invalidated on user, role and profile changes
+"""
+import json
+
+from cache import LocalCache, SQLiteCache, TieredCache
+from models import db, Role, User
+from user_cache import get_user_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_local_cache_evicts_least_recently_used_and_expires():
+    clock = FakeClock()
+    cache = LocalCache(maxsize=2, ttl=10, clock=clock)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+
+    clock.now = 11
+    assert cache.get('a') is None
+    assert len(cache) == 1
+
+
+def test_sqlite_cache_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    worker_a = TieredCache(LocalCache(ttl=0), SQLiteCache(path))
+    worker_b = TieredCache(LocalCache(ttl=0), SQLiteCache(path))
+
+    worker_a.set('user:1', json.dumps({'id': 1}).encode())
+    assert json.loads(worker_b.get('user:1')) == {'id': 1}
+
+    worker_b.delete('user:1')
+    assert worker_a.get('user:1') is None
+
+
+def test_cached_user_costs_no_user_queries(client, make_user, login_as, count_queries):
+    login_as(make_user('member'))
+    assert client.get('/member/profile').status_code == 200
+
+    with count_queries() as statements:
+        assert client.get('/member/profile').status_code == 200
+    # Only the member profile the page shows, by primary key
+    assert len(statements) == 1 and 'FROM members' in statements[0]
+
+
+def test_cache_entry_holds_no_password_hash(app, client, make_user, login_as):
+    user_id = make_user('member')
+    login_as(user_id)
+    client.get('/member/profile')
+
+    with app.app_context():
+        entry = json.loads(get_user_cache().get(f'principal:{user_id}'))
+        user = db.session.get(User, user_id)
+        assert entry['roles'] == ['member']
+        assert entry['member_id'] == user.member_profile.id and entry['trainer_id'] is None
+        assert 'password_hash' not in entry
+        assert user.password_hash not in json.dumps(entry)
+
+
+def test_role_change_invalidates_cached_user(app, client, make_user, login_as):
+    user_id = make_user('member')
+    login_as(user_id)
+    assert client.get('/dashboard').headers['Location'].endswith('/member')
+
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        user.roles.append(Role.query.filter_by(name='admin').first())
+        db.session.commit()
+
+    assert client.get('/dashboard').headers['Location'].endswith('/admin')
+
+
+def test_cache_can_be_disabled(app, client, make_user, login_as, count_queries):
+    login_as(make_user('member'))
+    app.config['USER_CACHE_ENABLED'] = False
+    try:
+        client.get('/member/profile')
+        with count_queries() as statements:
+            client.get('/member/profile')
+        assert any('FROM users' in s for s in statements)
+    finally:
+        app.config['USER_CACHE_ENABLED'] = True
@@ -0,0 +1,264 @@
+"""
+Waitlists for full classes and promotion when a seat is cancelled
+"""
+import os
+from datetime import date, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+
+import waitlist
+from models import db, Booking, ClassOccurrence, ClassSchedule, Member, Notification, WaitlistEntry
+from waitlist import cancel_and_promote
+
+
+def _book(client, login_as, user_id, schedule_id, day):
+    login_as(user_id)
+    return client.post('/api/book-class', json={'class_schedule_id': schedule_id,
+                                                'booking_date': day.isoformat()})
+
+
+def _join(client, login_as, user_id, schedule_id, day):
+    login_as(user_id)
+    return client.post('/api/waitlist', json={'class_schedule_id': schedule_id, 'date': day.isoformat()})
+
+
+def _full_class(app, client, login_as, make_user, make_schedule, seats=1):
+    schedule_id = make_schedule(make_user('trainer'), max_capacity=seats)
+    day = date.today() + timedelta(days=7)
+    holders = [make_user('member') for _ in range(seats)]
+    for holder in holders:
+        assert _book(client, login_as, holder, schedule_id, day).get_json()['success']
+    return schedule_id, day, holders
+
+
+def _booking_id(app, user_id, schedule_id):
+    with app.app_context():
+        return Booking.query.filter_by(user_id=user_id, class_schedule_id=schedule_id).one().id
+
+
+def _occupancy(app, schedule_id, day):
+    with app.app_context():
+        return ClassOccurrence.query.filter_by(class_schedule_id=schedule_id, occurrence_date=day).one().booked_count
+
+
+def test_full_class_offers_the_waitlist(app, client, make_user, make_schedule, login_as):
+    schedule_id, day, _ = _full_class(app, client, login_as, make_user, make_schedule)
+    member_id = make_user('member')
+
+    resp = _book(client, login_as, member_id, schedule_id, day)
+    assert resp.status_code == 400 and resp.get_json()['full']
+    resp = _join(client, login_as, member_id, schedule_id, day)
+    assert resp.get_json()['position'] == 1
+    # Joining twice keeps the place
+    assert _join(client, login_as, member_id, schedule_id, day).get_json()['position'] == 1
+
+
+def test_waitlist_only_for_full_classes(app, client, make_user, make_schedule, login_as):
+    schedule_id = make_schedule(make_user('trainer'), max_capacity=2)
+    day = date.today() + timedelta(days=7)
+    resp = _join(client, login_as, make_user('member'), schedule_id, day)
+    assert resp.status_code == 400 and not resp.get_json()['success']
+
+
+def test_higher_membership_tiers_are_served_first(app, client, make_user, make_schedule, login_as):
+    schedule_id, day, _ = _full_class(app, client, login_as, make_user, make_schedule)
+    basic, premium, vip, basic_later = (make_user('member') for _ in range(4))
+    with app.app_context():
+        Member.query.filter_by(user_id=premium).update({'membership_type': 'Premium'})
+        Member.query.filter_by(user_id=vip).update({'membership_type': 'VIP'})
+        db.session.commit()
+
+    for member_id in (basic, premium, vip, basic_later):
+        _join(client, login_as, member_id, schedule_id, day)
+    positions = {member_id: _join(client, login_as, member_id, schedule_id, day).get_json()['position']
+                 for member_id in (basic, premium, vip, basic_later)}
+    assert positions == {vip: 1, premium: 2, basic: 3, basic_later: 4}
+
+
+def test_cancellation_promotes_next_member(app, client, make_user, make_schedule, login_as):
+    schedule_id, day, (holder,) = _full_class(app, client, login_as, make_user, make_schedule)
+    first, second = make_user('member'), make_user('member')
+    _join(client, login_as, first, schedule_id, day)
+    _join(client, login_as, second, schedule_id, day)
+
+    login_as(holder)
+    client.post(f'/member/bookings/{_booking_id(app, holder, schedule_id)}/cancel')
+
+    # The seat changed hands without ever being free
+    assert _occupancy(app, schedule_id, day) == 1
+    with app.app_context():
+        booking = Booking.query.filter_by(user_id=first, class_schedule_id=schedule_id, booking_date=day).one()
+        assert booking.status == 'confirmed'
+        statuses = {e.user_id: e.status for e in WaitlistEntry.query.filter_by(class_schedule_id=schedule_id)}
+        assert statuses == {first: 'promoted', second: 'waiting'}
+        assert Notification.query.filter_by(user_id=first, title='You got a spot!').count() == 1
+
+    # The promoted member cancelling passes the seat on again; with nobody left it is freed
+    login_as(first)
+    client.post(f'/member/bookings/{_booking_id(app, first, schedule_id)}/cancel')
+    assert _booking_id(app, second, schedule_id)
+    login_as(second)
+    client.post(f'/member/bookings/{_booking_id(app, second, schedule_id)}/cancel')
+    assert _occupancy(app, schedule_id, day) == 0
+
+
+def test_promotion_skips_a_member_who_rebooked_meanwhile(app, client, make_user, make_schedule, login_as,
+                                                       monkeypatch):
+    schedule_id, day, (holder, rebooker) = _full_class(app, client, login_as, make_user, make_schedule, seats=2)
+    # The rebooker's cancelled booking is what promotion would reactivate
+    login_as(rebooker)
+    client.post(f'/member/bookings/{_booking_id(app, rebooker, schedule_id)}/cancel')
+    assert _book(client, login_as, make_user('member'), schedule_id, day).get_json()['success']
+    second = make_user('member')
+    _join(client, login_as, rebooker, schedule_id, day)
+    _join(client, login_as, second, schedule_id, day)
+
+    change_booking_status = waitlist.change_booking_status
+
+    def rebooked_first(booking_id, from_status, to_status):
+        if (from_status, to_status) == ('cancelled', 'confirmed'):
+            # Another request confirms the booking between the read and the reactivation
+            db.session.execute(update(Booking).where(Booking.id == booking_id).values(status='confirmed'))
+        return change_booking_status(booking_id, from_status, to_status)
+
+    monkeypatch.setattr(waitlist, 'change_booking_status', rebooked_first)
+    login_as(holder)
+    client.post(f'/member/bookings/{_booking_id(app, holder, schedule_id)}/cancel')
+
+    assert _occupancy(app, schedule_id, day) == 2
+    with app.app_context():
+        statuses = {e.user_id: e.status for e in WaitlistEntry.query.filter_by(class_schedule_id=schedule_id)}
+        assert statuses == {rebooker: 'waiting', second: 'promoted'}
+        assert Booking.query.filter_by(user_id=second, class_schedule_id=schedule_id).one().status == 'confirmed'
+        assert Notification.query.filter_by(user_id=rebooker, title='You got a spot!').count() == 0
+
+
+def test_leaving_and_booking_directly_end_the_wait(app, client, make_user, make_schedule, login_as):
+    schedule_id, day, _ = _full_class(app, client, login_as, make_user, make_schedule)
+    leaver, member_id = make_user('member'), make_user('member')
+    _join(client, login_as, leaver, schedule_id, day)
+    _join(client, login_as, member_id, schedule_id, day)
+
+    with app.app_context():
+        entry_id = WaitlistEntry.query.filter_by(user_id=leaver).one().id
+    login_as(leaver)
+    client.post(f'/member/waitlist/{entry_id}/leave')
+    assert _join(client, login_as, member_id, schedule_id, day).get_json()['position'] == 1
+
+    # A seat that freed up without reaching the member is booked directly, which takes them off the line
+    with app.app_context():
+        ClassOccurrence.query.filter_by(class_schedule_id=schedule_id, occurrence_date=day).update({'capacity': 2})
+        db.session.commit()
+    assert _book(client, login_as, member_id, schedule_id, day).get_json()['success']
+    with app.app_context():
+        assert WaitlistEntry.query.filter_by(user_id=member_id).one().status == 'booked'
+
+
+def test_raised_capacity_is_filled_from_the_waitlist(app, client, make_user, make_schedule, login_as):
+    schedule_id, day, _ = _full_class(app, client, login_as, make_user, make_schedule)
+    waiting = [make_user('member') for _ in range(3)]
+    for member_id in waiting:
+        _join(client, login_as, member_id, schedule_id, day)
+
+    with app.app_context():
+        db.session.get(ClassSchedule, schedule_id).class_.max_capacity = 3
+        db.session.commit()
+
+    assert _occupancy(app, schedule_id, day) == 3
+    with app.app_context():
+        statuses = {e.user_id: e.status for e in WaitlistEntry.query.filter_by(class_schedule_id=schedule_id)}
+    assert statuses == {waiting[0]: 'promoted', waiting[1]: 'promoted', waiting[2]: 'waiting'}
+    assert _booking_id(app, waiting[1], schedule_id)
+
+
+def test_bookings_page_lists_waitlist_positions(app, client, make_user, make_schedule, login_as):
+    schedule_id, day, _ = _full_class(app, client, login_as, make_user, make_schedule)
+    member_id = make_user('member')
+    _join(client, login_as, member_id, schedule_id, day)
+    page = client.get('/member/bookings').get_data(as_text=True)
+    assert 'Waitlist' in page and '#1' in page
+
+
+def test_concurrent_cancellations_promote_distinct_members(app, client, make_user, make_schedule, login_as):
+    schedule_id, day, holders = _full_class(app, client, login_as, make_user, make_schedule, seats=2)
+    waiting = [make_user('member') for _ in range(3)]
+    for member_id in waiting:
+        _join(client, login_as, member_id, schedule_id, day)
+    booking_ids = [_booking_id(app, holder, schedule_id) for holder in holders]
+
+    read_fd, write_fd = os.pipe()
+    children = []
+    for booking_id in booking_ids:
+        pid = os.fork()
+        if pid == 0:
+            os.close(write_fd)
+            os.read(read_fd, 1)  # start together
+            code = 1
+            for _ in range(20):
+                try:
+                    with app.app_context():
+                        cancel_and_promote(db.session.get(Booking, booking_id))
+                        db.session.commit()
+                    code = 0
+                    break
+                except OperationalError:
+                    # SQLite: a stale read snapshot cannot take the write lock; retry like a client would
+                    continue
+            os._exit(code)
+        children.append(pid)
+    os.close(read_fd)
+    os.write(write_fd, b'go')
+    os.close(write_fd)
+    for pid in children:
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+
+    with app.app_context():
+        statuses = {e.user_id: e.status for e in WaitlistEntry.query.filter_by(class_schedule_id=schedule_id)}
+        confirmed = {b.user_id for b in Booking.query.filter_by(class_schedule_id=schedule_id, status='confirmed')}
+    assert statuses == {waiting[0]: 'promoted', waiting[1]: 'promoted', waiting[2]: 'waiting'}
+    assert confirmed == set(waiting[:2])
+    assert _occupancy(app, schedule_id, day) == 2
+
+
+def test_concurrent_cancellations_of_one_booking_promote_once(app, client, make_user, make_schedule, login_as):
+    schedule_id, day, (holder,) = _full_class(app, client, login_as, make_user, make_schedule)
+    waiting = [make_user('member') for _ in range(2)]
+    for member_id in waiting:
+        _join(client, login_as, member_id, schedule_id, day)
+    booking_id = _booking_id(app, holder, schedule_id)
+
+    read_fd, write_fd = os.pipe()
+    children = []
+    for _ in range(2):
+        pid = os.fork()
+        if pid == 0:
+            os.close(write_fd)
+            os.read(read_fd, 1)  # start together
+            code = 1
+            for _ in range(20):
+                try:
+                    with app.app_context():
+                        booking = db.session.get(Booking, booking_id)
+                        cancel_and_promote(booking)
+                        db.session.commit()
+                    code = 0
+                    break
+                except OperationalError:
+                    continue
+            os._exit(code)
+        children.append(pid)
+    os.close(read_fd)
+    os.write(write_fd, b'go')
+    os.close(write_fd)
+    for pid in children:
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+
+    with app.app_context():
+        statuses = {e.user_id: e.status for e in WaitlistEntry.query.filter_by(class_schedule_id=schedule_id)}
+        confirmed = {b.user_id for b in Booking.query.filter_by(class_schedule_id=schedule_id, status='confirmed')}
+    assert statuses == {waiting[0]: 'promoted', waiting[1]: 'waiting'}
+    assert confirmed == {waiting[0]}
+    assert _occupancy(app, schedule_id, day) == 1
@@ -0,0 +1,160 @@
+"""
+Cache for the user loaded on every authenticated request.
+
+A cache entry is a JSON object with what role checks and page chrome read
+(id, names, email, active flag, role names, member/trainer profile ids and
+``updated_at``); password hashes and other columns stay out of it. A hit
+rebuilds a ``CachedUser`` from the entry without SQL, and the member and
+trainer profiles are fetched by primary key when a view first asks for them.
+Commits that touch a user, its role links or its profiles drop the cached
+entry.
+"""
+import json
+from datetime import datetime
+
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import event
+
+from cache import LocalCache, SQLiteCache, TieredCache
+from metrics import CACHE_REQUESTS
+from models import db, Member, Trainer, User, UserRole
+
+DEFAULTS = {
+    'USER_CACHE_ENABLED': True,
+    'USER_CACHE_SIZE': 4096,
+    # Bounds how long another worker may use an entry invalidated elsewhere
+    'USER_CACHE_LOCAL_TTL': 5,
+    'USER_CACHE_TTL': 300,
+    # SQLite file shared by the workers; unset keeps the cache in-process
+    'USER_CACHE_PATH': None,
+}
+
+
+def _setting(app, name):
+    return app.config.get(name, DEFAULTS[name])
+
+
+def get_user_cache(app=None):
+    """Return the app's user cache, building it from config on first use."""
+    app = app or current_app
+    cache = app.extensions.get('user_cache')
+    if cache is None:
+        shared = None
+        if _setting(app, 'USER_CACHE_PATH'):
+            shared = SQLiteCache(_setting(app, 'USER_CACHE_PATH'), ttl=_setting(app, 'USER_CACHE_TTL'))
+        cache = TieredCache(LocalCache(maxsize=_setting(app, 'USER_CACHE_SIZE'),
+                                       ttl=_setting(app, 'USER_CACHE_LOCAL_TTL')), shared)
+        app.extensions['user_cache'] = cache
+    return cache
+
+
+def _key(user_id):
+    return f'principal:{int(user_id)}'
+
+
+class CachedUser(UserMixin):
+    """The logged-in user as rebuilt from a cache entry."""
+
+    def __init__(self, entry, member_profile=None, trainer_profile=None):
+        self.id = entry['id']
+        self.username = entry['username']
+        self.email = entry['email']
+        self.first_name = entry['first_name']
+        self.last_name = entry['last_name']
+        self.active = entry['is_active']
+        self.role_names = frozenset(entry['roles'])
+        self.member_id = entry['member_id']
+        self.trainer_id = entry['trainer_id']
+        updated_at = entry['updated_at']
+        self.updated_at = datetime.fromisoformat(updated_at) if updated_at else None
+        # Profiles the loader already fetched, reused for the rest of the request
+        self._profiles = {Member: member_profile, Trainer: trainer_profile}
+
+    @classmethod
+    def from_user(cls, user):
+        """Return the cache entry for ``user`` and the principal built from it."""
+        entry = {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'is_active': bool(user.is_active),
+            'roles': sorted(user.role_names),
+            'member_id': user.member_profile.id if user.member_profile else None,
+            'trainer_id': user.trainer_profile.id if user.trainer_profile else None,
+            'updated_at': user.updated_at.isoformat() if user.updated_at else None,
+        }
+        return entry, cls(entry, user.member_profile, user.trainer_profile)
+
+    @property
+    def is_active(self):
+        return self.active
+
+    @property
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
+
+    def has_role(self, role_name):
+        return role_name in self.role_names
+
+    def _profile(self, model, profile_id):
+        profile = self._profiles[model]
+        if profile is None and profile_id is not None:
+            profile = self._profiles[model] = db.session.get(model, profile_id)
+        return profile
+
+    @property
+    def member_profile(self):
+        return self._profile(Member, self.member_id)
+
+    @property
+    def trainer_profile(self):
+        return self._profile(Trainer, self.trainer_id)
+
+
+def load_cached_user(user_id, loader):
+    """Return the user from the cache, or from ``loader`` and cache it."""
+    if not _setting(current_app, 'USER_CACHE_ENABLED'):
+        return loader(user_id)
+    cache = get_user_cache()
+    blob = cache.get(_key(user_id))
+    CACHE_REQUESTS.inc(cache='user', result='miss' if blob is None else 'hit')
+    if blob is not None:
+        return CachedUser(json.loads(blob))
+    user = loader(user_id)
+    if user is None:
+        return None
+    entry, principal = CachedUser.from_user(user)
+    cache.set(_key(user_id), json.dumps(entry).encode())
+    return principal
+
+
+def invalidate_user(user_id):
+    get_user_cache().delete(_key(user_id))
+
+
+def _collect_touched_users(session, flush_context):
+    ids = session.info.setdefault('touched_user_ids', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        # Appending to or removing from User.roles marks the user dirty
+        if isinstance(obj, User):
+            ids.add(obj.id)
+        elif isinstance(obj, (Member, Trainer, UserRole)):
+            ids.add(obj.user_id)
+
+
+def _invalidate_touched_users(session):
+    for user_id in session.info.pop('touched_user_ids', ()):
+        if user_id is not None:
+            invalidate_user(user_id)
+
+
+def _forget_touched_users(session, previous_transaction):
+    session.info.pop('touched_user_ids', None)
+
+
+event.listen(db.session, 'after_flush', _collect_touched_users)
+event.listen(db.session, 'after_commit', _invalidate_touched_users)
+event.listen(db.session, 'after_soft_rollback', _forget_touched_users)
@@ -0,0 +1,173 @@
+"""
+Per-table data versions for conditional GET responses.
+
+Every transaction that writes to a tracked table bumps that table's row in
+``data_versions`` inside the same transaction, so all workers agree on the
+current version. Views decorated with :func:`conditional` derive a strong
+ETag from the versions they depend on and answer ``304 Not Modified`` before
+running any query or rendering a template. Versions are read through a
+short-lived in-process cache, which bounds how long a worker may miss a bump
+made by another one.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event, insert, inspect, select, update
+
+from cache import LocalCache
+from models import db, DataVersion
+
+# Tables whose writes bump a version; a tuple limits it to changes of those columns
+TRACKED_TABLES = {
+    'announcements': None,
+    'classes': None,
+    'class_schedules': None,
+    'trainers': None,
+    # Trainer names appear on class cards; last_login changes on every login
+    'users': ('first_name', 'last_name'),
+}
+
+DEFAULT_TTL = 1
+_VERSIONS_KEY = 'versions'
+
+
+def _versions_cache(app=None):
+    app = app or current_app
+    cache = app.extensions.get('data_versions')
+    if cache is None:
+        cache = app.extensions['data_versions'] = LocalCache(maxsize=1, ttl=app.config.get('DATA_VERSION_TTL', DEFAULT_TTL))
+    return cache
+
+
+def all_versions():
+    """Return ``{table_name: (version, changed_at)}`` for every versioned table."""
+    cache = _versions_cache()
+    versions = cache.get(_VERSIONS_KEY)
+    if versions is None:
+        rows = db.session.execute(select(DataVersion.table_name, DataVersion.version, DataVersion.changed_at))
+        versions = {name: (version, changed_at) for name, version, changed_at in rows}
+        cache.set(_VERSIONS_KEY, versions)
+    return versions
+
+
+def _is_tracked_change(session, obj, columns):
+    if columns is None or obj in session.deleted:
+        return True
+    if obj in session.new:
+        # A new row matters only once a table that is fully tracked references it
+        return False
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in columns)
+
+
+def _bump(connection, table_name, now):
+    result = connection.execute(
+        update(DataVersion.__table__)
+        .where(DataVersion.table_name == table_name)
+        .values(version=DataVersion.version + 1, changed_at=now))
+    if result.rowcount == 0:
+        connection.execute(insert(DataVersion.__table__).values(table_name=table_name, version=1, changed_at=now))
+
+
+def _bump_changed_tables(session, flush_context):
+    bumped = session.info.setdefault('bumped_tables', set())
+    changed = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table_name = getattr(obj, '__tablename__', None)
+        if table_name not in TRACKED_TABLES or table_name in bumped or table_name in changed:
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if _is_tracked_change(session, obj, TRACKED_TABLES[table_name]):
+            changed.add(table_name)
+    if changed:
+        connection = session.connection()
+        now = datetime.utcnow()
+        for table_name in sorted(changed):
+            _bump(connection, table_name, now)
+        bumped.update(changed)
+
+
+_change_listeners = []
+
+
+def on_tables_changed(listener):
+    """Call ``listener(table_names)`` after a commit that bumped versions."""
+    _change_listeners.append(listener)
+    return listener
+
+
+def _publish_bumps(session):
+    bumped = session.info.pop('bumped_tables', None)
+    if bumped:
+        # This worker sees its own writes at once; others within the cache TTL
+        _versions_cache().delete(_VERSIONS_KEY)
+        for listener in _change_listeners:
+            listener(bumped)
+
+
+def _forget_bumps(session, previous_transaction=None):
+    session.info.pop('bumped_tables', None)
+
+
+event.listen(db.session, 'after_flush', _bump_changed_tables)
+event.listen(db.session, 'after_commit', _publish_bumps)
+event.listen(db.session, 'after_soft_rollback', _forget_bumps)
+
+
+def _viewer_key():
+    if not current_user.is_authenticated:
+        return 'anonymous', None
+    # Roles change which links and actions a page shows without touching updated_at
+    roles = ','.join(sorted(current_user.role_names))
+    updated_at = current_user.updated_at
+    return f'{current_user.id}:{roles}:{updated_at.isoformat() if updated_at else ""}', updated_at
+
+
+def conditional(*tables):
+    """Serve the view with an ETag and Last-Modified derived from ``tables``.
+
+    Matching ``If-None-Match`` (or, without it, ``If-Modified-Since``) requests
+    get a 304 without calling the view. Responses carrying flashed messages
+    and debug-mode requests are never made conditional.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or current_app.debug or session.get('_flashes'):
+                return f(*args, **kwargs)
+
+            versions = all_versions()
+            viewer, viewer_changed_at = _viewer_key()
+            parts = [request.full_path, viewer, current_app.config.get('RELEASE', '')]
+            parts.extend(f'{name}={versions.get(name, (0, None))[0]}' for name in tables)
+            etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+            stamps = [versions[name][1] for name in tables if name in versions]
+            if viewer_changed_at:
+                stamps.append(viewer_changed_at)
+            last_modified = max(stamps).replace(microsecond=0) if stamps else None
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = bool(last_modified and since and last_modified <= since.replace(tzinfo=None))
+
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            # Browsers may keep the page but must revalidate it on every use
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
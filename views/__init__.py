@@ -0,0 +1,16 @@
+"""
+Blueprints of the web application.
+
+The view modules are imported by :func:`register_blueprints` when an app is
+created, not when ``app`` is imported, so scripts that only need the models
+or the factory (migrations, the CLI, a preloading gunicorn master) do not pay
+for them.
+"""
+from importlib import import_module
+
+BLUEPRINTS = ('public', 'auth', 'admin', 'trainer', 'member', 'api')
+
+
+def register_blueprints(app, names=BLUEPRINTS):
+    for name in names:
+        app.register_blueprint(import_module(f'{__name__}.{name}').bp)
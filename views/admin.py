@@ -0,0 +1,113 @@
+"""
+Admin dashboard and paginated listings.
+"""
+from flask import Blueprint, render_template, request
+
+from models import User, Member, Trainer, Class, ClassSchedule, Booking, Payment, Announcement
+from pagination import SortKey, paginate
+from queries import with_profile
+from routing import read_only
+from views.auth import require_role
+
+bp = Blueprint('admin', __name__)
+
+@bp.route('/admin')
+@read_only
+@require_role('admin')
+def admin_dashboard():
+    total_members = Member.query.filter_by(is_active=True).count()
+    total_trainers = Trainer.query.filter_by(is_active=True).count()
+    total_classes = Class.query.filter_by(is_active=True).count()
+    total_bookings = Booking.query.filter_by(status='confirmed').count()
+    
+    recent_payments = with_profile(Payment.query, 'admin_recent_payments').order_by(Payment.created_at.desc()).limit(5).all()
+    recent_announcements = with_profile(Announcement.query, 'admin_recent_announcements').order_by(Announcement.created_at.desc()).limit(5).all()
+    
+    return render_template('admin/dashboard.html', 
+                         total_members=total_members,
+                         total_trainers=total_trainers,
+                         total_classes=total_classes,
+                         total_bookings=total_bookings,
+                         recent_payments=recent_payments,
+                         recent_announcements=recent_announcements)
+
+# Sortable columns of the admin listings, keyed by the ``sort`` query argument
+MEMBER_SORT_KEYS = {
+    'created_at': SortKey(Member.created_at, lambda m: m.created_at),
+    'name': SortKey(User.last_name, lambda m: m.user.last_name),
+    'email': SortKey(User.email, lambda m: m.user.email),
+    'expiry_date': SortKey(Member.expiry_date, lambda m: m.expiry_date),
+}
+TRAINER_SORT_KEYS = {
+    'created_at': SortKey(Trainer.created_at, lambda t: t.created_at),
+    'name': SortKey(User.last_name, lambda t: t.user.last_name),
+    'email': SortKey(User.email, lambda t: t.user.email),
+    'specialization': SortKey(Trainer.specialization, lambda t: t.specialization),
+}
+CLASS_SORT_KEYS = {
+    'created_at': SortKey(Class.created_at, lambda c: c.created_at),
+    'name': SortKey(Class.name, lambda c: c.name),
+    'category': SortKey(Class.category, lambda c: c.category),
+    'capacity': SortKey(Class.max_capacity, lambda c: c.max_capacity),
+}
+BOOKING_SORT_KEYS = {
+    'created_at': SortKey(Booking.created_at, lambda b: b.created_at),
+    'booking_date': SortKey(Booking.booking_date, lambda b: b.booking_date),
+    'member': SortKey(User.last_name, lambda b: b.user.last_name),
+    'class': SortKey(Class.name, lambda b: b.class_schedule.class_.name),
+}
+PAYMENT_SORT_KEYS = {
+    'created_at': SortKey(Payment.created_at, lambda p: p.created_at),
+    'amount': SortKey(Payment.amount, lambda p: p.amount),
+    'member': SortKey(User.last_name, lambda p: p.user.last_name),
+}
+
+def admin_page(query, sort_keys, id_column, default_sort='created_at', default_direction='desc'):
+    """Paginate an admin listing from the request's sort, direction, cursor and per_page arguments"""
+    return paginate(query, sort_keys, id_column,
+                    sort=request.args.get('sort'),
+                    direction=request.args.get('direction'),
+                    cursor=request.args.get('cursor'),
+                    per_page=request.args.get('per_page'),
+                    default_sort=default_sort,
+                    default_direction=default_direction)
+
+@bp.route('/admin/members')
+@read_only
+@require_role('admin')
+def admin_members():
+    members = admin_page(with_profile(Member.query.join(User), 'admin_members').filter(Member.is_active == True),
+                         MEMBER_SORT_KEYS, Member.id)
+    return render_template('admin/members.html', members=members)
+
+@bp.route('/admin/trainers')
+@read_only
+@require_role('admin')
+def admin_trainers():
+    trainers = admin_page(with_profile(Trainer.query.join(User), 'admin_trainers').filter(Trainer.is_active == True),
+                          TRAINER_SORT_KEYS, Trainer.id)
+    return render_template('admin/trainers.html', trainers=trainers)
+
+@bp.route('/admin/classes')
+@read_only
+@require_role('admin')
+def admin_classes():
+    classes = admin_page(with_profile(Class.query.join(Trainer).join(User), 'admin_classes').filter(Class.is_active == True),
+                         CLASS_SORT_KEYS, Class.id)
+    return render_template('admin/classes.html', classes=classes)
+
+@bp.route('/admin/bookings')
+@read_only
+@require_role('admin')
+def admin_bookings():
+    bookings = admin_page(with_profile(Booking.query.join(User).join(ClassSchedule).join(Class), 'admin_bookings'),
+                          BOOKING_SORT_KEYS, Booking.id)
+    return render_template('admin/bookings.html', bookings=bookings)
+
+@bp.route('/admin/payments')
+@read_only
+@require_role('admin')
+def admin_payments():
+    payments = admin_page(with_profile(Payment.query.join(User), 'admin_payments'),
+                          PAYMENT_SORT_KEYS, Payment.id)
+    return render_template('admin/payments.html', payments=payments)
@@ -0,0 +1,374 @@
+"""
+JSON endpoints used by the pages' scripts.
+"""
+from datetime import datetime, date, timedelta
+
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from sqlalchemy.exc import IntegrityError
+
+from attendance import MAX_ROLL_CALL, mark_roll_call, upsert_attendance
+from capacity import change_booking_status, is_full, reserve_seat
+from checkin import get_checkin_batcher, get_token_signer, kiosk_key_matches
+from catalog import build_catalog, clamp_days
+from metrics import ATTENDANCE_MARKS, BOOKINGS, CHECKINS
+from models import db, User, Class, ClassSchedule, Booking, Attendance, ProgressLog, WaitlistEntry
+from occurrences import runs_on
+from recurring import MAX_RECURRING_WEEKS, book_dates, weekly_dates
+from versions import conditional
+from waitlist import join_waitlist, leave_waitlist, position
+
+bp = Blueprint('api', __name__)
+
+@bp.route('/api/book-class', methods=['POST'])
+@login_required
+def book_class():
+    if not current_user.has_role('member'):
+        return jsonify({'success': False, 'message': 'Only members can book classes'})
+    
+    data = request.get_json()
+    class_schedule_id = data.get('class_schedule_id')
+    booking_date = data.get('booking_date')
+    
+    if not class_schedule_id or not booking_date:
+        return jsonify({'success': False, 'message': 'Missing required data'})
+    
+    selected_date = datetime.strptime(booking_date, '%Y-%m-%d').date()
+
+    # Check if already booked
+    existing_booking = Booking.query.filter_by(
+        user_id=current_user.id,
+        class_schedule_id=class_schedule_id,
+        booking_date=selected_date
+    ).first()
+    
+    if existing_booking and existing_booking.status == 'confirmed':
+        BOOKINGS.inc(result='duplicate')
+        return jsonify({'success': False, 'message': 'Already booked for this class'})
+    
+    # Capacity check
+    schedule = db.session.get(ClassSchedule, class_schedule_id)
+    if not schedule or not schedule.is_active:
+        return jsonify({'success': False, 'message': 'Invalid schedule'}), 400
+
+    if not runs_on(schedule, selected_date):
+        return jsonify({'success': False, 'message': 'The class does not run on this day'}), 400
+
+    if not reserve_seat(schedule, selected_date):
+        db.session.commit()  # keep a newly created counter row
+        BOOKINGS.inc(result='full')
+        return jsonify({'success': False, 'full': True, 'message': 'Class is full for the selected time'}), 400
+
+    # Create booking, or reactivate a cancelled one for the same date
+    if existing_booking:
+        if not change_booking_status(existing_booking.id, 'cancelled', 'confirmed'):
+            # A concurrent request rebooked it first; this also returns the seat
+            db.session.rollback()
+            BOOKINGS.inc(result='duplicate')
+            return jsonify({'success': False, 'message': 'Already booked for this class'})
+    else:
+        db.session.add(Booking(
+            user_id=current_user.id,
+            class_schedule_id=schedule.id,
+            booking_date=selected_date
+        ))
+    # Booked directly; no longer waiting for this class
+    entry = WaitlistEntry.query.filter_by(user_id=current_user.id, class_schedule_id=schedule.id,
+                                          waitlist_date=selected_date).first()
+    if entry:
+        leave_waitlist(entry, status='booked')
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request booked the same slot first; this also returns the seat
+        db.session.rollback()
+        BOOKINGS.inc(result='duplicate')
+        return jsonify({'success': False, 'message': 'Already booked for this class'})
+    
+    BOOKINGS.inc(result='booked')
+    return jsonify({'success': True, 'message': 'Class booked successfully'})
+
+@bp.route('/api/book-class/recurring', methods=['POST'])
+@login_required
+def book_class_recurring():
+    """Book one schedule on many dates: ``{"class_schedule_id", "start_date", "weeks"}`` for every
+    week from ``start_date``, or ``{"class_schedule_id", "dates": [...]}`` for chosen dates."""
+    if not current_user.has_role('member'):
+        return jsonify({'success': False, 'message': 'Only members can book classes'}), 403
+
+    data = request.get_json(silent=True) or {}
+    schedule = db.session.get(ClassSchedule, data['class_schedule_id']) if data.get('class_schedule_id') else None
+    if not schedule or not schedule.is_active:
+        return jsonify({'success': False, 'message': 'Invalid schedule'}), 400
+    try:
+        if 'dates' in data:
+            dates = [datetime.strptime(d, '%Y-%m-%d').date() for d in data['dates']]
+        else:
+            start = datetime.strptime(data.get('start_date') or date.today().isoformat(), '%Y-%m-%d').date()
+            dates = weekly_dates(schedule, start, min(int(data.get('weeks', 1)), MAX_RECURRING_WEEKS + 1))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid dates'}), 400
+    if not 0 < len(dates) <= MAX_RECURRING_WEEKS:
+        return jsonify({'success': False, 'message': f'Book between 1 and {MAX_RECURRING_WEEKS} dates at a time'}), 400
+
+    result = book_dates(current_user.id, schedule, dates)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request booked one of the dates first; nothing was booked
+        db.session.rollback()
+        BOOKINGS.inc(result='duplicate')
+        return jsonify({'success': False, 'message': 'Some of these dates were just booked; please try again'}), 409
+
+    if result.booked:
+        BOOKINGS.inc(len(result.booked), result='booked')
+    full = sum(1 for reason in result.failed.values() if reason == 'Class is full for the selected time')
+    if full:
+        BOOKINGS.inc(full, result='full')
+    return jsonify({
+        'success': bool(result.booked),
+        'message': f'Booked {len(result.booked)} of {len(result.booked) + len(result.failed)} dates',
+        'booked': [day.isoformat() for day in result.booked],
+        'failed': [{'date': day.isoformat(), 'message': reason} for day, reason in result.failed.items()],
+    })
+
+@bp.route('/api/waitlist', methods=['POST'])
+@login_required
+def join_class_waitlist():
+    if not current_user.has_role('member'):
+        return jsonify({'success': False, 'message': 'Only members can join waitlists'}), 403
+
+    data = request.get_json(silent=True) or {}
+    if not data.get('class_schedule_id'):
+        return jsonify({'success': False, 'message': 'Missing required data'}), 400
+    try:
+        waitlist_date = datetime.strptime(data.get('date') or '', '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid date'}), 400
+    schedule = db.session.get(ClassSchedule, data.get('class_schedule_id'))
+    if not schedule or not schedule.is_active:
+        return jsonify({'success': False, 'message': 'Invalid schedule'}), 400
+    if waitlist_date < date.today():
+        return jsonify({'success': False, 'message': 'This class has already taken place'}), 400
+
+    booked = Booking.query.filter_by(user_id=current_user.id, class_schedule_id=schedule.id,
+                                     booking_date=waitlist_date, status='confirmed').first()
+    if booked:
+        return jsonify({'success': False, 'message': 'Already booked for this class'}), 400
+    if not runs_on(schedule, waitlist_date):
+        return jsonify({'success': False, 'message': 'The class does not run on this day'}), 400
+    if not is_full(schedule, waitlist_date):
+        db.session.commit()  # keep a newly created counter row
+        return jsonify({'success': False, 'message': 'Seats are available; book the class instead'}), 400
+
+    entry = join_waitlist(current_user, schedule.id, waitlist_date)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request by the same member created the entry first
+        db.session.rollback()
+        entry = WaitlistEntry.query.filter_by(user_id=current_user.id, class_schedule_id=schedule.id,
+                                              waitlist_date=waitlist_date).first()
+    place = position(entry)
+    return jsonify({'success': True, 'position': place,
+                    'message': f'You are number {place} on the waitlist'})
+
+@bp.route('/api/class-schedules/<int:class_id>', methods=['GET'])
+@conditional('classes', 'class_schedules')
+def get_class_schedules(class_id: int):
+    class_obj = Class.query.filter_by(id=class_id, is_active=True).first()
+    if not class_obj:
+        return jsonify({'success': False, 'message': 'Class not found'}), 404
+
+    day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    schedules = []
+    for s in class_obj.schedules:
+        if not s.is_active:
+            continue
+        schedules.append({
+            'id': s.id,
+            'day_of_week': s.day_of_week,
+            'day_name': day_names[s.day_of_week] if 0 <= s.day_of_week <= 6 else str(s.day_of_week),
+            'start_time': s.start_time.strftime('%H:%M'),
+            'end_time': s.end_time.strftime('%H:%M'),
+            'room': s.room or '-'
+        })
+    return jsonify({'success': True, 'data': schedules})
+
+@bp.route('/api/class-catalog', methods=['GET'])
+def get_class_catalog():
+    date_str = request.args.get('start')
+    try:
+        start = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else date.today()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid date format'}), 400
+    end = start + timedelta(days=clamp_days(request.args.get('days')) - 1)
+
+    response = jsonify({'success': True,
+                        'start': start.strftime('%Y-%m-%d'),
+                        'end': end.strftime('%Y-%m-%d'),
+                        'data': build_catalog(start, end)})
+    # Remaining seats change with every booking, so only cache briefly
+    response.cache_control.public = True
+    response.cache_control.max_age = 30
+    return response
+
+@bp.route('/api/mark-attendance', methods=['POST'])
+@login_required
+def mark_attendance():
+    if not current_user.has_role('trainer'):
+        return jsonify({'success': False, 'message': 'Only trainers can mark attendance'})
+    
+    data = request.get_json()
+    user_id = data.get('user_id')
+    class_schedule_id = data.get('class_schedule_id')
+    status = data.get('status', 'present')
+    
+    if not user_id or not class_schedule_id:
+        return jsonify({'success': False, 'message': 'Missing required data'})
+    
+    upsert_attendance(class_schedule_id, date.today(), {user_id: status})
+    db.session.commit()
+    ATTENDANCE_MARKS.inc(status=status)
+    
+    return jsonify({'success': True, 'message': 'Attendance marked successfully'})
+
+def _trainer_schedule(class_schedule_id):
+    """Return ``(schedule, None)`` for an active schedule of the current trainer, else ``(None, error)``."""
+    schedule = db.session.get(ClassSchedule, class_schedule_id)
+    if not schedule or not schedule.is_active:
+        return None, (jsonify({'success': False, 'message': 'Schedule not found'}), 404)
+    trainer = current_user.trainer_profile
+    if not trainer or schedule.class_.trainer_id != trainer.id:
+        return None, (jsonify({'success': False, 'message': 'Not authorized for this schedule'}), 403)
+    return schedule, None
+
+@bp.route('/api/mark-attendance/bulk', methods=['POST'])
+@login_required
+def mark_attendance_bulk():
+    """Mark a whole roll call in one upsert and one commit."""
+    if not current_user.has_role('trainer'):
+        return jsonify({'success': False, 'message': 'Only trainers can mark attendance'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    records = data.get('records')
+    if not data.get('class_schedule_id') or not isinstance(records, list) or not records:
+        return jsonify({'success': False, 'message': 'Missing required data'}), 400
+    if len(records) > MAX_ROLL_CALL:
+        return jsonify({'success': False, 'message': f'At most {MAX_ROLL_CALL} records per request'}), 400
+    
+    schedule, error = _trainer_schedule(data['class_schedule_id'])
+    if error:
+        return error
+    
+    try:
+        target_date = datetime.strptime(data['date'], '%Y-%m-%d').date() if data.get('date') else date.today()
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid date format'}), 400
+    if target_date > date.today():
+        return jsonify({'success': False, 'message': 'Cannot mark attendance for a future date'}), 400
+    if not runs_on(schedule, target_date):
+        return jsonify({'success': False, 'message': 'The class does not run on this day'}), 400
+    
+    results, marked = mark_roll_call(schedule.id, target_date, records)
+    db.session.commit()
+    for status, count in marked.items():
+        ATTENDANCE_MARKS.inc(count, status=status)
+    
+    return jsonify({'success': True,
+                    'date': target_date.strftime('%Y-%m-%d'),
+                    'marked': sum(marked.values()),
+                    'results': results})
+
+@bp.route('/api/check-in', methods=['POST'])
+def check_in():
+    """Kiosk check-in with a booking's QR token; the write is queued, not awaited."""
+    if not kiosk_key_matches(request.headers.get('X-Kiosk-Key')):
+        if not current_user.is_authenticated or not (current_user.has_role('admin') or current_user.has_role('trainer')):
+            return jsonify({'success': False, 'message': 'Check-in requires a kiosk key or staff login'}), 403
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = request.form
+    token = get_token_signer().load(data.get('token'))
+    if token is None:
+        CHECKINS.inc(result='invalid')
+        return jsonify({'success': False, 'message': 'Invalid check-in code'}), 400
+    if token.booking_date != date.today():
+        CHECKINS.inc(result='wrong_date')
+        return jsonify({'success': False,
+                        'message': f'This code is for {token.booking_date.strftime("%Y-%m-%d")}'}), 400
+    
+    if not get_checkin_batcher().add(token):
+        CHECKINS.inc(result='duplicate')
+        return jsonify({'success': True, 'booking_id': token.booking_id, 'message': 'Already checked in'})
+    CHECKINS.inc(result='accepted')
+    return jsonify({'success': True, 'booking_id': token.booking_id, 'message': 'Checked in'}), 202
+
+@bp.route('/api/add-progress', methods=['POST'])
+@login_required
+def add_progress():
+    if not current_user.has_role('member'):
+        return jsonify({'success': False, 'message': 'Only members can add progress'})
+    
+    data = request.get_json()
+    
+    progress = ProgressLog(
+        user_id=current_user.id,
+        weight=data.get('weight'),
+        body_fat_percentage=data.get('body_fat_percentage'),
+        muscle_mass=data.get('muscle_mass'),
+        chest_circumference=data.get('chest_circumference'),
+        waist_circumference=data.get('waist_circumference'),
+        hip_circumference=data.get('hip_circumference'),
+        bicep_circumference=data.get('bicep_circumference'),
+        thigh_circumference=data.get('thigh_circumference'),
+        notes=data.get('notes')
+    )
+    
+    db.session.add(progress)
+    db.session.commit()
+    
+    return jsonify({'success': True, 'message': 'Progress logged successfully'})
+
+@bp.route('/api/schedule-bookings/<int:class_schedule_id>')
+@login_required
+def get_schedule_bookings(class_schedule_id: int):
+    # Trainers can view bookings for their schedules only
+    if not current_user.has_role('trainer'):
+        return jsonify({'success': False, 'message': 'Only trainers can view bookings'}), 403
+    
+    # Validate schedule belongs to the trainer
+    schedule, error = _trainer_schedule(class_schedule_id)
+    if error:
+        return error
+    
+    # Parse date parameter
+    date_str = request.args.get('date')
+    try:
+        target_date = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else date.today()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid date format'}), 400
+    
+    bookings = Booking.query.join(User).filter(
+        Booking.class_schedule_id == class_schedule_id,
+        Booking.booking_date == target_date,
+        Booking.status == 'confirmed'
+    ).all()
+    
+    # Map attendance status
+    attendance_map = {}
+    attendance_records = Attendance.query.filter_by(class_schedule_id=class_schedule_id, attendance_date=target_date).all()
+    for rec in attendance_records:
+        attendance_map[rec.user_id] = rec.status
+    
+    data = []
+    for b in bookings:
+        data.append({
+            'user_id': b.user_id,
+            'name': b.user.full_name,
+            'email': b.user.email,
+            'status': attendance_map.get(b.user_id) or 'not_marked'
+        })
+    
+    return jsonify({'success': True, 'data': data, 'date': target_date.strftime('%Y-%m-%d')})
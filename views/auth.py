@@ -0,0 +1,216 @@
+"""
+Login, registration and logout, the user loader and the role check used by
+the other blueprints.
+"""
+import math
+from datetime import datetime, date, timedelta
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask_login import LoginManager, login_user, logout_user, login_required, current_user
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User, Role, Member, Trainer
+from passwords import HashingBusy
+from queries import with_profile
+from rate_limit import get_login_limiter
+from user_cache import load_cached_user
+
+bp = Blueprint('auth', __name__)
+
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
+login_manager.login_message = 'Please log in to access this page.'
+
+def query_user(user_id):
+    # Roles and profiles come with the user so role checks and profile lookups
+    # later in the request don't query again
+    return with_profile(User.query, 'current_user').filter(User.id == int(user_id)).one_or_none()
+
+@login_manager.user_loader
+def load_user(user_id):
+    return load_cached_user(user_id, query_user)
+
+# Helper functions
+def get_user_role(user):
+    if not user or not user.roles:
+        return 'guest'
+    return user.roles[0].name
+
+def require_role(role_name):
+    def decorator(f):
+        @login_required
+        def wrapper(*args, **kwargs):
+            if not current_user.has_role(role_name):
+                flash('Access denied. Insufficient permissions.', 'error')
+                return redirect(url_for('public.home'))
+            return f(*args, **kwargs)
+        wrapper.__name__ = f.__name__
+        return wrapper
+    return decorator
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for('auth.dashboard'))
+    
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('password')
+        
+        if not username or not password:
+            flash('Please fill in all fields.', 'error')
+            return render_template('login.html')
+        
+        limiter = get_login_limiter()
+        retry_after = limiter.check(request.remote_addr, username) if limiter else 0
+        if retry_after:
+            flash('Too many login attempts. Please wait a moment and try again.', 'error')
+            return render_template('login.html'), 429, {'Retry-After': str(math.ceil(retry_after))}
+
+        user = User.query.filter_by(username=username).first()
+        
+        try:
+            valid = user is not None and user.check_password(password)
+        except HashingBusy:
+            flash('Too many sign-ins at the moment. Please try again in a few seconds.', 'error')
+            return render_template('login.html'), 503, {'Retry-After': '2'}
+
+        if valid and user.password_needs_rehash():
+            try:
+                user.set_password(password)
+            except HashingBusy:
+                pass  # keep the old hash; it is upgraded on a later login
+
+        if valid:
+            if limiter:
+                limiter.succeeded(username)
+            login_user(user)
+            user.last_login = datetime.utcnow()
+            db.session.commit()
+            
+            # Redirect based on role
+            if user.has_role('admin'):
+                return redirect(url_for('admin.admin_dashboard'))
+            elif user.has_role('trainer'):
+                return redirect(url_for('trainer.trainer_dashboard'))
+            else:
+                return redirect(url_for('member.member_dashboard'))
+        else:
+            flash('Invalid username or password.', 'error')
+    
+    return render_template('login.html')
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    if current_user.is_authenticated:
+        return redirect(url_for('auth.dashboard'))
+    
+    if request.method == 'POST':
+        username = request.form.get('username')
+        email = request.form.get('email')
+        password = request.form.get('password')
+        confirm_password = request.form.get('confirm_password')
+        first_name = request.form.get('first_name')
+        last_name = request.form.get('last_name')
+        phone = request.form.get('phone')
+        
+        # Validation
+        if not all([username, email, password, confirm_password, first_name, last_name]):
+            flash('Please fill in all required fields.', 'error')
+            return render_template('register.html')
+        
+        if password != confirm_password:
+            flash('Passwords do not match.', 'error')
+            return render_template('register.html')
+        
+        if User.query.filter_by(username=username).first():
+            flash('Username already exists.', 'error')
+            return render_template('register.html')
+        
+        if User.query.filter_by(email=email).first():
+            flash('Email already exists.', 'error')
+            return render_template('register.html')
+        
+        # Create user
+        user = User(
+            username=username,
+            email=email,
+            first_name=first_name,
+            last_name=last_name,
+            phone=phone
+        )
+        try:
+            user.set_password(password)
+        except HashingBusy:
+            flash('The server is busy. Please try again in a few seconds.', 'error')
+            return render_template('register.html'), 503, {'Retry-After': '2'}
+        
+        # Assign role based on selection
+        account_type = (request.form.get('account_type') or 'member').strip().lower()
+        role_name = 'trainer' if account_type == 'trainer' else 'member'
+        role = Role.query.filter_by(name=role_name).first()
+        if not role:
+            role = Role(name=role_name, description=f'{role_name.title()} role')
+            db.session.add(role)
+            db.session.flush()
+        user.roles.append(role)
+        
+        db.session.add(user)
+        db.session.flush()  # ensure user.id is available
+        
+        # Create default profile for role
+        try:
+            if role_name == 'member':
+                # Generate membership number and default values
+                membership_number = f"M{user.id:05d}"
+                expiry = date.today() + timedelta(days=30)
+                member_profile = Member(
+                    user_id=user.id,
+                    membership_number=membership_number,
+                    membership_type='Basic',
+                    expiry_date=expiry,
+                    is_active=True
+                )
+                db.session.add(member_profile)
+            elif role_name == 'trainer':
+                trainer_identifier = f"T{user.id:05d}"
+                trainer_profile = Trainer(
+                    user_id=user.id,
+                    trainer_id=trainer_identifier,
+                    specialization='General Fitness',
+                    experience_years=0,
+                    is_active=True
+                )
+                db.session.add(trainer_profile)
+        except Exception:
+            db.session.rollback()
+            flash('Failed to create user profile. Please try again.', 'error')
+            return render_template('register.html')
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash('Username or email already exists.', 'error')
+            return render_template('register.html')
+        
+        flash('Registration successful! Please log in.', 'success')
+        return redirect(url_for('auth.login'))
+    
+    return render_template('register.html')
+
+@bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    flash('You have been logged out.', 'info')
+    return redirect(url_for('public.home'))
+
+@bp.route('/dashboard')
+@login_required
+def dashboard():
+    if current_user.has_role('admin'):
+        return redirect(url_for('admin.admin_dashboard'))
+    elif current_user.has_role('trainer'):
+        return redirect(url_for('trainer.trainer_dashboard'))
+    else:
+        return redirect(url_for('member.member_dashboard'))
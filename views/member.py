@@ -0,0 +1,140 @@
+"""
+Member dashboard, classes, bookings, payments, progress and profile.
+"""
+from datetime import date
+
+from flask import Blueprint, abort, current_app, render_template, redirect, url_for, flash
+from flask_login import current_user
+from sqlalchemy.exc import IntegrityError
+
+from checkin import get_qr_images, get_token_signer
+from metrics import CANCELLATIONS
+from models import db, Class, ClassSchedule, Booking, Payment, ProgressLog, WaitlistEntry
+from queries import with_profile
+from routing import read_only
+from versions import conditional
+from views.auth import require_role
+from waitlist import cancel_and_promote, leave_waitlist, position
+
+bp = Blueprint('member', __name__)
+
+@bp.route('/member')
+@read_only
+@require_role('member')
+def member_dashboard():
+    member = current_user.member_profile
+    if not member:
+        flash('Member profile not found.', 'error')
+        return redirect(url_for('public.home'))
+    
+    # Get upcoming bookings
+    upcoming_bookings = with_profile(Booking.query.join(ClassSchedule).join(Class), 'member_upcoming_bookings').filter(
+        Booking.user_id == current_user.id,
+        Booking.booking_date >= date.today(),
+        Booking.status == 'confirmed'
+    ).order_by(Booking.booking_date).limit(5).all()
+    
+    # Get recent progress
+    recent_progress = ProgressLog.query.filter_by(user_id=current_user.id).order_by(ProgressLog.log_date.desc()).limit(5).all()
+    
+    return render_template('member/dashboard.html', 
+                         member=member,
+                         upcoming_bookings=upcoming_bookings,
+                         recent_progress=recent_progress,
+                         today=date.today())
+
+@bp.route('/member/classes')
+@read_only
+@require_role('member')
+@conditional('classes')
+def member_classes():
+    classes = Class.query.filter_by(is_active=True).all()
+    return render_template('member/classes.html', classes=classes)
+
+@bp.route('/member/bookings')
+@read_only
+@require_role('member')
+def member_bookings():
+    bookings = with_profile(Booking.query.join(ClassSchedule).join(Class), 'booking_schedule_class').filter(
+        Booking.user_id == current_user.id
+    ).order_by(Booking.booking_date.desc()).all()
+    waiting = WaitlistEntry.query.filter(
+        WaitlistEntry.user_id == current_user.id,
+        WaitlistEntry.status == 'waiting',
+        WaitlistEntry.waitlist_date >= date.today()
+    ).order_by(WaitlistEntry.waitlist_date).all()
+    waitlist = [(entry, position(entry)) for entry in waiting]
+    return render_template('member/bookings.html', bookings=bookings, waitlist=waitlist, today=date.today())
+
+@bp.route('/member/bookings/<int:booking_id>/qr.png')
+@read_only
+@require_role('member')
+def booking_qr(booking_id: int):
+    booking = Booking.query.filter_by(id=booking_id, user_id=current_user.id, status='confirmed').first()
+    if not booking or booking.booking_date < date.today():
+        abort(404)
+    image = get_qr_images().get(get_token_signer().for_booking(booking))
+    response = current_app.response_class(image, mimetype='image/png')
+    response.cache_control.private = True
+    response.cache_control.max_age = 3600
+    return response
+
+@bp.route('/member/payments')
+@read_only
+@require_role('member')
+def member_payments():
+    payments = Payment.query.filter_by(user_id=current_user.id).order_by(Payment.transaction_date.desc()).all()
+    return render_template('member/payments.html', payments=payments)
+
+@bp.route('/member/progress')
+@read_only
+@require_role('member')
+def member_progress():
+    progress_logs = ProgressLog.query.filter_by(user_id=current_user.id).order_by(ProgressLog.log_date.desc()).all()
+    return render_template('member/progress.html', progress_logs=progress_logs)
+
+@bp.route('/member/profile')
+@read_only
+@require_role('member')
+def member_profile():
+    member = current_user.member_profile
+    if not member:
+        flash('Member profile not found.', 'error')
+        return redirect(url_for('public.home'))
+    
+    return render_template('member/profile.html', member=member)
+
+@bp.route('/member/bookings/<int:booking_id>/cancel', methods=['POST'])
+@require_role('member')
+def cancel_booking(booking_id: int):
+    booking = Booking.query.filter_by(id=booking_id, user_id=current_user.id).first()
+    if not booking:
+        flash('Booking not found.', 'error')
+        return redirect(url_for('member.member_bookings'))
+    # The seat goes to the next member on the waitlist, if any
+    if booking.status != 'confirmed' or not cancel_and_promote(booking):
+        db.session.rollback()
+        flash('Only confirmed bookings can be cancelled.', 'error')
+        return redirect(url_for('member.member_bookings'))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # The promoted member's booking was written concurrently; nothing was cancelled
+        db.session.rollback()
+        flash('The booking could not be cancelled; please try again.', 'error')
+        return redirect(url_for('member.member_bookings'))
+    CANCELLATIONS.inc()
+    flash('Booking cancelled.', 'success')
+    return redirect(url_for('member.member_bookings'))
+
+@bp.route('/member/waitlist/<int:entry_id>/leave', methods=['POST'])
+@require_role('member')
+def leave_class_waitlist(entry_id: int):
+    entry = WaitlistEntry.query.filter_by(id=entry_id, user_id=current_user.id, status='waiting').first()
+    if not entry:
+        flash('Waitlist entry not found.', 'error')
+        return redirect(url_for('member.member_bookings'))
+    leave_waitlist(entry)
+    db.session.commit()
+    flash('You left the waitlist.', 'success')
+    return redirect(url_for('member.member_bookings'))
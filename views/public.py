@@ -0,0 +1,36 @@
+"""
+Public pages: home, about, services and contact.
+"""
+from flask import Blueprint, render_template
+
+from models import Announcement, Class
+from queries import with_profile
+from render_cache import cached_page
+from versions import conditional
+
+bp = Blueprint('public', __name__)
+
+@bp.route('/')
+@conditional('announcements')
+@cached_page('announcements')
+def home():
+    announcements = Announcement.query.filter_by(is_active=True, target_audience='all').order_by(Announcement.created_at.desc()).limit(5).all()
+    return render_template('index.html', announcements=announcements)
+
+@bp.route('/about')
+@cached_page()
+def about():
+    return render_template('about.html')
+
+@bp.route('/services')
+@conditional('classes', 'class_schedules', 'trainers', 'users')
+@cached_page('classes', 'class_schedules', 'trainers', 'users')
+def services():
+    # Left unevaluated: the template only runs it when the class cards aren't cached
+    classes = with_profile(Class.query, 'services').filter_by(is_active=True)
+    return render_template('services.html', classes=classes)
+
+@bp.route('/contact')
+@cached_page()
+def contact():
+    return render_template('contact.html')
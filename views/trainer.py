@@ -0,0 +1,99 @@
+"""
+Trainer dashboard, classes, attendance and notifications.
+"""
+from datetime import date
+
+from flask import Blueprint, render_template, redirect, url_for, flash
+from flask_login import current_user
+from sqlalchemy import and_
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import db, Class, ClassOccurrence, ClassSchedule, Notification
+from occurrences import ensure_occurrences
+from queries import with_profile
+from routing import read_only
+from views.auth import require_role
+
+bp = Blueprint('trainer', __name__)
+
+def _occurrences_on(trainer, day):
+    """The trainer's class occurrences on ``day``, with their schedule and class loaded.
+
+    Sessions the background materializer has not created yet (a fresh database,
+    or ``OCCURRENCE_REFRESH_SECONDS = 0``) are created first, as for a booking.
+    """
+    def sessions():
+        # Every schedule running on ``day``, with its occurrence if there is one
+        return with_profile(db.session.query(ClassSchedule, ClassOccurrence).join(Class), 'schedule_class').outerjoin(
+            ClassOccurrence, and_(ClassOccurrence.class_schedule_id == ClassSchedule.id,
+                                  ClassOccurrence.occurrence_date == day)
+        ).filter(
+            Class.trainer_id == trainer.id,
+            ClassSchedule.is_active == True,
+            ClassSchedule.day_of_week == day.weekday()
+        ).order_by(ClassSchedule.start_time).all()
+
+    rows = sessions()
+    missing = [schedule for schedule, occurrence in rows if occurrence is None]
+    if missing:
+        for schedule in missing:
+            ensure_occurrences(schedule, [day])
+        db.session.commit()
+        rows = sessions()
+    occurrences = []
+    for schedule, occurrence in rows:
+        if occurrence is not None:
+            set_committed_value(occurrence, 'class_schedule', schedule)
+            occurrences.append(occurrence)
+    return occurrences
+
+@bp.route('/trainer')
+@read_only
+@require_role('trainer')
+def trainer_dashboard():
+    trainer = current_user.trainer_profile
+    if not trainer:
+        flash('Trainer profile not found.', 'error')
+        return redirect(url_for('public.home'))
+    
+    classes = Class.query.filter_by(trainer_id=trainer.id, is_active=True).all()
+    today_occurrences = _occurrences_on(trainer, date.today())
+    
+    return render_template('trainer/dashboard.html', 
+                         trainer=trainer,
+                         classes=classes,
+                         today_occurrences=today_occurrences)
+
+@bp.route('/trainer/classes')
+@read_only
+@require_role('trainer')
+def trainer_classes():
+    trainer = current_user.trainer_profile
+    if not trainer:
+        flash('Trainer profile not found.', 'error')
+        return redirect(url_for('public.home'))
+    
+    classes = Class.query.filter_by(trainer_id=trainer.id).all()
+    return render_template('trainer/classes.html', classes=classes)
+
+@bp.route('/trainer/attendance')
+@read_only
+@require_role('trainer')
+def trainer_attendance():
+    trainer = current_user.trainer_profile
+    if not trainer:
+        flash('Trainer profile not found.', 'error')
+        return redirect(url_for('public.home'))
+    
+    # Get today's classes
+    today = date.today()
+    occurrences = _occurrences_on(trainer, today)
+    
+    return render_template('trainer/attendance.html', occurrences=occurrences, today=today)
+
+@bp.route('/trainer/notifications')
+@read_only
+@require_role('trainer')
+def trainer_notifications():
+    notifications = Notification.query.filter_by(user_id=current_user.id).order_by(Notification.created_at.desc()).all()
+    return render_template('trainer/notifications.html', notifications=notifications)
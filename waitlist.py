@@ -0,0 +1,226 @@
+"""
+Waitlists for full classes.
+
+A member who finds an occurrence full can join its waitlist. Entries are
+ordered by priority (from the membership type, see ``WAITLIST_PRIORITY``) and
+then first come, first served. When a confirmed booking is cancelled, its
+seat passes straight to the next waiting member inside the cancelling
+transaction: the entry is claimed with a conditional UPDATE
+(``status = 'waiting'``), their booking is created or reactivated (again
+conditionally, ``status = 'cancelled'``) and a notification is added, all in
+one commit. The occurrence's seat count does not change, so no other booker
+can take the seat in between.
+
+Both claims are conditional UPDATEs, so concurrent workers cannot hand out a
+seat twice. Two workers cancelling the same booking: only the one whose
+``status = 'confirmed'`` UPDATE matched promotes (or frees the seat); the
+other changes nothing. Two workers cancelling different bookings cannot
+promote the same member: the second entry UPDATE matches no row and moves on
+to the next entry. A member whose own booking changed in the meantime (they
+rebooked it) is skipped the same way: the claim is rolled back to its
+savepoint and the next entry is tried.
+
+Raising a class's capacity fills the new seats of its upcoming occurrences
+from their waitlists when the change is committed.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import and_, event, func, inspect, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from capacity import change_booking_status, release_seat, reserve_seat
+from metrics import WAITLIST
+from models import db, Booking, Class, ClassSchedule, Notification, WaitlistEntry
+
+# Served before members of lower priority; other membership types get 0
+WAITLIST_PRIORITY = {
+    'VIP': 2,
+    'Premium': 1,
+}
+
+
+def member_priority(user):
+    member = user.member_profile
+    return WAITLIST_PRIORITY.get(member.membership_type, 0) if member else 0
+
+
+def join_waitlist(user, class_schedule_id, waitlist_date):
+    """Put ``user`` in line for the occurrence; returns the waiting entry."""
+    entry = WaitlistEntry.query.filter_by(user_id=user.id, class_schedule_id=class_schedule_id,
+                                          waitlist_date=waitlist_date).first()
+    if entry is None:
+        entry = WaitlistEntry(user_id=user.id, class_schedule_id=class_schedule_id, waitlist_date=waitlist_date)
+        db.session.add(entry)
+    elif entry.status == 'waiting':
+        return entry
+    # Rejoining goes to the back of the line
+    entry.status = 'waiting'
+    entry.priority = member_priority(user)
+    entry.joined_at = datetime.utcnow()
+    entry.promoted_at = None
+    db.session.flush()
+    WAITLIST.inc(result='joined')
+    return entry
+
+
+def position(entry):
+    """1-based place of a waiting entry in its line."""
+    ahead = db.session.scalar(select(func.count(WaitlistEntry.id)).where(
+        WaitlistEntry.class_schedule_id == entry.class_schedule_id,
+        WaitlistEntry.waitlist_date == entry.waitlist_date,
+        WaitlistEntry.status == 'waiting',
+        or_(WaitlistEntry.priority > entry.priority,
+            and_(WaitlistEntry.priority == entry.priority,
+                 or_(WaitlistEntry.joined_at < entry.joined_at,
+                     and_(WaitlistEntry.joined_at == entry.joined_at, WaitlistEntry.id < entry.id))))))
+    return ahead + 1
+
+
+def leave_waitlist(entry, status='left'):
+    """Take a waiting entry out of line (``booked`` when its member got a seat directly)."""
+    if entry.status == 'waiting':
+        entry.status = status
+        if status == 'left':
+            WAITLIST.inc(result='left')
+
+
+def _next_in_line(class_schedule_id, waitlist_date, skipped=()):
+    holds_seat = (select(Booking.id)
+                  .where(Booking.user_id == WaitlistEntry.user_id,
+                         Booking.class_schedule_id == class_schedule_id,
+                         Booking.booking_date == waitlist_date,
+                         Booking.status == 'confirmed')
+                  .exists())
+    return (select(WaitlistEntry.id)
+            .where(WaitlistEntry.class_schedule_id == class_schedule_id,
+                   WaitlistEntry.waitlist_date == waitlist_date,
+                   WaitlistEntry.status == 'waiting',
+                   WaitlistEntry.id.not_in(skipped),
+                   ~holds_seat)
+            .order_by(WaitlistEntry.priority.desc(), WaitlistEntry.joined_at, WaitlistEntry.id)
+            .limit(1))
+
+
+def _seat(user_id, class_schedule_id, waitlist_date):
+    """Create or reactivate the member's booking; returns None if it changed since it was read."""
+    booking = (Booking.query.filter_by(user_id=user_id, class_schedule_id=class_schedule_id,
+                                       booking_date=waitlist_date)
+               .populate_existing().first())
+    if booking is None:
+        booking = Booking(user_id=user_id, class_schedule_id=class_schedule_id, booking_date=waitlist_date)
+        db.session.add(booking)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # The member booked it themselves meanwhile
+            return None
+        return booking
+    if not change_booking_status(booking.id, 'cancelled', 'confirmed'):
+        return None
+    db.session.expire(booking, ['status'])
+    return booking
+
+
+def promote_next(class_schedule_id, waitlist_date):
+    """Give a freed seat to the next waiting member; returns their booking, or None if nobody waits.
+
+    The caller commits; the seat stays counted as taken.
+    """
+    now = datetime.utcnow()
+    skipped = set()
+    while True:
+        entry_id = db.session.scalar(_next_in_line(class_schedule_id, waitlist_date, skipped))
+        if entry_id is None:
+            return None
+        savepoint = db.session.begin_nested()
+        claimed = db.session.execute(
+            update(WaitlistEntry)
+            .where(WaitlistEntry.id == entry_id, WaitlistEntry.status == 'waiting')
+            .values(status='promoted', promoted_at=now)
+            .execution_options(synchronize_session=False))
+        entry = booking = None
+        if claimed.rowcount == 1:
+            entry = db.session.get(WaitlistEntry, entry_id, populate_existing=True)
+            booking = _seat(entry.user_id, class_schedule_id, waitlist_date)
+        if booking is not None:
+            savepoint.commit()
+            break
+        # Another worker promoted this member first, or their booking changed; try the next one
+        savepoint.rollback()
+        skipped.add(entry_id)
+
+    class_name = entry.class_schedule.class_.name
+    db.session.add(Notification(
+        user_id=entry.user_id,
+        title='You got a spot!',
+        message=f'A seat opened up in {class_name} on {waitlist_date.strftime("%A, %b %d")} '
+                f'and you have been booked from the waitlist.',
+        type='success'))
+    WAITLIST.inc(result='promoted')
+    return booking
+
+
+def cancel_and_promote(booking):
+    """Cancel a confirmed booking and hand its seat to the waitlist, or free it; the caller commits.
+
+    Returns False without touching the seat when the booking is no longer
+    confirmed, e.g. a concurrent request cancelled it first.
+    """
+    if not change_booking_status(booking.id, 'confirmed', 'cancelled'):
+        return False
+    promoted = None
+    if booking.booking_date >= date.today():
+        promoted = promote_next(booking.class_schedule_id, booking.booking_date)
+    if promoted is None:
+        release_seat(booking.class_schedule_id, booking.booking_date)
+    return True
+
+
+def fill_from_waitlist(schedule, waitlist_date):
+    """Promote waiting members into the free seats of an occurrence; the caller commits.
+
+    Returns the number of members promoted.
+    """
+    promoted = 0
+    while reserve_seat(schedule, waitlist_date):
+        if promote_next(schedule.id, waitlist_date) is None:
+            release_seat(schedule.id, waitlist_date)
+            break
+        promoted += 1
+    return promoted
+
+
+def _collect_raised_capacity(session, flush_context):
+    raised = session.info.setdefault('raised_capacity_class_ids', set())
+    for obj in session.dirty:
+        if not isinstance(obj, Class):
+            continue
+        history = inspect(obj).attrs.max_capacity.history
+        if history.deleted and (history.deleted[0] or 0) < (obj.max_capacity or 0):
+            raised.add(obj.id)
+
+
+def _promote_into_raised_capacity(session):
+    # Flushed here so a capacity change made just before commit() is seen
+    session.flush()
+    class_ids = session.info.pop('raised_capacity_class_ids', None)
+    if not class_ids:
+        return
+    waiting = session.execute(
+        select(WaitlistEntry.class_schedule_id, WaitlistEntry.waitlist_date)
+        .join(ClassSchedule, ClassSchedule.id == WaitlistEntry.class_schedule_id)
+        .where(ClassSchedule.class_id.in_(class_ids),
+               WaitlistEntry.status == 'waiting',
+               WaitlistEntry.waitlist_date >= date.today())
+        .distinct()).all()
+    for class_schedule_id, waitlist_date in waiting:
+        fill_from_waitlist(session.get(ClassSchedule, class_schedule_id), waitlist_date)
+
+
+def _forget_raised_capacity(session, previous_transaction):
+    session.info.pop('raised_capacity_class_ids', None)
+
+
+event.listen(db.session, 'after_flush', _collect_raised_capacity)
+event.listen(db.session, 'before_commit', _promote_into_raised_capacity)
+event.listen(db.session, 'after_soft_rollback', _forget_raised_capacity)